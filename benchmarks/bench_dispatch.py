@@ -0,0 +1,58 @@
+"""Cost of protocol sniffing: parsing an HTTP request through a Dispatcher
+versus creating the HTTP parser directly, the difference is the dispatch cost
+per connection.
+
+Usage: python benchmarks/bench_dispatch.py [--count N]
+"""
+
+import argparse
+import time
+
+from iofree.contrib import http, socks5
+from iofree.dispatch import Dispatcher
+
+REQUEST = b"GET /index.html HTTP/1.1\r\nHost: example.com\r\nConnection: close\r\n\r\n"
+DISPATCHER = Dispatcher(
+    {
+        b"\x05": socks5.server.parser,
+        b"\x16\x03": socks5.server.parser,
+        (b"GET ", b"HEAD ", b"POST ", b"PUT "): http.server.parser,
+    }
+)
+
+
+def best_of(func, count):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / count
+
+
+def direct():
+    parser = http.server.parser()
+    parser.send(REQUEST)
+    parser.get_result()
+
+
+def dispatched():
+    parser = DISPATCHER.parser()
+    parser.send(REQUEST)
+    parser.get_result()
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=20000)
+    args = argparser.parse_args()
+    base = best_of(direct, args.count)
+    elapsed = best_of(dispatched, args.count)
+    print(f"direct      {base * 1e6:7.2f} us/connection")
+    print(f"dispatched  {elapsed * 1e6:7.2f} us/connection")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Nested generators versus the flat interpreter of `iofree.flat`: a SOCKS5
+request with a generic (uncached) address, five generators deep, and a chain
+of nested schemas, each parsed from one chunk and from single bytes, where
+every byte resumes the parse.
+
+Usage: python benchmarks/bench_flat.py [--count N]
+"""
+
+import argparse
+import socket
+import time
+
+from iofree import schema
+from iofree.contrib import socks5
+from iofree.flat import Program
+
+
+class Address(schema.BinarySchema):
+    "socks5 address without the cache of `iofree.contrib.common.Addr`"
+
+    atyp = schema.uint8
+    host = schema.Switch(
+        "atyp",
+        {
+            1: schema.Convert(
+                schema.Bytes(4), encode=socket.inet_aton, decode=socket.inet_ntoa
+            ),
+            3: schema.LengthPrefixedString(schema.uint8),
+        },
+    )
+    port = schema.uint16be
+
+
+class Request(schema.BinarySchema):
+    ver = schema.MustEqual(schema.uint8, 5)
+    cmd = schema.SizedIntEnum(schema.uint8, socks5.Cmd)
+    rsv = schema.MustEqual(schema.uint8, 0)
+    addr = Address
+
+
+def chain(depth):
+    "a schema nested *depth* levels deep, with a length-prefixed leaf"
+    unit = schema.Group(tag=schema.uint8, body=schema.LengthPrefixedBytes(schema.uint8))
+    for _ in range(depth - 1):
+        unit = schema.Group(tag=schema.uint8, inner=unit)
+    return unit
+
+
+def best_of(func, count):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / count
+
+
+def parse_whole(get_parser, data):
+    def run():
+        parser = get_parser()
+        parser.send(data)
+        return parser.get_result()
+
+    return run
+
+
+def parse_bytes(get_parser, data):
+    chunks = [data[i : i + 1] for i in range(len(data))]
+
+    def run():
+        parser = get_parser()
+        for chunk in chunks:
+            parser.send(chunk)
+        return parser.get_result()
+
+    return run
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=5000)
+    args = argparser.parse_args()
+    Deep = chain(5)
+    deep = Deep.parse(b"\x01\x02\x03\x04\x05\x10" + b"x" * 16)
+    cases = [
+        (
+            "socks5 request",
+            Request,
+            Request(..., socks5.Cmd.connect, 0, Address(3, "example.com", 80)),
+        ),
+        ("5 nested schemas", Deep, deep),
+    ]
+    for name, unit, obj in cases:
+        program = Program(unit)
+        data = obj.binary
+        for mode, make in [("whole", parse_whole), ("bytewise", parse_bytes)]:
+            assert make(program.get_parser, data)() == obj
+            nested = best_of(make(unit.get_parser, data), args.count)
+            flat = best_of(make(program.get_parser, data), args.count)
+            print(
+                f"{name:17} {mode:9} nested {nested * 1e6:7.2f} us, "
+                f"flat {flat * 1e6:7.2f} us ({nested / flat:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Compare `LengthPrefixedFramer` with parsing the same frames through a
+generator-based parser.
+
+Usage: python benchmarks/bench_framing.py
+"""
+
+import timeit
+
+import iofree
+from iofree import schema
+from iofree.framing import LengthPrefixedFramer
+
+FRAMES = [bytes(i % 200) for i in range(1000)]
+DATA = b"".join(schema.uint16be(len(frame)) + frame for frame in FRAMES)
+CHUNK = 4096
+
+
+def framer():
+    framer = LengthPrefixedFramer(schema.uint16be)
+    frames = []
+    for i in range(0, len(DATA), CHUNK):
+        frames.extend(framer.feed(DATA[i : i + CHUNK]))
+    assert len(frames) == len(FRAMES)
+
+
+def generator():
+    parser = iofree.Parser.iter_messages(schema.LengthPrefixedBytes(schema.uint16be))
+    frames = []
+    for i in range(0, len(DATA), CHUNK):
+        parser.send(DATA[i : i + CHUNK])
+        frames.extend(parser.results())
+    assert len(frames) == len(FRAMES)
+
+
+def main():
+    for func in (framer, generator):
+        best = min(timeit.repeat(func, number=20, repeat=10)) / 20
+        print(f"{func.__name__:<10} {best / len(FRAMES) * 1e9:8.0f} ns/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Requests per second parsing pipelined HTTP/1.1 requests from one buffer:
+`iofree.contrib.http` versus an eager `EndWith` schema that splits every
+header into a dict, and the standard library's `http.client.parse_headers`.
+
+Usage: python benchmarks/bench_http.py
+"""
+
+import http.client
+import io
+import timeit
+
+import iofree
+from iofree import schema
+from iofree.contrib import http as iofree_http
+
+REQUEST = (
+    b"GET /index.html HTTP/1.1\r\n"
+    b"Host: www.example.com\r\n"
+    b"User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101\r\n"
+    b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+    b"Accept-Language: en-US,en;q=0.5\r\n"
+    b"Accept-Encoding: gzip, deflate, br\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Cookie: session=0123456789abcdef; theme=dark\r\n"
+    b"Upgrade-Insecure-Requests: 1\r\n\r\n"
+)
+COUNT = 100
+DATA = REQUEST * COUNT
+
+
+class Head(schema.BinarySchema):
+    head = schema.EndWith(b"\r\n\r\n")
+
+
+def eager_schema():
+    parser = iofree.Parser.iter_messages(Head)
+    parser.send(DATA)
+    for message in parser.results():
+        start_line, *lines = message.head.split(b"\r\n")
+        method, target, version = start_line.split(b" ")
+        headers = {}
+        for line in lines:
+            name, _, value = line.partition(b":")
+            headers[name.decode("latin-1").lower()] = value.strip().decode("latin-1")
+        headers.get("content-length")
+
+
+def stdlib():
+    stream = io.BytesIO(DATA)
+    for _ in range(COUNT):
+        stream.readline()
+        http.client.parse_headers(stream).get("content-length")
+
+
+def contrib_http():
+    parser = iofree_http.server.parser()
+    parser.send(DATA)
+    for result in parser.results():
+        pass
+
+
+def main():
+    for func in (stdlib, eager_schema, contrib_http):
+        best = min(timeit.repeat(func, number=20, repeat=10)) / 20
+        print(f"{func.__name__:<13} {COUNT / best:10,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Check the import time of iofree modules with ``python -X importtime``.
+
+Usage: python benchmarks/bench_import.py [--budget-ms MS] [--runs N] [module ...]
+
+Each module is imported in a fresh interpreter *runs* times, the best
+cumulative time is reported, and the script exits with status 1 if a module
+exceeds its budget (``--budget-ms`` overrides the default budgets).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# milliseconds, the contrib modules also pay for `socket`
+BUDGETS = {"iofree": 8.0, "iofree.schema": 10.0, "iofree.contrib.socks5": 15.0}
+
+
+def import_time_us(module: str) -> int:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and line.split("|")[-1].strip() == module:
+            return int(line.split("|")[1])
+    raise RuntimeError(f"no importtime output for {module}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS))
+    parser.add_argument("--budget-ms", type=float)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    failed = False
+    for module in args.modules:
+        budget = args.budget_ms or BUDGETS.get(module, 10.0)
+        best = min(import_time_us(module) for i in range(args.runs)) / 1000
+        status = "ok" if best <= budget else "OVER BUDGET"
+        failed = failed or best > budget
+        print(f"{module:<24} {best:8.2f} ms  ({status})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
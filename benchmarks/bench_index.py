@@ -0,0 +1,68 @@
+"""Random access into a file of length-prefixed records: parsing from the
+start up to each wanted record versus a sidecar index, including the one-off
+cost of building the index.
+
+Usage: python benchmarks/bench_index.py [--records N] [--lookups N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from iofree import Parser, schema
+from iofree.index import RecordFile
+
+
+class Event(schema.BinarySchema):
+    kind = schema.uint8
+    timestamp = schema.uint64be
+    payload = schema.LengthPrefixedBytes(schema.uint16be)
+
+
+def scan_to(path, wanted):
+    "parse every record from the start until record *wanted*"
+    parser = Parser.iter_messages(Event)
+    with open(path, "rb") as f:
+        seen = 0
+        while True:
+            parser.send(f.read(65536))
+            for event in parser.results():
+                if seen == wanted:
+                    return event
+                seen += 1
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--records", type=int, default=200000)
+    argparser.add_argument("--lookups", type=int, default=20)
+    args = argparser.parse_args()
+    wanted = [random.randrange(args.records) for _ in range(args.lookups)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.bin")
+        with open(path, "wb") as f:
+            records = ((i % 8, i, b"x" * (i % 100)) for i in range(args.records))
+            Event.write_many(records, f)
+
+        start = time.perf_counter()
+        results = [scan_to(path, i) for i in wanted]
+        scanned = time.perf_counter() - start
+
+        start = time.perf_counter()
+        RecordFile(path, Event).close()
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with RecordFile(path, Event) as events:
+            assert [events[i] for i in wanted] == results
+        indexed = time.perf_counter() - start
+    print(f"{args.records} records, {args.lookups} lookups")
+    print(f"parse from start {scanned / args.lookups * 1e3:10.3f} ms/lookup")
+    print(f"build index      {built * 1e3:10.3f} ms once")
+    print(f"indexed          {indexed / args.lookups * 1e3:10.3f} ms/lookup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Bulk encoding: records per second written by `Schema.pack_many` and
+`Schema.write_many` versus creating an object per record and joining its
+`binary`, for a fixed-size record and one with a length-prefixed field.
+
+Usage: python benchmarks/bench_pack_many.py [--records N]
+"""
+
+import argparse
+import io
+import time
+
+from iofree import schema
+
+
+class Sample(schema.BinarySchema):
+    sensor = schema.uint16be
+    timestamp = schema.uint64be
+    value = schema.float64be
+    flags = schema.uint24be
+
+
+class LogLine(schema.BinarySchema):
+    level = schema.uint8
+    timestamp = schema.uint64be
+    message = schema.LengthPrefixedString(schema.uint16be)
+
+
+def per_object(cls, records):
+    return b"".join(cls(*record).binary for record in records)
+
+
+def packed(cls, records):
+    return cls.pack_many(records)
+
+
+def written(cls, records):
+    cls.write_many(records, io.BytesIO())
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--records", type=int, default=100000)
+    args = argparser.parse_args()
+    n = args.records
+    cases = [
+        (Sample, [(i % 65536, i, i / 7, i % 4096) for i in range(n)]),
+        (LogLine, [(i % 8, i, f"message number {i}") for i in range(n)]),
+    ]
+    for cls, records in cases:
+        assert per_object(cls, records) == packed(cls, records)
+        for name, func in (
+            ("per object", per_object),
+            ("pack_many", packed),
+            ("write_many", written),
+        ):
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                func(cls, records)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{cls.__name__:<8} {name:<11} {n / best:12,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cost of rejecting malformed messages: streams of invalid socks5 Handshakes
+(a wrong version, or an unknown method after 15 valid ones) parsed one by
+one with errors raised as usual, in fail-fast mode, and dropped by
+`Parser.parse_datagrams`; plus the memory each error keeps alive while it is
+kept, e.g. for logging.
+
+Usage: python benchmarks/bench_parse_errors.py [--count N]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from iofree import Parser
+from iofree.contrib import socks5
+from iofree.exceptions import ParseError
+
+Handshake = socks5.Handshake
+VALID = Handshake(..., [socks5.AuthMethod.no_auth]).binary
+BAD_VERSION = b"\x04" + VALID[1:]
+BAD_METHOD = b"\x05\x10" + b"\x00" * 15 + b"\x07"
+
+
+def best_of(func, count):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        func(count)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / count
+
+
+def each(data, *, keep=False, **kwargs):
+    def run(count):
+        errors = []
+        for _ in range(count):
+            try:
+                Handshake.get_parser(**kwargs).parse(data)
+            except ParseError as e:
+                if keep:
+                    errors.append(e)
+        return errors
+
+    return run
+
+
+def datagrams(data):
+    def run(count):
+        parser = Parser(Handshake.get_value())
+        parser.parse_datagrams([data] * count, Handshake.get_value, skip_errors=True)
+
+    return run
+
+
+def kept_per_error(data, count, **kwargs):
+    run = each(data, keep=True, **kwargs)
+    tracemalloc.start()
+    try:
+        errors = run(count)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del errors
+    return size // count
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=10000)
+    args = argparser.parse_args()
+    print(f"valid {'':17} {best_of(each(VALID), args.count) * 1e6:7.2f} us/message")
+    for label, data in [("bad version", BAD_VERSION), ("bad method", BAD_METHOD)]:
+        for mode, run, kwargs in [
+            ("raised", each(data), {}),
+            ("fail-fast", each(data, fail_fast=True), {"fail_fast": True}),
+            ("datagrams", datagrams(data), None),
+        ]:
+            elapsed = best_of(run, args.count)
+            line = f"{label:12} {mode:10} {elapsed * 1e6:7.2f} us/message"
+            if kwargs is not None:
+                kept = kept_per_error(data, 1000, **kwargs)
+                line += f", {kept:6} bytes kept/error"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
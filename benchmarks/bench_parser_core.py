@@ -0,0 +1,65 @@
+"""Per-trap cost of `Parser` with and without the optional C extension.
+
+Build the extension as described in iofree/_speedups.c, then compare:
+
+Usage: python benchmarks/bench_parser_core.py
+       IOFREE_PURE_PYTHON=1 python benchmarks/bench_parser_core.py
+"""
+
+import struct
+import timeit
+
+import iofree
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+
+RECORD = struct.Struct("!HI")
+RECORDS = b"".join(RECORD.pack(i, i * 7) + b"line %d\r\n" % i for i in range(100))
+REQUEST = socks5.ClientRequest(
+    ..., socks5.Cmd.connect, 0, Addr.from_tuple(("example.com", 443))
+).binary
+
+
+def records():
+    for _ in range(100):
+        yield from iofree.read_raw_struct(RECORD)
+        yield from iofree.read_until(b"\r\n")
+
+
+def small_reads():
+    for _ in range(RECORD.size * 100):
+        yield from iofree.read(1)
+
+
+def ints():
+    for _ in range(RECORD.size * 100 // 2):
+        yield from iofree.read_int(2)
+
+
+BENCHES = {
+    "read_struct + read_until": (records, RECORDS, 200),
+    "read(1)": (small_reads, RECORDS[: RECORD.size * 100], RECORD.size * 100),
+    "read_int(2)": (ints, RECORDS[: RECORD.size * 100], RECORD.size * 50),
+}
+
+
+def main():
+    mode = "C extension" if iofree.HAS_SPEEDUPS else "pure Python"
+    print(f"mode: {mode}")
+    for name, (func, data, traps) in BENCHES.items():
+        best = min(
+            timeit.repeat(
+                lambda: iofree.Parser(func()).send(data), number=20, repeat=10
+            )
+        )
+        print(f"{name:<26} {best / 20 / traps * 1e9:8.0f} ns/trap")
+    best = min(
+        timeit.repeat(
+            lambda: socks5.ClientRequest.parse(REQUEST), number=2000, repeat=10
+        )
+    )
+    print(f"{'ClientRequest.parse':<26} {best / 2000 * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
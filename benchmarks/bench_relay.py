@@ -0,0 +1,71 @@
+"""Throughput of relaying a socket to another after the handshake: through a
+parser's buffer (`send` + `readall`), `recv_into` on one buffer, and splice.
+
+Usage: python benchmarks/bench_relay.py [--megabytes N]
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+import iofree
+from iofree import relay
+
+CHUNK = b"x" * 65536
+
+
+def through_parser(src, dst):
+    parser = iofree.Parser(iofree.wait_event())
+    while True:
+        data = src.recv(65536)
+        if not data:
+            break
+        parser.send(data)
+        dst.sendall(parser.readall())
+    dst.shutdown(socket.SHUT_WR)
+
+
+def run(func, megabytes):
+    src_peer, src = socket.socketpair()
+    dst, dst_peer = socket.socketpair()
+
+    def write():
+        for _ in range(megabytes * 16):
+            src_peer.sendall(CHUNK)
+        src_peer.shutdown(socket.SHUT_WR)
+
+    def read():
+        while dst_peer.recv(65536):
+            pass
+
+    threads = [threading.Thread(target=write), threading.Thread(target=read)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    func(src, dst)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for sock in (src_peer, src, dst, dst_peer):
+        sock.close()
+    return megabytes / elapsed
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--megabytes", type=int, default=256)
+    args = argparser.parse_args()
+    candidates = {
+        "parser buffer": through_parser,
+        "recv_into": lambda src, dst: relay.relay(src, dst, use_splice=False),
+    }
+    if relay.HAS_SPLICE:
+        candidates["splice"] = lambda src, dst: relay.relay(src, dst, use_splice=True)
+    for name, func in candidates.items():
+        best = max(run(func, args.megabytes) for _ in range(3))
+        print(f"{name:<14} {best:10,.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
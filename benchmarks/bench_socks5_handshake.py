@@ -0,0 +1,63 @@
+"""SOCKS5 handshakes per second over a loopback socket pair, with the client
+and server state machines driven in one thread, pipelined versus not.
+
+Usage: python benchmarks/bench_socks5_handshake.py [--count N]
+"""
+
+import argparse
+import socket
+import time
+
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+
+REPLY = socks5.Reply(..., socks5.Rep.succeeded, 0, Addr.from_tuple(("10.0.0.1", 80)))
+
+
+def pump(parser, sock):
+    "write the output of *parser* to *sock*, return whether a result came out"
+    got_result = False
+    for to_send, close, exc, result in parser:
+        if exc:
+            raise exc
+        if to_send:
+            sock.sendall(to_send)
+        if isinstance(result, socks5.ClientRequest):
+            parser.send_event(REPLY)
+            got_result = True
+    return got_result
+
+
+def handshake(csock, ssock, **kwargs):
+    client = socks5.client.parser(("example.com", 443), **kwargs)
+    server = socks5.server.parser(lambda username, password: True)
+    client.send()
+    while True:
+        pump(client, csock)
+        server.send(ssock.recv(4096))
+        if pump(server, ssock):
+            pump(server, ssock)
+        client.send(csock.recv(4096))
+        if client.finished():
+            return client.get_result()
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=5000)
+    args = argparser.parse_args()
+    csock, ssock = socket.socketpair()
+    for pipeline in (False, True):
+        kwargs = dict(username="user", password="pass", pipeline=pipeline)
+        best = None
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(args.count):
+                handshake(csock, ssock, **kwargs)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"pipeline={pipeline!s:<5} {args.count / best:10,.0f} handshakes/s")
+
+
+if __name__ == "__main__":
+    main()
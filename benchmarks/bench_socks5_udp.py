@@ -0,0 +1,49 @@
+"""Packets per second of SOCKS5 UDP relay decoding and encoding, generic
+schema versus `UDPRelayCodec`.
+
+Usage: python benchmarks/bench_socks5_udp.py
+"""
+
+import os
+import timeit
+
+from iofree.contrib import socks5
+
+DESTINATIONS = [(f"10.0.{i}.1", 53) for i in range(64)] + [("example.com", 443)]
+PAYLOAD = os.urandom(512)
+DATAGRAMS = [
+    socks5.UDPRelay(..., 0, socks5.Addr.from_tuple(addr), PAYLOAD).binary
+    for addr in DESTINATIONS
+]
+CODEC = socks5.UDPRelayCodec()
+
+
+def schema_decode():
+    for datagram in DATAGRAMS:
+        relay = socks5.UDPRelay.parse(datagram)
+        relay.addr, relay.data
+
+
+def codec_decode():
+    for datagram in DATAGRAMS:
+        CODEC.decode(datagram)
+
+
+def schema_encode():
+    for addr in DESTINATIONS:
+        socks5.UDPRelay(..., 0, socks5.Addr.from_tuple(addr), PAYLOAD).binary
+
+
+def codec_encode():
+    for addr in DESTINATIONS:
+        CODEC.encode(addr, PAYLOAD)
+
+
+def main():
+    for func in (schema_decode, codec_decode, schema_encode, codec_encode):
+        best = min(timeit.repeat(func, number=50, repeat=10)) / 50
+        print(f"{func.__name__:<14} {len(DATAGRAMS) / best:12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main()
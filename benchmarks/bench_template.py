@@ -0,0 +1,62 @@
+"""Serializing nearly constant SOCKS5 messages: building a schema object and
+joining its buffers versus rendering a template of the constant fields.
+
+Usage: python benchmarks/bench_template.py [--count N]
+"""
+
+import argparse
+import time
+
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+
+ADDR = Addr.from_tuple(("10.0.0.1", 8080))
+SELECTION = socks5.ServerSelection.template()
+AUTH_REPLY = socks5.UsernameAuthReply.template(status=0)
+REPLY = socks5.Reply.template(rep=socks5.Rep.succeeded)
+CASES = [
+    (
+        "ServerSelection",
+        lambda: socks5.ServerSelection(..., socks5.AuthMethod.no_auth).binary,
+        lambda: SELECTION.render(method=socks5.AuthMethod.no_auth),
+    ),
+    (
+        "UsernameAuthReply",
+        lambda: socks5.UsernameAuthReply(..., 0).binary,
+        lambda: AUTH_REPLY.render(),
+    ),
+    (
+        "Reply",
+        lambda: socks5.Reply(..., socks5.Rep.succeeded, 0, ADDR).binary,
+        lambda: REPLY.render(bind_addr=ADDR),
+    ),
+]
+
+
+def best_of(func, count):
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / count
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=100000)
+    args = argparser.parse_args()
+    for name, build, render in CASES:
+        assert build() == render()
+        built = best_of(build, args.count)
+        rendered = best_of(render, args.count)
+        print(
+            f"{name:<18} object {built * 1e9:6.0f} ns  template "
+            f"{rendered * 1e9:5.0f} ns  ({built / rendered:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Encode/decode throughput of `contrib.socks5` messages across 1 to N
+threads. On a free-threaded CPython build the threads run in parallel, with
+the GIL they take turns; both are safe now that schemas keep no global state.
+
+Usage: python benchmarks/bench_threads.py [--threads N] [--messages M]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+
+ADDRS = [(f"10.0.{i}.1", 443) for i in range(32)] + [("example.com", 80)]
+
+
+def work(count):
+    for i in range(count):
+        addr = Addr.from_tuple(ADDRS[i % len(ADDRS)])
+        request = socks5.ClientRequest(..., socks5.Cmd.connect, 0, addr)
+        assert socks5.ClientRequest.parse(request.binary).addr == addr
+    return count
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--threads", type=int, default=8)
+    argparser.add_argument("--messages", type=int, default=20000)
+    args = argparser.parse_args()
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}")
+    base = None
+    threads = 1
+    while threads <= args.threads:
+        per_thread = args.messages // threads
+        with ThreadPoolExecutor(threads) as executor:
+            start = time.perf_counter()
+            total = sum(executor.map(work, [per_thread] * threads))
+            elapsed = time.perf_counter() - start
+        rate = total / elapsed
+        base = base or rate
+        print(f"{threads:3} threads {rate:12,.0f} messages/s  x{rate / base:.2f}")
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Deadline bookkeeping for many idle connections: every parser refreshes its
+deadline on each message, a timer wheel versus a heap of (deadline, parser)
+entries with lazy deletion.
+
+Usage: python benchmarks/bench_timer.py [--parsers N]
+"""
+
+import argparse
+import heapq
+import random
+import time
+
+import iofree
+from iofree.timer import TimerWheel
+
+
+@iofree.parser
+def idle():
+    while True:
+        yield from iofree.set_deadline(random.uniform(10, 60))
+        yield from iofree.read(1)
+
+
+def with_wheel(parsers, rounds):
+    wheel = TimerWheel(tick=0.5)
+    for parser in parsers:
+        wheel.watch(parser)
+    for _ in range(rounds):
+        for parser in parsers:
+            parser.send(b"x")  # adds its new deadline to the wheel
+        wheel.advance()
+
+
+def with_heap(parsers, rounds):
+    heap = []
+    for _ in range(rounds):
+        for parser in parsers:
+            parser.send(b"x")
+            heapq.heappush(heap, (parser.deadline, id(parser), parser))
+        now = time.monotonic()
+        while heap and heap[0][0] <= now:
+            deadline, _, parser = heapq.heappop(heap)
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--parsers", type=int, default=100000)
+    argparser.add_argument("--rounds", type=int, default=5)
+    args = argparser.parse_args()
+    for name, func in (("timer wheel", with_wheel), ("heap", with_heap)):
+        parsers = [idle.parser() for _ in range(args.parsers)]
+        start = time.perf_counter()
+        func(parsers, args.rounds)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<12} {elapsed / args.parsers / args.rounds * 1e9:7.0f} ns/message"
+        )
+
+
+if __name__ == "__main__":
+    main()
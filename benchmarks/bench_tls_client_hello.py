@@ -0,0 +1,98 @@
+"""ClientHello peeks per second on synthetic ClientHellos with a growing
+number of padding extensions, compared with parsing the whole message with
+nested schemas, then looking the server name up among the extensions.
+
+Usage: python benchmarks/bench_tls_client_hello.py [--count N]
+"""
+
+import argparse
+import os
+import time
+
+from iofree import schema
+from iofree.contrib import tls
+
+
+class Extension(schema.BinarySchema):
+    type = schema.uint16be
+    data = schema.LengthPrefixedBytes(schema.uint16be)
+
+
+class ServerName(schema.BinarySchema):
+    name_type = schema.uint8
+    name = schema.LengthPrefixedBytes(schema.uint16be)
+
+
+class ClientHelloRecord(schema.BinarySchema):
+    content_type = schema.uint8
+    record_version = schema.uint16be
+    record_length = schema.uint16be
+    msg_type = schema.uint8
+    length = schema.uint24be
+    version = schema.uint16be
+    random = schema.Bytes(32)
+    session_id = schema.LengthPrefixedBytes(schema.uint8)
+    cipher_suites = schema.LengthPrefixedBytes(schema.uint16be)
+    compression_methods = schema.LengthPrefixedBytes(schema.uint8)
+    extensions = schema.LengthPrefixedObjectList(schema.uint16be, Extension)
+
+
+def extension(ext_type, data):
+    return ext_type.to_bytes(2, "big") + len(data).to_bytes(2, "big") + data
+
+
+def synthetic_client_hello(server_name, n_extensions):
+    name = server_name.encode()
+    entry = b"\x00" + len(name).to_bytes(2, "big") + name
+    extensions = [extension(0xFF00 + i, os.urandom(32)) for i in range(n_extensions)]
+    extensions.append(extension(0, len(entry).to_bytes(2, "big") + entry))
+    extensions.append(extension(16, b"\x00\x0c\x02h2\x08http/1.1"))
+    body = (
+        b"\x03\x03"
+        + os.urandom(32)
+        + b"\x20"
+        + os.urandom(32)
+        + b"\x00\x04\x13\x01\x13\x02\x01\x00"
+    )
+    ext_block = b"".join(extensions)
+    body += len(ext_block).to_bytes(2, "big") + ext_block
+    message = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + len(message).to_bytes(2, "big") + message
+
+
+def peek(data):
+    parser = tls.client_hello.parser()
+    parser.send(data)
+    return parser.get_result().server_name
+
+
+def full_parse(data):
+    hello = ClientHelloRecord.parse(data)
+    for ext in hello.extensions:
+        if ext.type == 0:
+            return ServerName.parse(ext.data[2:]).name.decode()
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--count", type=int, default=5000)
+    args = argparser.parse_args()
+    for n_extensions in (0, 8, 32):
+        data = synthetic_client_hello("www.example.com", n_extensions)
+        for name, func in (("peek", peek), ("full schema", full_parse)):
+            assert func(data) == "www.example.com"
+            best = None
+            for _ in range(5):
+                start = time.perf_counter()
+                for _ in range(args.count):
+                    func(data)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(
+                f"{n_extensions:3} extensions {len(data):5} bytes {name:<12}"
+                f"{args.count / best:10,.0f} hellos/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
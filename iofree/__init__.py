@@ -1,18 +1,31 @@
 """`iofree` is an easy-to-use and powerful library \
 to help you implement network protocols and binary parsers."""
 
-import sys
-import typing
+from __future__ import annotations
+
+import os
 from collections import deque
 from enum import IntEnum, auto
-from socket import SocketType
 from struct import Struct
+from time import monotonic as _monotonic
+
+from .exceptions import NoResult, ParseError, Timeout
+
+# `typing` and `socket` are only needed by annotations, importing them would
+# more than double the import time of iofree
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+    from socket import SocketType
 
-from .exceptions import NoResult, ParseError
+    from .timer import TimerWheel
 
 __version__ = "0.2.5"
 _wait = object()
 _no_result = object()
+# shared placeholder for the input buffer a parser gave back to its pool,
+# it is never written to: `Parser.send` acquires a new buffer first
+_released_input = bytearray()
 
 
 class Traps(IntEnum):
@@ -25,6 +38,10 @@ class Traps(IntEnum):
     _peek = auto()
     _wait_event = auto()
     _get_parser = auto()
+    _yield_result = auto()
+    _ensure = auto()
+    _read_upto = auto()
+    _set_deadline = auto()
 
 
 class State(IntEnum):
@@ -33,23 +50,88 @@ class State(IntEnum):
     _state_end = auto()
 
 
+# looking members up on an Enum class is slow, the parser uses these aliases
+_state_wait = State._state_wait
+_state_next = State._state_next
+_state_end = State._state_end
+
+
 class Parser:
-    def __init__(self, gen: typing.Generator):
+    def __init__(
+        self,
+        gen: typing.Generator,
+        *,
+        pool=None,
+        min_size: int = 0,
+        fail_fast: bool = False,
+    ):
         self.gen = gen
-        self._input = bytearray()
+        self._pool = pool
+        self._input = bytearray() if pool is None else pool.acquire()
+        # bytes sent since the generator started, the offset of a `ParseError`
+        # is this minus the buffered input
+        self._fed = 0
+        # with *fail_fast*, a `ParseError` is raised without the values parsed
+        # before it, its traceback or the exceptions it was chained to
+        self.fail_fast = fail_fast
         self._input_events: typing.Deque = deque()
         self._output_events: typing.Deque = deque()
         self._res = _no_result
         self._mapping_stack: typing.Deque = deque()
         self._next_value = None
-        self._last_trap: typing.Optional[tuple] = None
+        # with *min_size*, the generator starts once that many bytes arrived
+        self._last_trap: typing.Optional[tuple] = (
+            (Traps._ensure, min_size) if min_size > 0 else None
+        )
         self._pos = 0
-        self._state: State = State._state_wait
+        self._waiting = False
+        self._detached = False
+        # a `time.monotonic` timestamp set by `set_deadline`, see `expire`
+        self.deadline: typing.Optional[float] = None
+        self.timer: typing.Optional[TimerWheel] = None
+        self._state: State = _state_wait
         self._process()
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._handlers = _trap_handlers(cls)
+
     def __repr__(self):
         return f"<{self.__class__.__qualname__}({self.gen})>"
 
+    @classmethod
+    def iter_messages(cls, unit: typing.Any, *, pool=None) -> "Parser":
+        """
+        create a long-lived parser which parses *unit* (a schema or unit)
+        repeatedly and emits each message as a result event, see `results`
+        """
+        return cls(_message_loop(unit), pool=pool)
+
+    def reset(self, gen: typing.Generator) -> None:
+        """
+        reuse this parser for a new generator, the current generator is closed;
+        leftover input is kept, pending events and the result are discarded
+        """
+        self.gen.close()
+        self.gen = gen
+        self._input_events.clear()
+        self._output_events.clear()
+        self._res = _no_result
+        self._mapping_stack.clear()
+        self._next_value = None
+        self._last_trap = None
+        self._pos = 0
+        self._waiting = False
+        self.deadline = None
+        if self._detached:
+            self._detached = False
+            if self._pool is None:
+                # with a pool, `send` acquires a buffer once data arrives
+                self._input = bytearray()
+        self._fed = len(self._input)
+        self._state = _state_wait
+        self._process()
+
     def __iter__(self):
         return self
 
@@ -71,9 +153,79 @@ class Parser:
         """
         send data for parsing
         """
+        if self._input is _released_input:
+            if self._detached:
+                raise RuntimeError("the parser is detached")
+            self._input = self._pool.acquire()
         self._input.extend(data)
+        self._fed += len(data)
+        self._process()
+
+    def send_many(self, chunks: typing.Iterable[bytes]) -> None:
+        """
+        send many chunks for parsing, they are processed once all appended
+        """
+        if self._input is _released_input:
+            if self._detached:
+                raise RuntimeError("the parser is detached")
+            self._input = self._pool.acquire()
+        buf = self._input
+        size = len(buf)
+        for data in chunks:
+            buf.extend(data)
+        self._fed += len(buf) - size
+        self._process()
+
+    def adopt_input(self, buffer: bytearray) -> None:
+        """
+        take over *buffer*, e.g. the input of another parser, as the input
+        without copying it, and process it; this parser's input must be empty
+        """
+        if self._detached:
+            raise RuntimeError("the parser is detached")
+        if self._input:
+            raise RuntimeError("the parser has buffered input")
+        self._release_input()
+        self._input = buffer
+        self._fed += len(buffer)
         self._process()
 
+    def parse_datagrams(
+        self,
+        datagrams: typing.Iterable[bytes],
+        factory: typing.Callable[[], typing.Generator],
+        *,
+        strict: bool = True,
+        skip_errors: bool = False,
+    ) -> typing.List[typing.Any]:
+        """
+        parse each datagram as an independent message with a new generator
+        from *factory*, reusing this parser; with *skip_errors*, malformed or
+        incomplete datagrams are dropped instead of raising an exception, and
+        their errors are raised in `fail_fast` mode
+        """
+        results = []
+        fail_fast = self.fail_fast
+        self.fail_fast = fail_fast or skip_errors
+        try:
+            for datagram in datagrams:
+                del self._input[:]
+                self.reset(factory())
+                try:
+                    results.append(self.parse(datagram, strict=strict))
+                except (ParseError, NoResult):
+                    if not skip_errors:
+                        raise
+        finally:
+            self.fail_fast = fail_fast
+        return results
+
+    def results(self) -> typing.Iterator[typing.Any]:
+        "pop output events and iterate over the results, other events are dropped"
+        for to_send, close, exc, result in self:
+            if result is not _no_result:
+                yield result
+
     def read_output_bytes(self) -> bytes:
         buf = []
         for to_send, close, exc, result in self:
@@ -98,21 +250,46 @@ class Parser:
 
     def run(self, sock: SocketType) -> typing.Any:
         "reference implementation of how to deal with socket"
+        import socket
+
+        timeout = sock.gettimeout()
+        restore = False
         self.send(b"")
-        while True:
-            for to_send, close, exc, result in self:
-                if to_send:
-                    sock.sendall(to_send)
-                if close:
-                    sock.close()
-                if exc:
-                    raise exc
-                if result is not _no_result:
-                    return result
-            data = sock.recv(1024)
-            if not data:
-                raise ParseError("need data")
-            self.send(data)
+        try:
+            while True:
+                for to_send, close, exc, result in self:
+                    if to_send:
+                        sock.sendall(to_send)
+                    if close:
+                        sock.close()
+                    if exc:
+                        raise exc
+                    if result is not _no_result:
+                        return result
+                if self.deadline is not None:
+                    remaining = self.deadline - _monotonic()
+                    if remaining <= 0:
+                        self.expire()
+                        continue
+                    sock.settimeout(remaining)
+                    restore = True
+                elif restore:
+                    # the deadline was cleared
+                    sock.settimeout(timeout)
+                    restore = False
+                try:
+                    data = sock.recv(1024)
+                except socket.timeout:
+                    if self.deadline is None:
+                        raise
+                    self.expire()
+                    continue
+                if not data:
+                    raise ParseError("need data")
+                self.send(data)
+        finally:
+            if restore and sock.fileno() != -1:
+                sock.settimeout(timeout)
 
     @property
     def has_result(self) -> bool:
@@ -132,13 +309,40 @@ class Parser:
         self.respond(result=result)
 
     def finished(self) -> bool:
-        return self._state is State._state_end
+        return self._state is _state_end
+
+    def expire(self) -> None:
+        """
+        throw *Timeout* into the generator, e.g. when `deadline` has passed;
+        a generator that catches it can clean up and return or go on, else
+        it propagates from here and the parser is finished
+        """
+        if self._state is _state_end:
+            return
+        self.deadline = None
+        self._last_trap = None
+        self._waiting = False
+        self._pos = 0
+        try:
+            trap = self.gen.throw(Timeout("deadline exceeded"))
+        except StopIteration as e:
+            self._state = _state_end
+            self.set_result(e.value)
+            return
+        except BaseException:
+            self._state = _state_end
+            raise
+        if not isinstance(trap[0], Traps):
+            self._state = _state_end
+            raise RuntimeError(f"Expect Traps object, but got: {trap[0]}")
+        self._last_trap = trap
+        self._process()
 
     def _process(self) -> None:
-        if self._state is State._state_end:
+        if self._state is _state_end:
             return
-        self._state = State._state_next
-        while self._state is State._state_next:
+        self._state = _state_next
+        while self._state is _state_next:
             self._next_state()
 
     def _next_state(self) -> None:
@@ -146,25 +350,37 @@ class Parser:
             try:
                 trap, *args = self.gen.send(self._next_value)
             except StopIteration as e:
-                self._state = State._state_end
+                self._state = _state_end
                 self.set_result(e.value)
+                if not self._input:
+                    self._release_input()
                 return
-            except Exception:
-                self._state = State._state_end
-                tb = sys.exc_info()[2]
-                raise ParseError(f"{self._next_value!r}").with_traceback(tb)
+            except ParseError as e:
+                self._state = _state_end
+                if e.offset is None:
+                    e.offset = self._fed - len(self._input)
+                if self.fail_fast:
+                    raise _fail_fast(e) from None
+                raise
+            except Exception as e:
+                self._state = _state_end
+                error = ParseError(e)
+                error.offset = self._fed - len(self._input)
+                if self.fail_fast:
+                    raise _fail_fast(error) from None
+                raise error from e
             else:
                 if not isinstance(trap, Traps):
-                    self._state = State._state_end
+                    self._state = _state_end
                     raise RuntimeError(f"Expect Traps object, but got: {trap}")
         else:
             trap, *args = self._last_trap
-        result = getattr(self, trap.name)(*args)
+        result = self._handlers[trap](self, *args)
         if result is _wait:
-            self._state = State._state_wait
+            self._state = _state_wait
             self._last_trap = (trap, *args)
         else:
-            self._state = State._state_next
+            self._state = _state_next
             self._next_value = result
             self._last_trap = None
 
@@ -172,7 +388,32 @@ class Parser:
         """
         retrieve data from input back
         """
-        return self._read(0)
+        data = self._read(0)
+        if self._state is _state_end:
+            self._release_input()
+        return data
+
+    def detach(self) -> bytes:
+        """
+        hand the connection over once the parser has finished, e.g. to
+        `iofree.relay`: return the leftover input once; afterwards sending
+        data to this parser raises *RuntimeError*
+        """
+        if self._state is not _state_end:
+            raise RuntimeError("the parser has not finished")
+        if self._detached:
+            raise RuntimeError("the parser is detached")
+        data = self._read(0) if self._input is not _released_input else b""
+        self._release_input()
+        self._input = _released_input
+        self._detached = True
+        return data
+
+    def _release_input(self) -> None:
+        "give the empty input buffer back to the pool, if any"
+        if self._pool is not None and self._input is not _released_input:
+            self._pool.release(self._input)
+            self._input = _released_input
 
     def has_more_data(self) -> bool:
         "indicate whether input has some bytes left"
@@ -182,13 +423,17 @@ class Parser:
         self._input_events.append(event)
         self._process()
 
+    def send_event_many(self, events: typing.Iterable[typing.Any]) -> None:
+        self._input_events.extend(events)
+        self._process()
+
     def _wait_event(self):
         if self._input_events:
             return self._input_events.popleft()
         return _wait
 
     def _wait(self) -> typing.Optional[object]:
-        if not getattr(self, "_waiting", False):
+        if not self._waiting:
             self._waiting = True
             return _wait
         self._waiting = False
@@ -202,7 +447,7 @@ class Parser:
             return data
         if len(buf) < nbytes:
             return _wait
-        data = bytes(buf[:nbytes])
+        data = bytes(buf[:nbytes]) if nbytes < _LARGE else _copy_head(buf, nbytes)
         del buf[:nbytes]
         return data
 
@@ -215,23 +460,41 @@ class Parser:
         return data
 
     def _read_until(
-        self, data: bytes, return_tail: bool = True, from_=None
-    ) -> typing.Union[object, bytes]:
+        self,
+        data: bytes,
+        return_tail: bool = True,
+        from_=None,
+        limit: typing.Optional[int] = None,
+    ) -> typing.Union[object, bytes, None]:
         buf = self._input if from_ is None else from_
         index = buf.find(data, self._pos)
         if index == -1:
+            if limit is not None and len(buf) >= limit:
+                self._pos = 0
+                return None
             self._pos = len(buf) - len(data) + 1
             self._pos = self._pos if self._pos > 0 else 0
             return _wait
         size = index + len(data)
+        if limit is not None and size > limit:
+            self._pos = 0
+            return None
         if return_tail:
-            data = bytes(buf[:size])
+            data = bytes(buf[:size]) if size < _LARGE else _copy_head(buf, size)
         else:
-            data = bytes(buf[:index])
+            data = bytes(buf[:index]) if index < _LARGE else _copy_head(buf, index)
         del buf[:size]
         self._pos = 0
         return data
 
+    def _read_upto(self, nbytes: int, from_=None) -> typing.Union[object, bytes]:
+        buf = self._input if from_ is None else from_
+        if not buf:
+            return _wait
+        data = bytes(buf[:nbytes]) if nbytes < _LARGE else _copy_head(buf, nbytes)
+        del buf[:nbytes]
+        return data
+
     def _read_struct(
         self, struct_obj: Struct, from_=None
     ) -> typing.Union[object, tuple]:
@@ -249,7 +512,7 @@ class Parser:
         buf = self._input if from_ is None else from_
         if len(buf) < nbytes:
             return _wait
-        data = self._read(nbytes)
+        data = self._read(nbytes, from_)
         return int.from_bytes(data, byteorder, signed=signed)
 
     def _peek(self, nbytes: int = 1, from_=None) -> typing.Union[object, bytes]:
@@ -258,9 +521,70 @@ class Parser:
             return _wait
         return bytes(buf[:nbytes])
 
+    def _ensure(self, nbytes: int) -> typing.Optional[object]:
+        return _wait if len(self._input) < nbytes else None
+
     def _get_parser(self) -> "Parser":
         return self
 
+    def _yield_result(self, result: typing.Any) -> None:
+        self.respond(result=result)
+
+    def _set_deadline(self, deadline: typing.Optional[float]) -> typing.Optional[float]:
+        previous = self.deadline
+        self.deadline = deadline
+        if deadline is not None and self.timer is not None:
+            self.timer.add(self)
+        return previous
+
+
+# slicing a bytearray copies it before `bytes` copies it again, larger reads
+# are copied once through a memoryview, which is slower for small ones
+_LARGE = 1024
+
+
+def _copy_head(buf: bytearray, nbytes: int) -> bytes:
+    with memoryview(buf) as view:
+        return view[:nbytes].tobytes()
+
+
+def _fail_fast(error: ParseError) -> ParseError:
+    """cut *error* and the exception it wraps from their tracebacks and the
+    exceptions they were chained to, which keep the frames of the failed
+    generators alive, and drop its partial values"""
+    error.values = None
+    for exc in (error, *error.args):
+        if isinstance(exc, BaseException):
+            exc.__cause__ = exc.__context__ = None
+            exc.__traceback__ = None
+    return error
+
+
+def _trap_handlers(cls: type) -> list:
+    """the handler of each trap indexed by its value; buffer primitives that
+    are not overridden come from the C extension if it is used"""
+    handlers = [None] * (max(Traps) + 1)
+    for trap in Traps:
+        handler = getattr(cls, trap.name)
+        if _speedups is not None and handler is getattr(Parser, trap.name):
+            handler = getattr(_speedups, trap.name, handler)
+        handlers[trap] = handler
+    return handlers
+
+
+# set IOFREE_PURE_PYTHON to ignore the optional C extension, see _speedups.c
+if os.environ.get("IOFREE_PURE_PYTHON"):
+    _speedups = None
+else:
+    try:
+        from . import _speedups
+    except ImportError:
+        _speedups = None
+    else:
+        _speedups.setup(_wait)
+HAS_SPEEDUPS = _speedups is not None
+Parser._handlers = _trap_handlers(Parser)
+
 
 class LinkedNode:
     __slots__ = ("parser", "next")
@@ -322,12 +646,31 @@ def read_more(nbytes: int = 1, *, from_=None) -> typing.Generator[tuple, bytes,
 
 
 def read_until(
-    data: bytes, *, return_tail: bool = True, from_=None
+    data: bytes,
+    *,
+    return_tail: bool = True,
+    limit: typing.Optional[int] = None,
+    from_=None,
 ) -> typing.Generator[tuple, bytes, bytes]:
     """
-    read until some bytes appear
+    read until some bytes appear; with *limit*, raise *ParseError* unless
+    they end within the first ``limit`` bytes
     """
-    return (yield (Traps._read_until, data, return_tail, from_))
+    if limit is None:
+        return (yield (Traps._read_until, data, return_tail, from_))
+    result = yield (Traps._read_until, data, return_tail, from_, limit)
+    if result is None:
+        raise ParseError(f"{data!r} not found within {limit} bytes")
+    return result
+
+
+def read_upto(nbytes: int, *, from_=None) -> typing.Generator[tuple, bytes, bytes]:
+    """
+    read at least one and at most ``nbytes`` bytes, to stream data through
+    """
+    if nbytes <= 0:
+        raise ValueError(f"nbytes must > 0, but got {nbytes}")
+    return (yield (Traps._read_upto, nbytes, from_))
 
 
 def read_struct(fmt: str, *, from_=None) -> typing.Generator[tuple, tuple, tuple]:
@@ -373,6 +716,49 @@ def peek(nbytes: int = 1, *, from_=None) -> typing.Generator[tuple, bytes, bytes
     return (yield (Traps._peek, nbytes, from_))
 
 
+def ensure(nbytes: int) -> typing.Generator[tuple, None, None]:
+    """
+    wait until at least ``nbytes`` are buffered, without taking them away
+    """
+    return (yield (Traps._ensure, nbytes))
+
+
+def set_deadline(
+    seconds: typing.Optional[float],
+) -> typing.Generator[tuple, typing.Optional[float], typing.Optional[float]]:
+    """
+    have *Timeout* thrown into the generator if it still runs *seconds* from
+    now (None for no deadline), see `Parser.expire` and `timer.TimerWheel`;
+    return the previous deadline
+    """
+    deadline = None if seconds is None else _monotonic() + seconds
+    return (yield (Traps._set_deadline, deadline))
+
+
+def with_timeout(seconds: float, gen: typing.Generator) -> typing.Generator:
+    """
+    run *gen* with a deadline *seconds* from now, or the current deadline if
+    that is earlier, then restore the current deadline
+    """
+    deadline = _monotonic() + seconds
+    previous = yield (Traps._set_deadline, deadline)
+    if previous is not None and previous < deadline:
+        yield (Traps._set_deadline, previous)
+    try:
+        result = yield from gen
+    except Exception as e:
+        # a deadline that fired or passed is not armed again
+        if previous is not None and (
+            (isinstance(e, Timeout) and previous < deadline)
+            or previous <= _monotonic()
+        ):
+            previous = None
+        yield (Traps._set_deadline, previous)
+        raise
+    yield (Traps._set_deadline, previous)
+    return result
+
+
 def wait_event() -> typing.Generator[tuple, typing.Any, typing.Any]:
     """
     wait for an event
@@ -385,11 +771,58 @@ def get_parser() -> typing.Generator[tuple, Parser, Parser]:
     return (yield (Traps._get_parser,))
 
 
+def yield_result(result: typing.Any) -> typing.Generator[tuple, None, None]:
+    "emit an intermediate result without finishing the generator"
+    return (yield (Traps._yield_result, result))
+
+
+def _message_loop(unit: typing.Any) -> typing.Generator:
+    while True:
+        message = yield from unit
+        yield from yield_result(message)
+
+
+class ParserPool:
+    "keep released parsers around and reset them for new generators"
+
+    def __init__(
+        self, generator_func: typing.Callable, *, max_size: int = 1024, pool=None
+    ):
+        self.generator_func = generator_func
+        self.max_size = max_size
+        self.pool = pool
+        self._free: typing.List[Parser] = []
+
+    def get(self, *args, **kwargs) -> Parser:
+        "get a parser running ``generator_func(*args, **kwargs)``"
+        gen = self.generator_func(*args, **kwargs)
+        if self._free:
+            try:
+                parser = self._free.pop()
+            except IndexError:  # another thread took the last one
+                pass
+            else:
+                parser.reset(gen)
+                return parser
+        return Parser(gen, pool=self.pool)
+
+    def put(self, parser: Parser) -> None:
+        "give a parser back, its leftover input is dropped"
+        parser.gen.close()
+        del parser._input[:]
+        if len(self._free) < self.max_size:
+            self._free.append(parser)
+
+
 def parser(generator_func: typing.Callable) -> typing.Callable:
     "decorator function to wrap a generator"
 
     def create_parser(*args, **kwargs) -> Parser:
         return Parser(generator_func(*args, **kwargs))
 
+    def create_parser_pool(*, max_size: int = 1024, pool=None) -> ParserPool:
+        return ParserPool(generator_func, max_size=max_size, pool=pool)
+
     generator_func.parser = create_parser
+    generator_func.parser_pool = create_parser_pool
     return generator_func
@@ -0,0 +1,466 @@
+/* Optional C implementation of the input buffer primitives of iofree.Parser.
+ *
+ * Each function takes the parser followed by the arguments of its trap, and
+ * has the same semantics as the Python method of the same name: it returns
+ * iofree._wait when not enough data is buffered.  iofree uses this module
+ * when it can be imported, unless the IOFREE_PURE_PYTHON environment variable
+ * is set.  The package build does not compile it, build it in place with:
+ *
+ *     cc -O2 -shared -fPIC $(python3-config --includes) iofree/_speedups.c \
+ *         -o iofree/_speedups$(python3-config --extension-suffix)
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <string.h>
+
+static PyObject *wait_obj = NULL;
+static PyObject *str_input = NULL;
+static PyObject *str_pos = NULL;
+static PyObject *str_size = NULL;
+static PyObject *str_unpack_from = NULL;
+static PyObject *str_from_bytes = NULL;
+static PyObject *str_signed = NULL;
+static PyObject *str_big = NULL;
+
+static PyObject *
+return_wait(void)
+{
+    if (wait_obj == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "setup() has not been called");
+        return NULL;
+    }
+    Py_INCREF(wait_obj);
+    return wait_obj;
+}
+
+/* new reference to the buffer a trap works on: *from_* or parser._input */
+static PyObject *
+get_buffer(PyObject *parser, PyObject *from_)
+{
+    PyObject *buf;
+    if (from_ != NULL && from_ != Py_None) {
+        Py_INCREF(from_);
+        buf = from_;
+    }
+    else {
+        buf = PyObject_GetAttr(parser, str_input);
+        if (buf == NULL) {
+            return NULL;
+        }
+    }
+    if (!PyByteArray_Check(buf)) {
+        PyErr_Format(PyExc_TypeError, "expected a bytearray buffer, got %.200s",
+                     Py_TYPE(buf)->tp_name);
+        Py_DECREF(buf);
+        return NULL;
+    }
+    return buf;
+}
+
+/* the end of the slice buf[:nbytes] */
+static Py_ssize_t
+slice_end(Py_ssize_t size, Py_ssize_t nbytes)
+{
+    if (nbytes >= 0) {
+        return nbytes < size ? nbytes : size;
+    }
+    return size + nbytes > 0 ? size + nbytes : 0;
+}
+
+/* bytes(buf[:end]), then del buf[:end] when *consume* */
+static PyObject *
+take(PyObject *buf, Py_ssize_t end, int consume)
+{
+    PyObject *data = PyBytes_FromStringAndSize(PyByteArray_AS_STRING(buf), end);
+    if (data == NULL) {
+        return NULL;
+    }
+    if (consume && end > 0 && PySequence_DelSlice(buf, 0, end) < 0) {
+        Py_DECREF(data);
+        return NULL;
+    }
+    return data;
+}
+
+static int
+check_nargs(const char *name, Py_ssize_t nargs, Py_ssize_t low, Py_ssize_t high)
+{
+    if (nargs < low || nargs > high) {
+        PyErr_Format(PyExc_TypeError, "%s() takes %zd to %zd arguments (%zd given)",
+                     name, low, high, nargs);
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject *
+speedups_read(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    Py_ssize_t nbytes = 0, size;
+    PyObject *buf, *result;
+    if (check_nargs("_read", nargs, 1, 3) < 0) {
+        return NULL;
+    }
+    if (nargs > 1) {
+        nbytes = PyLong_AsSsize_t(args[1]);
+        if (nbytes == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    buf = get_buffer(args[0], nargs > 2 ? args[2] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    size = PyByteArray_GET_SIZE(buf);
+    if (nbytes == 0) {
+        result = take(buf, size, 1);
+    }
+    else if (size < nbytes) {
+        result = return_wait();
+    }
+    else {
+        result = take(buf, slice_end(size, nbytes), 1);
+    }
+    Py_DECREF(buf);
+    return result;
+}
+
+static PyObject *
+speedups_read_more(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    Py_ssize_t nbytes = 1, size;
+    PyObject *buf, *result;
+    if (check_nargs("_read_more", nargs, 1, 3) < 0) {
+        return NULL;
+    }
+    if (nargs > 1) {
+        nbytes = PyLong_AsSsize_t(args[1]);
+        if (nbytes == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    buf = get_buffer(args[0], nargs > 2 ? args[2] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    size = PyByteArray_GET_SIZE(buf);
+    result = size < nbytes ? return_wait() : take(buf, size, 1);
+    Py_DECREF(buf);
+    return result;
+}
+
+static PyObject *
+speedups_peek(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    Py_ssize_t nbytes = 1, size;
+    PyObject *buf, *result;
+    if (check_nargs("_peek", nargs, 1, 3) < 0) {
+        return NULL;
+    }
+    if (nargs > 1) {
+        nbytes = PyLong_AsSsize_t(args[1]);
+        if (nbytes == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    buf = get_buffer(args[0], nargs > 2 ? args[2] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    size = PyByteArray_GET_SIZE(buf);
+    result = size < nbytes ? return_wait() : take(buf, slice_end(size, nbytes), 0);
+    Py_DECREF(buf);
+    return result;
+}
+
+static PyObject *
+speedups_read_upto(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    Py_ssize_t nbytes, size;
+    PyObject *buf, *result;
+    if (check_nargs("_read_upto", nargs, 2, 3) < 0) {
+        return NULL;
+    }
+    nbytes = PyLong_AsSsize_t(args[1]);
+    if (nbytes == -1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    buf = get_buffer(args[0], nargs > 2 ? args[2] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    size = PyByteArray_GET_SIZE(buf);
+    result = size == 0 ? return_wait() : take(buf, slice_end(size, nbytes), 1);
+    Py_DECREF(buf);
+    return result;
+}
+
+/* like bytearray.find(needle, start) */
+static Py_ssize_t
+find(const char *haystack, Py_ssize_t size, const char *needle,
+     Py_ssize_t needle_size, Py_ssize_t start)
+{
+    const char *p, *last;
+    if (start < 0) {
+        start = size + start > 0 ? size + start : 0;
+    }
+    if (start > size || needle_size > size - start) {
+        return -1;
+    }
+    if (needle_size == 0) {
+        return start;
+    }
+    p = haystack + start;
+    last = haystack + size - needle_size;
+    while (p <= last) {
+        p = memchr(p, needle[0], last - p + 1);
+        if (p == NULL) {
+            return -1;
+        }
+        if (memcmp(p, needle, needle_size) == 0) {
+            return p - haystack;
+        }
+        p++;
+    }
+    return -1;
+}
+
+static int
+set_pos(PyObject *parser, Py_ssize_t pos)
+{
+    PyObject *value = PyLong_FromSsize_t(pos);
+    int ret;
+    if (value == NULL) {
+        return -1;
+    }
+    ret = PyObject_SetAttr(parser, str_pos, value);
+    Py_DECREF(value);
+    return ret;
+}
+
+static PyObject *
+speedups_read_until(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *parser, *buf, *pos_obj, *result = NULL;
+    Py_buffer needle;
+    Py_ssize_t pos, size, index, limit = -1;
+    int return_tail = 1;
+    if (check_nargs("_read_until", nargs, 2, 5) < 0) {
+        return NULL;
+    }
+    parser = args[0];
+    if (nargs > 2 && (return_tail = PyObject_IsTrue(args[2])) < 0) {
+        return NULL;
+    }
+    if (nargs > 4 && args[4] != Py_None) {
+        limit = PyLong_AsSsize_t(args[4]);
+        if (limit == -1 && PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    buf = get_buffer(parser, nargs > 3 ? args[3] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    if (PyObject_GetBuffer(args[1], &needle, PyBUF_SIMPLE) < 0) {
+        Py_DECREF(buf);
+        return NULL;
+    }
+    pos_obj = PyObject_GetAttr(parser, str_pos);
+    if (pos_obj == NULL) {
+        goto done;
+    }
+    pos = PyLong_AsSsize_t(pos_obj);
+    Py_DECREF(pos_obj);
+    if (pos == -1 && PyErr_Occurred()) {
+        goto done;
+    }
+    size = PyByteArray_GET_SIZE(buf);
+    index = find(PyByteArray_AS_STRING(buf), size, needle.buf, needle.len, pos);
+    if (limit != -1 &&
+        (index == -1 ? size >= limit : index + needle.len > limit)) {
+        /* not found within the limit */
+        if (set_pos(parser, 0) == 0) {
+            Py_INCREF(Py_None);
+            result = Py_None;
+        }
+        goto done;
+    }
+    if (index == -1) {
+        pos = size - needle.len + 1;
+        if (set_pos(parser, pos > 0 ? pos : 0) == 0) {
+            result = return_wait();
+        }
+        goto done;
+    }
+    result = PyBytes_FromStringAndSize(PyByteArray_AS_STRING(buf),
+                                       return_tail ? index + needle.len : index);
+    if (result == NULL) {
+        goto done;
+    }
+    if (PySequence_DelSlice(buf, 0, index + needle.len) < 0 ||
+        set_pos(parser, 0) < 0) {
+        Py_CLEAR(result);
+    }
+done:
+    PyBuffer_Release(&needle);
+    Py_DECREF(buf);
+    return result;
+}
+
+static PyObject *
+speedups_read_struct(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *buf, *size_obj, *result = NULL;
+    Py_ssize_t size;
+    if (check_nargs("_read_struct", nargs, 2, 3) < 0) {
+        return NULL;
+    }
+    size_obj = PyObject_GetAttr(args[1], str_size);
+    if (size_obj == NULL) {
+        return NULL;
+    }
+    size = PyLong_AsSsize_t(size_obj);
+    Py_DECREF(size_obj);
+    if (size == -1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    buf = get_buffer(args[0], nargs > 2 ? args[2] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    if (PyByteArray_GET_SIZE(buf) < size) {
+        result = return_wait();
+    }
+    else {
+        result = PyObject_CallMethodObjArgs(args[1], str_unpack_from, buf, NULL);
+        if (result != NULL && size > 0 && PySequence_DelSlice(buf, 0, size) < 0) {
+            Py_CLEAR(result);
+        }
+    }
+    Py_DECREF(buf);
+    return result;
+}
+
+static PyObject *
+speedups_read_int(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *buf, *byteorder, *data, *kwargs, *call_args, *from_bytes;
+    PyObject *result = NULL;
+    Py_ssize_t nbytes, i;
+    int big = -1, is_signed = 0;
+    if (check_nargs("_read_int", nargs, 2, 5) < 0) {
+        return NULL;
+    }
+    nbytes = PyLong_AsSsize_t(args[1]);
+    if (nbytes == -1 && PyErr_Occurred()) {
+        return NULL;
+    }
+    byteorder = nargs > 2 ? args[2] : str_big;
+    if ((PyUnicode_Check(byteorder) &&
+                              PyUnicode_CompareWithASCIIString(byteorder, "big") == 0)) {
+        big = 1;
+    }
+    else if (PyUnicode_Check(byteorder) &&
+             PyUnicode_CompareWithASCIIString(byteorder, "little") == 0) {
+        big = 0;
+    }
+    if (nargs > 3 && (is_signed = PyObject_IsTrue(args[3])) < 0) {
+        return NULL;
+    }
+    buf = get_buffer(args[0], nargs > 4 ? args[4] : NULL);
+    if (buf == NULL) {
+        return NULL;
+    }
+    if (PyByteArray_GET_SIZE(buf) < nbytes) {
+        Py_DECREF(buf);
+        return return_wait();
+    }
+    if (big != -1 && nbytes > 0 && nbytes <= 8) {
+        const unsigned char *p = (const unsigned char *)PyByteArray_AS_STRING(buf);
+        unsigned long long value = 0;
+        for (i = 0; i < nbytes; i++) {
+            value = (value << 8) | p[big ? i : nbytes - 1 - i];
+        }
+        if (is_signed && nbytes < 8 && (value >> (nbytes * 8 - 1))) {
+            result = PyLong_FromLongLong(
+                (long long)value - (long long)(1ULL << (nbytes * 8)));
+        }
+        else if (is_signed) {
+            result = PyLong_FromLongLong((long long)value);
+        }
+        else {
+            result = PyLong_FromUnsignedLongLong(value);
+        }
+        if (result != NULL && PySequence_DelSlice(buf, 0, nbytes) < 0) {
+            Py_CLEAR(result);
+        }
+        Py_DECREF(buf);
+        return result;
+    }
+    /* anything else goes through int.from_bytes */
+    data = take(buf, slice_end(PyByteArray_GET_SIZE(buf), nbytes), 1);
+    Py_DECREF(buf);
+    if (data == NULL) {
+        return NULL;
+    }
+    from_bytes = PyObject_GetAttr((PyObject *)&PyLong_Type, str_from_bytes);
+    call_args = from_bytes == NULL ? NULL
+                                   : PyTuple_Pack(2, data, byteorder);
+    kwargs = call_args == NULL ? NULL : PyDict_New();
+    if (kwargs != NULL &&
+        PyDict_SetItem(kwargs, str_signed, is_signed ? Py_True : Py_False) == 0) {
+        result = PyObject_Call(from_bytes, call_args, kwargs);
+    }
+    Py_XDECREF(kwargs);
+    Py_XDECREF(call_args);
+    Py_XDECREF(from_bytes);
+    Py_DECREF(data);
+    return result;
+}
+
+static PyObject *
+speedups_setup(PyObject *module, PyObject *wait)
+{
+    Py_INCREF(wait);
+    Py_XSETREF(wait_obj, wait);
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef speedups_methods[] = {
+    {"setup", (PyCFunction)speedups_setup, METH_O,
+     "register the object returned when more data is needed"},
+    {"_read", (PyCFunction)(void (*)(void))speedups_read, METH_FASTCALL, NULL},
+    {"_read_more", (PyCFunction)(void (*)(void))speedups_read_more, METH_FASTCALL,
+     NULL},
+    {"_read_until", (PyCFunction)(void (*)(void))speedups_read_until, METH_FASTCALL,
+     NULL},
+    {"_read_struct", (PyCFunction)(void (*)(void))speedups_read_struct,
+     METH_FASTCALL, NULL},
+    {"_read_int", (PyCFunction)(void (*)(void))speedups_read_int, METH_FASTCALL,
+     NULL},
+    {"_read_upto", (PyCFunction)(void (*)(void))speedups_read_upto, METH_FASTCALL,
+     NULL},
+    {"_peek", (PyCFunction)(void (*)(void))speedups_peek, METH_FASTCALL, NULL},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT, "iofree._speedups",
+    "C implementation of iofree.Parser buffer primitives", -1, speedups_methods,
+};
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    if ((str_input = PyUnicode_InternFromString("_input")) == NULL ||
+        (str_pos = PyUnicode_InternFromString("_pos")) == NULL ||
+        (str_size = PyUnicode_InternFromString("size")) == NULL ||
+        (str_unpack_from = PyUnicode_InternFromString("unpack_from")) == NULL ||
+        (str_from_bytes = PyUnicode_InternFromString("from_bytes")) == NULL ||
+        (str_signed = PyUnicode_InternFromString("signed")) == NULL ||
+        (str_big = PyUnicode_InternFromString("big")) == NULL) {
+        return NULL;
+    }
+    return PyModule_Create(&speedups_module);
+}
@@ -1,6 +1,59 @@
+from __future__ import annotations
+
+import _thread  # `threading` would add milliseconds to the import time
 import socket
+from collections import OrderedDict
+
+from .. import Parser, peek, read, schema
+from ..exceptions import ParseError
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+
+class LRUCache:
+    """a bounded mapping that evicts the least recently used entry, with stats;
+    it can be shared between threads"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = _thread.allocate_lock()
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__qualname__}(size={len(self._data)}, "
+            f"hits={self.hits}, misses={self.misses})>"
+        )
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: typing.Any, default: typing.Any = None) -> typing.Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: typing.Any, value: typing.Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
 
-from .. import schema
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
 
 
 class Addr(schema.BinarySchema):
@@ -21,12 +74,87 @@ class Addr(schema.BinarySchema):
     )
     port: int = schema.uint16be
 
+    #: wire bytes and (atyp, host, port) keys both map to the same record:
+    #: (atyp, host, port, (atyp bytes, host bytes, port bytes))
+    cache = LRUCache(4096)
+
+    def __init__(self, atyp: int, host: str, port: int):
+        key = (atyp, host, port)
+        cacheable = type(atyp) is int and type(host) is str and type(port) is int
+        record = self.cache.get(key) if cacheable else None
+        if record is not None:
+            self._set_record(record)
+            return
+        super().__init__(atyp, host, port)
+        if cacheable:
+            self._store(b"".join(self.buffers()))
+
+    def _set_record(self, record: tuple) -> None:
+        atyp, host, port, (atyp_b, host_b, port_b) = record
+        self._set_encoded(
+            {"atyp": atyp, "host": host, "port": port},
+            {"atyp": [atyp_b], "host": [host_b], "port": [port_b]},
+        )
+
+    def _store(self, wire: bytes) -> None:
+        values = self.values
+        atyp, host, port = values["atyp"], values["host"], values["port"]
+        encoded = (wire[:1], wire[1:-2], wire[-2:])
+        record = (atyp, host, port, encoded)
+        self.cache.put(record[:3], record)
+        # "127.1" and "127.0.0.1" encode alike, parsing gives the canonical one
+        if atyp == 1:
+            host = socket.inet_ntoa(encoded[1])
+        elif atyp == 4:
+            host = socket.inet_ntop(socket.AF_INET6, encoded[1])
+        if host != record[1]:
+            record = (atyp, host, port, encoded)
+        self.cache.put(wire, record)
+
     @classmethod
-    def from_tuple(cls, addr):
-        try:
-            return cls(1, *addr)
-        except OSError:
+    def get_value(cls):
+        "read the whole address at once and look it up in the cache"
+        head = yield from peek(2)
+        size = _wire_sizes.get(head[0])
+        if size is None:
+            if head[0] != 3:
+                # let the generic parser report the unknown address type
+                return (yield from schema.BinarySchemaMetaclass.get_value(cls))
+            size = 4 + head[1]
+        wire = yield from read(size)
+        record = cls.cache.get(wire)
+        if record is None:
+            # constructing the parsed object stores it in the cache
+            generic = schema.BinarySchemaMetaclass.get_value(cls)
             try:
-                return cls(4, *addr)
-            except OSError:
-                return cls(3, *addr)
+                return Parser(generic).parse(wire)
+            except ParseError as e:
+                # the offset into *wire*, the outer parser sets its own
+                e.offset = None
+                raise
+        addr = cls.__new__(cls)
+        addr._set_record(record)
+        return addr
+
+    @classmethod
+    def from_tuple(cls, addr: typing.Tuple[str, int]) -> "Addr":
+        host, port = addr
+        return cls(address_type(host), host, port)
+
+
+_wire_sizes = {1: 7, 4: 19}
+
+
+def address_type(host: str) -> int:
+    "classify *host* as IPv4 (1), IPv6 (4) or domain name (3) without probing"
+    if ":" in host:
+        return 4
+    parts = host.split(".")
+    if len(parts) != 4 or not host.replace(".", "").isdigit() or not host.isascii():
+        return 3
+    for part in parts:
+        if not part or len(part) > 3 or int(part) > 255:
+            return 3
+        if part[0] == "0" and part != "0":
+            return 3
+    return 1
@@ -0,0 +1,308 @@
+"""HTTP/1.1 message parsing for pipelined keep-alive connections.
+
+`server` parses requests and `client` parses responses. Both keep parsing
+messages on one parser and emit each message as a sequence of results: the
+head (`Request` or `Response`), body chunks as `bytes` while they arrive, then
+`END_OF_MESSAGE`. Header blocks are kept raw and only decoded on access.
+"""
+
+from __future__ import annotations
+
+import re
+
+from .. import get_parser, parser, read, read_until, read_upto
+from ..exceptions import ParseError
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+MAX_HEAD_SIZE = 65536
+MAX_HEADERS = 100
+CHUNK_SIZE = 65536
+_NO_BODY_STATUS = frozenset([204, 304])
+# hex digits only: int() also takes "0x5", "+5", "0_5" and surrounding spaces,
+# which a proxy may read differently; 16 digits cover 64 bits
+_CHUNK_SIZE = re.compile(rb"[0-9A-Fa-f]{1,16}")
+
+
+class EndOfMessage:
+    "marks the end of a message body"
+
+    def __repr__(self):
+        return "END_OF_MESSAGE"
+
+
+END_OF_MESSAGE = EndOfMessage()
+
+
+class Headers:
+    """a raw header block, decoded into a dict of lowercase names to lists of
+    values on first access"""
+
+    __slots__ = ("raw", "_lowered", "_dict")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._lowered: typing.Optional[bytes] = None
+        self._dict: typing.Optional[typing.Dict[str, typing.List[str]]] = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__qualname__}({self.raw!r})>"
+
+    def __len__(self):
+        return sum(len(values) for values in self._parse().values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._parse()
+
+    def __getitem__(self, name: str) -> str:
+        "the values of *name* joined by commas"
+        return ", ".join(self._parse()[name.lower()])
+
+    def get(self, name: str, default: typing.Any = None) -> typing.Any:
+        values = self._parse().get(name.lower())
+        return default if values is None else ", ".join(values)
+
+    def get_all(self, name: str) -> typing.List[str]:
+        return list(self._parse().get(name.lower(), ()))
+
+    def items(self) -> typing.Iterator[typing.Tuple[str, str]]:
+        for name, values in self._parse().items():
+            for value in values:
+                yield name, value
+
+    def _parse(self) -> typing.Dict[str, typing.List[str]]:
+        if self._dict is None:
+            headers: typing.Dict[str, typing.List[str]] = {}
+            for line in self.raw.split(b"\r\n") if self.raw else ():
+                name, sep, value = line.partition(b":")
+                if not sep or not name or name != name.rstrip():
+                    raise ParseError(f"invalid header line: {line!r}")
+                key = name.decode("latin-1").lower()
+                headers.setdefault(key, []).append(value.strip().decode("latin-1"))
+            self._dict = headers
+        return self._dict
+
+    def raw_values(self, name: bytes) -> typing.List[bytes]:
+        """values of the lowercase *name* without decoding the whole block,
+        used for the headers that decide message framing"""
+        if self._dict is not None:
+            return [
+                value.encode("latin-1") for value in self._dict.get(name.decode(), ())
+            ]
+        if self._lowered is None:
+            self._lowered = b"\r\n" + self.raw.lower()
+        lowered = self._lowered
+        prefix = b"\r\n" + name
+        values = []
+        index = lowered.find(prefix)
+        while index != -1:
+            start = index + len(prefix)
+            separator = lowered[start : start + 1]
+            if separator == b":":
+                end = lowered.find(b"\r\n", start)
+                # *lowered* is offset by 2, values keep their original case
+                values.append(
+                    self.raw[start - 1 : None if end == -1 else end - 2].strip()
+                )
+            elif separator in (b" ", b"\t"):
+                # a lenient peer may still read it as *name*
+                raise ParseError(f"whitespace after header name {name!r}")
+            index = lowered.find(prefix, start)
+        return values
+
+
+class _Message:
+    __slots__ = ("version", "headers", "head")
+
+    def _framing(self) -> typing.Tuple[bool, typing.Optional[int]]:
+        "return (chunked, content length)"
+        headers = self.headers
+        encodings = headers.raw_values(b"transfer-encoding")
+        lengths = headers.raw_values(b"content-length")
+        if encodings:
+            codings = b",".join(encodings).lower().split(b",")
+            chunked = codings[-1].strip() == b"chunked"
+            if isinstance(self, Request) and (not chunked or lengths):
+                # ambiguous framing lets requests be smuggled past a proxy
+                raise ParseError(f"invalid transfer-encoding for a request: {codings}")
+            return chunked, None
+        if not lengths:
+            return False, None
+        values = {value.strip() for value in b",".join(lengths).split(b",")}
+        if len(values) != 1:
+            raise ParseError(f"conflicting content lengths: {lengths}")
+        (value,) = values
+        if not value.isdigit():
+            raise ParseError(f"invalid content length: {value!r}")
+        return False, int(value)
+
+    @property
+    def keep_alive(self) -> bool:
+        "whether the connection stays open after this message"
+        values = self.headers.raw_values(b"connection")
+        if not values:
+            return self.version != b"HTTP/1.0"
+        tokens = b",".join(values).lower()
+        options = {token.strip() for token in tokens.split(b",")}
+        if self.version == b"HTTP/1.0":
+            return b"keep-alive" in options
+        return b"close" not in options
+
+
+class Request(_Message):
+    __slots__ = ("method", "target")
+
+    def __init__(
+        self,
+        method: bytes,
+        target: bytes,
+        version: bytes,
+        headers: Headers,
+        head: bytes,
+    ):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.head = head  # the raw head, to forward the request unchanged
+
+    def __repr__(self):
+        return f"<Request({self.method!r}, {self.target!r}, {self.version!r})>"
+
+
+class Response(_Message):
+    __slots__ = ("status", "reason")
+
+    def __init__(
+        self, version: bytes, status: int, reason: bytes, headers: Headers, head: bytes
+    ):
+        self.version = version
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.head = head  # the raw head, to forward the response unchanged
+
+    def __repr__(self):
+        return f"<Response({self.version!r}, {self.status}, {self.reason!r})>"
+
+
+def _read_head(
+    max_head_size: int, max_headers: int
+) -> typing.Generator[tuple, typing.Any, typing.Tuple[bytes, Headers, bytes]]:
+    "return the start line, the headers and the raw head"
+    head = yield from read_until(b"\r\n\r\n", limit=max_head_size)
+    while head.startswith(b"\r\n"):
+        # tolerate empty lines between pipelined messages
+        head = head[2:]
+        if not head.endswith(b"\r\n\r\n"):
+            head += yield from read_until(b"\r\n\r\n", limit=max_head_size - len(head))
+    start_line, _, raw = head[:-4].partition(b"\r\n")
+    if raw.count(b"\r\n") >= max_headers:
+        raise ParseError(f"more than {max_headers} headers")
+    if raw[:1] in (b" ", b"\t") or b"\r\n " in raw or b"\r\n\t" in raw:
+        raise ParseError("obsolete header line folding")
+    return start_line, Headers(raw), head
+
+
+def _read_body(
+    parser,
+    chunked: bool,
+    length: typing.Optional[int],
+    chunk_size: int,
+    max_head_size: int,
+) -> typing.Generator:
+    "emit body chunks, *length* None means until EOF"
+    if chunked:
+        while True:
+            line = yield from read_until(b"\r\n", limit=max_head_size)
+            size_field = line[:-2].split(b";", 1)[0]
+            if not _CHUNK_SIZE.fullmatch(size_field):
+                raise ParseError(f"invalid chunk size: {size_field!r}")
+            remaining = int(size_field, 16)
+            if remaining == 0:
+                break
+            while remaining:
+                data = yield from read_upto(min(remaining, chunk_size))
+                remaining -= len(data)
+                parser.respond(result=data)
+            if (yield from read(2)) != b"\r\n":
+                raise ParseError("missing CRLF after chunk data")
+        # trailer fields are dropped
+        while (yield from read_until(b"\r\n", limit=max_head_size)) != b"\r\n":
+            pass
+    elif length is None:
+        while True:
+            parser.respond(result=(yield from read_upto(chunk_size)))
+    else:
+        while length:
+            data = yield from read_upto(min(length, chunk_size))
+            length -= len(data)
+            parser.respond(result=data)
+
+
+@parser
+def server(
+    *,
+    max_head_size: int = MAX_HEAD_SIZE,
+    max_headers: int = MAX_HEADERS,
+    chunk_size: int = CHUNK_SIZE,
+) -> typing.Generator:
+    """parse pipelined requests until one does not keep the connection alive;
+    its `END_OF_MESSAGE` is the parser's result and the bytes after it are
+    left in the parser"""
+    parser = yield from get_parser()
+    while True:
+        start_line, headers, head = yield from _read_head(max_head_size, max_headers)
+        parts = start_line.split(b" ")
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/1."):
+            raise ParseError(f"invalid request line: {start_line!r}")
+        request = Request(parts[0], parts[1], parts[2], headers, head)
+        chunked, length = request._framing()
+        parser.respond(result=request)
+        if chunked or length:
+            yield from _read_body(parser, chunked, length, chunk_size, max_head_size)
+        if not request.keep_alive:
+            return END_OF_MESSAGE
+        parser.respond(result=END_OF_MESSAGE)
+
+
+@parser
+def client(
+    *,
+    request_methods: typing.Optional[typing.Deque[bytes]] = None,
+    max_head_size: int = MAX_HEAD_SIZE,
+    max_headers: int = MAX_HEADERS,
+    chunk_size: int = CHUNK_SIZE,
+) -> typing.Generator:
+    """parse pipelined responses until one does not keep the connection alive
+    or switches protocols, like `server`; append the method of each request
+    sent to *request_methods* so responses to HEAD are known to have no body"""
+    parser = yield from get_parser()
+    while True:
+        start_line, headers, head = yield from _read_head(max_head_size, max_headers)
+        version, _, rest = start_line.partition(b" ")
+        status, _, reason = rest.partition(b" ")
+        if not version.startswith(b"HTTP/1.") or len(status) != 3:
+            raise ParseError(f"invalid status line: {start_line!r}")
+        try:
+            response = Response(version, int(status), reason, headers, head)
+        except ValueError:
+            raise ParseError(f"invalid status line: {start_line!r}") from None
+        parser.respond(result=response)
+        if response.status < 200:
+            if response.status == 101:
+                return END_OF_MESSAGE  # the connection switched protocols
+            parser.respond(result=END_OF_MESSAGE)
+            continue
+        method = request_methods.popleft() if request_methods else None
+        if method == b"HEAD" or response.status in _NO_BODY_STATUS:
+            chunked, length = False, 0
+        else:
+            chunked, length = response._framing()
+        if chunked or length != 0:
+            yield from _read_body(parser, chunked, length, chunk_size, max_head_size)
+        if not response.keep_alive:
+            return END_OF_MESSAGE
+        parser.respond(result=END_OF_MESSAGE)
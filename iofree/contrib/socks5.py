@@ -32,10 +32,21 @@
 # +----+------+------+----------+----------+----------+
 # | 2  |  1   |  1   | Variable |    2     | Variable |
 # +----+------+------+----------+----------+----------+
+from __future__ import annotations
+
 import enum
+import socket
+import struct
+
+from .. import get_parser, parser, schema, wait_event, yield_result
+from ..exceptions import ParseError
+from .common import Addr, LRUCache
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
 
-from .. import schema
-from .common import Addr
+_port = struct.Struct(">H")
 
 
 class AuthMethod(enum.IntEnum):
@@ -83,7 +94,7 @@ class UsernameAuth(schema.BinarySchema):
 
 class UsernameAuthReply(schema.BinarySchema):
     auth_ver = schema.MustEqual(schema.uint8, 1)
-    status = schema.MustEqual(schema.uint8, 0)
+    status = schema.uint8  # 0 means success
 
 
 class ClientRequest(schema.BinarySchema):
@@ -105,3 +116,174 @@ class UDPRelay(schema.BinarySchema):
     flag = schema.uint8
     addr = Addr
     data = schema.Bytes(-1)
+
+
+# replies of the server and requests of the client are nearly constant
+_selection = ServerSelection.template()
+_auth_succeeded = UsernameAuthReply.template(status=0).render()
+_auth_failed = UsernameAuthReply.template(status=1).render()
+_client_request = ClientRequest.template()
+
+
+class UDPRelayCodec:
+    """a fast path for `UDPRelay` datagrams: headers are parsed in place, the
+    payload is returned as a view of the datagram, and encoded headers of
+    recent destinations are kept in an LRU cache"""
+
+    def __init__(self, *, cache_size: int = 1024):
+        self.header_cache = LRUCache(cache_size)
+
+    def decode(
+        self, datagram: typing.Union[bytes, bytearray, memoryview]
+    ) -> typing.Tuple[int, typing.Tuple[str, int], memoryview]:
+        "return ``(frag, (host, port), payload)``"
+        view = memoryview(datagram)
+        try:
+            if view[0] or view[1]:
+                raise ParseError(f"reserved bytes must be zero: {bytes(view[:2])!r}")
+            atyp = view[3]
+            if atyp == 1:
+                host = socket.inet_ntoa(view[4:8])
+                offset = 8
+            elif atyp == 4:
+                host = socket.inet_ntop(socket.AF_INET6, view[4:20])
+                offset = 20
+            elif atyp == 3:
+                offset = 5 + view[4]
+                host = str(view[5:offset], "utf-8")
+            else:
+                raise ParseError(f"unknown address type: {atyp}")
+            (port,) = _port.unpack_from(view, offset)
+        except (IndexError, ValueError, OSError, struct.error) as e:
+            raise ParseError(f"malformed datagram: {e}") from e
+        return view[2], (host, port), view[offset + 2 :]
+
+    def header(self, addr: typing.Tuple[str, int], frag: int = 0) -> bytes:
+        "the encoded header for *addr*, cached for repeated destinations"
+        key = (addr[0], addr[1], frag)
+        header = self.header_cache.get(key)
+        if header is None:
+            header = UDPRelay(..., frag, Addr.from_tuple(addr), b"").binary
+            self.header_cache.put(key, header)
+        return header
+
+    def encode(
+        self, addr: typing.Tuple[str, int], data: bytes, frag: int = 0
+    ) -> typing.List[bytes]:
+        "buffers of a datagram for *addr*, suitable for `socket.sendmsg`"
+        return [self.header(addr, frag), data]
+
+
+def _flush(parser, pending: typing.List[bytes]) -> None:
+    "write pending replies, unless the peer already sent its next message"
+    if pending and not parser.has_more_data():
+        parser.respond(data=b"".join(pending))
+        pending.clear()
+
+
+@parser
+def server(
+    authenticate: typing.Optional[typing.Callable[[str, str], bool]] = None,
+) -> typing.Generator[tuple, typing.Any, typing.Optional[ClientRequest]]:
+    """server side negotiation, *authenticate(username, password)* enables
+    RFC 1929 authentication.
+
+    The `ClientRequest` is yielded as a result, then the server waits for a
+    `Reply` event (two for BIND) sent with `Parser.send_event`. Replies to a
+    client that pipelines its messages are coalesced into a single write.
+    The request is returned once the last reply is written; whatever the
+    client sent after it is left in the parser for `readall` and the relay.
+    """
+    parser = yield from get_parser()
+    pending: typing.List[bytes] = []
+    handshake = yield from Handshake
+    method = AuthMethod.no_auth if authenticate is None else AuthMethod.user_auth
+    if method not in handshake.methods:
+        parser.respond(
+            data=_selection.render(method=AuthMethod.no_acceptable_method),
+            close=True,
+            exc=ParseError(f"no acceptable method in {handshake.methods}"),
+        )
+        return None
+    pending.append(_selection.render(method=method))
+    _flush(parser, pending)
+    if authenticate is not None:
+        auth = yield from UsernameAuth
+        if not authenticate(auth.username, auth.password):
+            pending.append(_auth_failed)
+            parser.respond(
+                data=b"".join(pending),
+                close=True,
+                exc=ParseError(f"authentication failed: {auth.username!r}"),
+            )
+            return None
+        pending.append(_auth_succeeded)
+        _flush(parser, pending)
+    request = yield from ClientRequest
+    yield from yield_result(request)
+    for _ in range(2 if request.cmd == Cmd.bind else 1):
+        reply = yield from wait_event()
+        pending.append(reply.binary)
+        failed = reply.rep != Rep.succeeded
+        parser.respond(data=b"".join(pending), close=failed)
+        pending.clear()
+        if failed:
+            break
+    return request
+
+
+@parser
+def client(
+    addr: typing.Tuple[str, int],
+    cmd: Cmd = Cmd.connect,
+    *,
+    username: typing.Optional[str] = None,
+    password: str = "",
+    pipeline: bool = True,
+) -> typing.Generator[tuple, typing.Any, typing.Optional[Reply]]:
+    """client side negotiation, call `Parser.send` once to emit the handshake.
+
+    With *pipeline*, a single authentication method is offered and the
+    handshake, authentication and request are written at once instead of
+    waiting a round trip for each reply. The final `Reply` is returned (for
+    BIND the first one is yielded as a result); data the server sent after
+    it is left in the parser for `readall` and the relay.
+    """
+    parser = yield from get_parser()
+    if username is None:
+        method = AuthMethod.no_auth
+        auth = b""
+    else:
+        method = AuthMethod.user_auth
+        auth = UsernameAuth(..., username, password).binary
+    request = _client_request.render(cmd=cmd, addr=Addr.from_tuple(addr))
+    if pipeline:
+        parser.respond(data=Handshake(..., [method]).binary + auth + request)
+    else:
+        methods = [AuthMethod.no_auth] if auth else []
+        parser.respond(data=Handshake(..., methods + [method]).binary)
+    selection = yield from ServerSelection
+    if selection.method not in (method, AuthMethod.no_auth) or (
+        pipeline and selection.method != method
+    ):
+        parser.respond(
+            close=True, exc=ParseError(f"server selected {selection.method!r}")
+        )
+        return None
+    if selection.method == AuthMethod.user_auth:
+        if not pipeline:
+            parser.respond(data=auth)
+        auth_reply = yield from UsernameAuthReply
+        if auth_reply.status != 0:
+            parser.respond(close=True, exc=ParseError("authentication failed"))
+            return None
+    if not pipeline:
+        parser.respond(data=request)
+    reply = yield from Reply
+    if cmd == Cmd.bind and reply.rep == Rep.succeeded:
+        yield from yield_result(reply)
+        reply = yield from Reply
+    if reply.rep != Rep.succeeded:
+        parser.respond(close=True, exc=ParseError(f"request failed: {reply.rep!r}"))
+        return None
+    return reply
@@ -0,0 +1,185 @@
+"""TLS record framing and a ClientHello peek for SNI routing.
+
+`RecordFramer` splits a TLS stream into whole records. `client_hello` peeks
+at the ClientHello at the start of a connection and extracts the server name
+and ALPN protocols, skipping every other extension without decoding it. The
+bytes stay in the parser, so they can be forwarded unchanged:
+
+    parser = tls.client_hello.parser()
+    parser.send(data)
+    if parser.has_result:
+        hello = parser.get_result()
+        upstream = route(hello.server_name)
+        relay_both(client_sock, upstream, client_data=parser.detach())
+"""
+
+from __future__ import annotations
+
+import struct
+
+from .. import parser, peek
+from ..exceptions import ParseError
+from ..framing import Framer
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+CHANGE_CIPHER_SPEC = 20
+ALERT = 21
+HANDSHAKE = 22
+APPLICATION_DATA = 23
+CLIENT_HELLO = 1
+EXT_SERVER_NAME = 0
+EXT_ALPN = 16
+RECORD_HEADER_SIZE = 5
+# the largest TLSCiphertext fragment allowed by TLS 1.2 (RFC 5246)
+MAX_RECORD_SIZE = 2**14 + 2048
+MAX_HELLO_SIZE = 65536
+
+_uint16 = struct.Struct(">H").unpack_from
+_uint16_pair = struct.Struct(">HH").unpack_from
+_uint32 = struct.Struct(">I").unpack_from
+
+
+class RecordFramer(Framer):
+    """split a TLS stream into whole records, header included; the content
+    type of a record is its first byte"""
+
+    def __init__(self, *, max_length: typing.Optional[int] = MAX_RECORD_SIZE):
+        super().__init__(max_length=max_length)
+
+    def _split(self, buf, frames: typing.List[bytes]) -> int:
+        size = len(buf)
+        pos = 0
+        while size - pos >= RECORD_HEADER_SIZE:
+            (length,) = _uint16(buf, pos + 3)
+            self._check_length(length)
+            end = pos + RECORD_HEADER_SIZE + length
+            if end > size:
+                break
+            frames.append(bytes(buf[pos:end]))
+            pos = end
+        return pos
+
+
+class ClientHello:
+    "what routing needs from a ClientHello"
+
+    __slots__ = ("version", "server_name", "alpn_protocols", "size")
+
+    def __init__(
+        self,
+        version: int,
+        server_name: typing.Optional[str],
+        alpn_protocols: typing.List[bytes],
+        size: int,
+    ):
+        self.version = version  # legacy_version, 0x0303 for TLS 1.2 and 1.3
+        self.server_name = server_name
+        self.alpn_protocols = alpn_protocols
+        self.size = size  # bytes of the records that carry the ClientHello
+
+    def __repr__(self):
+        return (
+            f"<ClientHello({self.version:#06x}, {self.server_name!r}, "
+            f"{self.alpn_protocols!r}, size={self.size})>"
+        )
+
+
+@parser
+def client_hello(*, max_size: int = MAX_HELLO_SIZE) -> typing.Generator:
+    """peek at the ClientHello, which may span several handshake records,
+    and return a `ClientHello`; no input is consumed"""
+    needed = 0  # the size of the records peeked so far
+    fragments = []
+    received = 0
+    total = None  # the size of the handshake message
+    while total is None or received < total:
+        header = (yield from peek(needed + RECORD_HEADER_SIZE))[needed:]
+        (length,) = _uint16(header, 3)
+        if header[0] != HANDSHAKE or header[1] != 3:
+            raise ParseError(f"not a TLS handshake record: {header!r}")
+        if length == 0 or length > MAX_RECORD_SIZE:
+            raise ParseError(f"invalid TLS record length: {length}")
+        data = yield from peek(needed + RECORD_HEADER_SIZE + length)
+        fragments.append(data[needed + RECORD_HEADER_SIZE :])
+        needed += RECORD_HEADER_SIZE + length
+        received += length
+        if total is None and received >= 4:
+            first = fragments[0] if len(fragments) == 1 else b"".join(fragments)
+            (word,) = _uint32(first)  # msg_type and a 24-bit length
+            if word >> 24 != CLIENT_HELLO:
+                raise ParseError(f"not a ClientHello: {word >> 24}")
+            total = 4 + (word & 0xFFFFFF)
+            if total > max_size:
+                raise ParseError(f"ClientHello of {total} bytes exceeds {max_size}")
+    message = fragments[0] if len(fragments) == 1 else b"".join(fragments)
+    return _parse_client_hello(message, total, needed)
+
+
+def _parse_client_hello(message: bytes, end: int, size: int) -> ClientHello:
+    "extract the fields of a ClientHello handshake *message* ending at *end*"
+    server_name = None
+    alpn_protocols: typing.List[bytes] = []
+    try:
+        (version,) = _uint16(message, 4)
+        pos = 38  # after the header, legacy_version and random
+        pos += 1 + message[pos]  # legacy_session_id
+        pos += 2 + _uint16(message, pos)[0]  # cipher_suites
+        pos += 1 + message[pos]  # legacy_compression_methods
+        if pos < end:
+            extensions_end = pos + 2 + _uint16(message, pos)[0]
+            if extensions_end != end:
+                raise ParseError("invalid ClientHello extensions length")
+            pos += 2
+            while pos < extensions_end:
+                ext_type, ext_length = _uint16_pair(message, pos)
+                pos += 4
+                ext_end = pos + ext_length
+                if ext_end > extensions_end:
+                    raise ParseError(f"truncated ClientHello extension {ext_type}")
+                if ext_type == EXT_SERVER_NAME:
+                    server_name = _server_name(message, pos, ext_end)
+                elif ext_type == EXT_ALPN:
+                    alpn_protocols = _alpn_protocols(message, pos, ext_end)
+                pos = ext_end
+        elif pos > end:
+            raise ParseError("truncated ClientHello")
+    except (IndexError, struct.error):
+        raise ParseError("truncated ClientHello") from None
+    return ClientHello(version, server_name, alpn_protocols, size)
+
+
+def _server_name(message: bytes, pos: int, end: int) -> typing.Optional[str]:
+    "the host_name of a server_name extension (RFC 6066)"
+    if pos + 2 + _uint16(message, pos)[0] != end:
+        raise ParseError("invalid server_name extension")
+    pos += 2
+    while pos < end:
+        name_type = message[pos]
+        name_end = pos + 3 + _uint16(message, pos + 1)[0]
+        if name_end > end:
+            raise ParseError("invalid server_name extension")
+        if name_type == 0:
+            try:
+                return message[pos + 3 : name_end].decode("ascii")
+            except UnicodeDecodeError:
+                raise ParseError("invalid host_name") from None
+        pos = name_end
+    return None
+
+
+def _alpn_protocols(message: bytes, pos: int, end: int) -> typing.List[bytes]:
+    "the protocol names of an ALPN extension (RFC 7301)"
+    if pos + 2 + _uint16(message, pos)[0] != end:
+        raise ParseError("invalid ALPN extension")
+    pos += 2
+    protocols = []
+    while pos < end:
+        name_end = pos + 1 + message[pos]
+        if name_end > end:
+            raise ParseError("invalid ALPN extension")
+        protocols.append(message[pos + 1 : name_end])
+        pos = name_end
+    return protocols
@@ -0,0 +1,131 @@
+"""Protocol sniffing: pick the parser for a connection by its first bytes.
+
+A `Dispatcher` compiles a table of prefix signatures once and is shared by
+all connections; each connection gets a `DispatchParser`, which buffers input
+until one prefix matches, creates that parser and hands it the buffer without
+copying:
+
+    dispatcher = Dispatcher({
+        b"\\x05": socks5.server.parser,
+        b"\\x16\\x03": tls_parser,
+        (b"GET ", b"POST ", b"HEAD "): http.server.parser,
+    })
+    parser = dispatcher.parser()
+    parser.send(data)
+    if parser.chosen is not None:
+        ...
+"""
+
+from __future__ import annotations
+
+from . import Parser
+from .exceptions import NoResult, ParseError
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+    ParserFactory = typing.Callable[[], Parser]
+
+
+class Dispatcher:
+    """*candidates* maps a prefix, or a tuple of prefixes, to a callable that
+    creates the parser for it; the longest matching prefix wins. Input that
+    matches no prefix goes to *default*, or raises *ParseError* without it."""
+
+    def __init__(
+        self,
+        candidates: typing.Mapping[
+            typing.Union[bytes, typing.Tuple[bytes, ...]], ParserFactory
+        ],
+        *,
+        default: typing.Optional[ParserFactory] = None,
+    ):
+        self.default = default
+        # the first byte selects the prefixes worth comparing, longest first
+        self._table: typing.Dict[int, typing.List[typing.Tuple[bytes, typing.Any]]] = {}
+        for prefixes, factory in candidates.items():
+            if isinstance(prefixes, bytes):
+                prefixes = (prefixes,)
+            for prefix in prefixes:
+                if not prefix:
+                    raise ValueError("empty prefix, use default instead")
+                self._table.setdefault(prefix[0], []).append((prefix, factory))
+        for entries in self._table.values():
+            entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+
+    def match(self, data: bytes) -> typing.Optional[ParserFactory]:
+        """return the factory for input starting with *data*, None if more
+        bytes are needed to decide"""
+        if not data:
+            return None
+        size = len(data)
+        for prefix, factory in self._table.get(data[0], ()):
+            if size < len(prefix):
+                if data == prefix[:size]:
+                    return None  # a longer prefix may still match
+            elif data.startswith(prefix):
+                return factory
+        if self.default is None:
+            raise ParseError(f"unknown protocol: {bytes(data[:16])!r}")
+        return self.default
+
+    def parser(self) -> "DispatchParser":
+        "a parser for one connection"
+        return DispatchParser(self)
+
+
+class DispatchParser:
+    """buffers input until the protocol is known, then passes everything to
+    the chosen parser, `chosen`"""
+
+    def __init__(self, dispatcher: Dispatcher):
+        self.dispatcher = dispatcher
+        self.chosen: typing.Optional[Parser] = None
+        self._input = bytearray()
+
+    def __repr__(self):
+        return f"<{self.__class__.__qualname__}({self.chosen})>"
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        if self.chosen is None:
+            raise StopIteration
+        return next(self.chosen)
+
+    def send(self, data: bytes = b"") -> None:
+        if self.chosen is not None:
+            self.chosen.send(data)
+            return
+        self._input.extend(data)
+        factory = self.dispatcher.match(self._input)
+        if factory is not None:
+            self.chosen = factory()
+            self.chosen.adopt_input(self._input)
+            self._input = None
+
+    def results(self) -> typing.Iterator[typing.Any]:
+        return iter(()) if self.chosen is None else self.chosen.results()
+
+    def has_more_data(self) -> bool:
+        if self.chosen is None:
+            return len(self._input) > 0
+        return self.chosen.has_more_data()
+
+    def readall(self) -> bytes:
+        if self.chosen is not None:
+            return self.chosen.readall()
+        data = bytes(self._input)
+        del self._input[:]
+        return data
+
+    def get_result(self) -> typing.Any:
+        """
+        raises *NoResult* exception if the protocol is unknown yet or the
+        chosen parser has no result
+        """
+        if self.chosen is None:
+            raise NoResult("no result")
+        return self.chosen.get_result()
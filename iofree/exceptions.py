@@ -3,4 +3,29 @@ class NoResult(Exception):
 
 
 class ParseError(Exception):
-    """"""
+    """
+    malformed input; a schema sets the *field* of its *schema* class that
+    failed and the *values* parsed before it, the parser sets the *offset*
+    of the input consumed when it was raised; the message is only formatted
+    when it is shown
+    """
+
+    # class attributes, so that raising one stays as cheap as a plain exception
+    schema = None
+    field = None
+    values = None
+    offset = None
+
+    def __str__(self):
+        message = super().__str__()
+        if len(self.args) == 1 and isinstance(self.args[0], Exception):
+            message = f"{self.args[0].__class__.__name__}: {message}"
+        if self.schema is not None:
+            message = f"{self.schema.__name__}.{self.field}: {message}"
+        if self.offset is not None:
+            message = f"{message} (at offset {self.offset})"
+        return message
+
+
+class Timeout(ParseError):
+    "thrown into a parser's generator when its deadline has passed"
@@ -0,0 +1,266 @@
+"""A flat, resumable interpreter for schemas.
+
+`BinarySchemaMetaclass.get_value` runs one generator per level of nesting:
+a request holding an address whose host is a `Switch` case made of a
+`LengthPrefixedString` over `LengthPrefixedBytes` is five generators deep,
+and every resume after partial input passes down the whole chain. A
+`Program` lowers a schema once into a flat tuple of instructions, run by a
+single loop whose state is an instruction pointer and a stack of the values
+parsed so far; a read that waits for input suspends that one generator, and
+resuming continues at the pending instruction however deep its field is:
+
+    program = Program(Message)  # once, programs are immutable
+    parser = program.get_parser()
+    parser.send(data)
+    message = parser.get_result()
+
+The result, and the schema, field and values of the `ParseError` of
+malformed input, are those of `Message.parse`; fixed-size fields are read
+together across nested schemas, so the offset of an error may be further
+on. Fields the program cannot lower (custom units, schemas with their own
+`get_value`, length-prefixed object lists, ...) run as nested generators
+from a single instruction.
+"""
+
+from __future__ import annotations
+
+from . import Parser, Traps
+from .exceptions import ParseError
+from .schema import (
+    BinarySchemaMetaclass,
+    Convert,
+    EndWith,
+    LengthPrefixedBytes,
+    MustEqual,
+    SizedIntEnum,
+    Switch,
+    _check_length,
+    _locate,
+    _StructRun,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+    from .schema import FieldType
+
+    # the schema, index of the field and stack position of its first value
+    _Location = typing.Optional[typing.Tuple[BinarySchemaMetaclass, int, int]]
+
+# instructions are ``(op, arg, extra)``
+_STRUCT = 0  # push the items of struct *arg*, each decoded by *extra*
+_SWITCH = 1  # jump to *extra*[value at stack position *arg*]
+_JUMP = 2  # jump to *arg*
+_PAYLOAD = 3  # replace the length on top by that many bytes, at most *arg*
+_CONVERT = 4  # replace the value on top by *arg*(value)
+_CHECK = 5  # fail unless the value on top equals *arg*
+_BUILD = 6  # replace the values from stack position *arg* by *extra*(*values)
+_UNTIL = 7  # push the bytes up to delimiter *arg*
+_FIELD = 8  # push the value of the generator of unit *arg*
+
+_read = Traps._read
+_read_struct = Traps._read_struct
+_read_until = Traps._read_until
+
+
+class Program:
+    "the instructions parsing *schema*, see the module documentation"
+
+    def __init__(self, schema: BinarySchemaMetaclass):
+        self.schema = schema
+        lowering = _Lowering()
+        lowering.field(schema, None)
+        lowering.flush()
+        self._code = tuple(tuple(instruction) for instruction in lowering.code)
+        # ``(stack depth, locations)`` of each instruction, for errors; a
+        # struct read has the location of each item it pushes
+        self._where = tuple(lowering.where)
+        self.min_size = schema.min_size
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__qualname__}({self.schema.__name__}, "
+            f"{len(self._code)} instructions)>"
+        )
+
+    def __iter__(self):
+        return self.get_value()
+
+    def get_value(self) -> typing.Generator[tuple, typing.Any, typing.Any]:
+        "get the schema object from bytes"
+        code = self._code
+        end = len(code)
+        stack: typing.List[typing.Any] = []
+        ip = 0
+        try:
+            while ip < end:
+                op, arg, extra = code[ip]
+                ip += 1
+                if op == _STRUCT:
+                    items = yield (_read_struct, arg, None)
+                    if extra is None:
+                        stack.extend(items)
+                    else:
+                        for decode, item in zip(extra, items):
+                            stack.append(item if decode is None else decode(item))
+                elif op == _SWITCH:
+                    ip = extra[stack[arg]]
+                elif op == _JUMP:
+                    ip = arg
+                elif op == _PAYLOAD:
+                    length = stack[-1]
+                    _check_length(length, 0, arg)
+                    # reading 0 bytes would read all of them
+                    stack[-1] = (yield (_read, length, None)) if length else b""
+                elif op == _CONVERT:
+                    stack[-1] = arg(stack[-1])
+                elif op == _CHECK:
+                    if arg != stack[-1]:
+                        raise ValueError(f"expect {arg}, got {stack[-1]}")
+                elif op == _BUILD:
+                    obj = extra(*stack[arg:])
+                    del stack[arg:]
+                    stack.append(obj)
+                elif op == _UNTIL:
+                    stack.append((yield (_read_until, arg, False, None)))
+                else:
+                    stack.append((yield from arg.get_value()))
+        except Exception as e:
+            depth, locations = self._where[ip - 1]
+            location = locations[min(max(len(stack) - depth, 0), len(locations) - 1)]
+            if location is None:
+                raise
+            schema, index, base = location
+            field, values = schema._names[index], stack[base : base + index]
+            if isinstance(e, ParseError):
+                _locate(e, schema, field, values)
+                raise
+            raise _locate(ParseError(e), schema, field, values) from e
+        return stack[0]
+
+    def get_parser(self, *, pool=None, fail_fast: bool = False) -> Parser:
+        "the parser waits once until `min_size` bytes are buffered"
+        return Parser(
+            self.get_value(), pool=pool, min_size=self.min_size, fail_fast=fail_fast
+        )
+
+    def parse(self, data: bytes, *, strict: bool = True) -> typing.Any:
+        return self.get_parser().parse(data, strict=strict)
+
+
+def _lowerable(schema: BinarySchemaMetaclass) -> bool:
+    "whether the fields of *schema* can be inlined into a program"
+    schema._compile()
+    return (
+        getattr(schema.get_value, "__func__", None) is BinarySchemaMetaclass.get_value
+        and not schema._needs_mapping
+    )
+
+
+class _Lowering:
+    "emit the instructions of a schema, tracking the static stack depth"
+
+    def __init__(self):
+        self.code: typing.List[list] = []
+        self.where: typing.List[tuple] = []
+        self.depth = 0
+        self.run = _StructRun()
+        self.run_depth = 0
+        self.run_locations: typing.List[_Location] = []
+
+    def emit(
+        self, op: int, arg: typing.Any, extra: typing.Any, location: _Location
+    ) -> list:
+        self.flush()
+        instruction = [op, arg, extra]
+        self.code.append(instruction)
+        self.where.append((self.depth, (location,)))
+        return instruction
+
+    def flush(self) -> None:
+        "emit the pending struct read, merged from consecutive fixed-size items"
+        if not self.run.formats:
+            return
+        plan: typing.List[tuple] = []
+        self.run.flush(plan)
+        _, struct_obj, decoders = plan[0]
+        if all(decode is None for decode in decoders):
+            decoders = None
+        self.code.append([_STRUCT, struct_obj, decoders])
+        self.where.append((self.run_depth, tuple(self.run_locations)))
+        self.run_locations = []
+
+    def struct(self, fmt: typing.Tuple[str, typing.Any], location: _Location) -> bool:
+        "add an item to the pending struct read, false if it joins no run"
+        if not self.run.add(*fmt):
+            self.flush()
+            # a native size differing from the standard one joins no run
+            if not self.run.add(*fmt):
+                return False
+        if not self.run_locations:
+            self.run_depth = self.depth
+        self.run_locations.append(location)
+        self.depth += 1
+        return True
+
+    def schema(self, schema: BinarySchemaMetaclass, location: _Location) -> None:
+        "inline the fields of *schema*, then build it from their values"
+        base = self.depth
+        for index, (name, field) in enumerate(schema._fields.items()):
+            field_location = (schema, index, base)
+            if isinstance(field, Switch):
+                ref = base + schema._names.index(field.ref)
+                self.switch(field, ref, field_location)
+            else:
+                self.field(field, field_location)
+        self.emit(_BUILD, base, schema, location)
+        self.depth = base + 1
+
+    def switch(self, switch: Switch, ref: int, location: _Location) -> None:
+        targets: typing.Dict[typing.Any, int] = {}
+        self.emit(_SWITCH, ref, targets, location)
+        depth = self.depth
+        jumps = []
+        for key, case in switch.cases.items():
+            targets[key] = len(self.code)
+            self.depth = depth
+            self.field(case, location)
+            jumps.append(self.emit(_JUMP, None, None, location))
+        for jump in jumps:
+            jump[1] = len(self.code)
+        self.depth = depth + 1
+
+    def field(self, unit: FieldType, location: _Location) -> None:
+        "emit the instructions pushing the value of *unit*"
+        if isinstance(unit, BinarySchemaMetaclass):
+            if _lowerable(unit):
+                self.schema(unit, location)
+                return
+        else:
+            fmt = unit._struct_format()
+            if fmt is not None and self.struct(fmt, location):
+                return
+            get_value = type(unit).get_value
+            if get_value is LengthPrefixedBytes.get_value:
+                self.field(unit.length_unit, location)
+                self.emit(_PAYLOAD, unit.max_length, None, location)
+                return
+            if get_value is Convert.get_value:
+                self.field(unit.unit, location)
+                self.emit(_CONVERT, unit.decode, None, location)
+                return
+            if get_value is SizedIntEnum.get_value:
+                self.field(unit.size_unit, location)
+                self.emit(_CONVERT, unit.enum_class, None, location)
+                return
+            if get_value is MustEqual.get_value:
+                self.field(unit.unit, location)
+                self.emit(_CHECK, unit.value, None, location)
+                return
+            if get_value is EndWith.get_value:
+                self.emit(_UNTIL, unit.bytes_, None, location)
+                self.depth += 1
+                return
+        self.emit(_FIELD, unit, None, location)
+        self.depth += 1
@@ -0,0 +1,150 @@
+"""Framers split raw input into complete frames before any generator runs.
+
+A framer scans its buffer in a tight loop and returns every complete frame of
+a `feed` call at once. It also implements the small part of the `Parser`
+interface `ParserChain` relies on, so it can be the first stage of a chain:
+
+    chain = ParserChain(LengthPrefixedFramer(schema.uint16be), message_parser)
+"""
+
+from __future__ import annotations
+
+from collections import deque
+
+from .exceptions import ParseError
+from .schema import EndWith, IntUnit, StructUnit
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+
+class Framer:
+    "base class of framers, subclasses implement `_split`"
+
+    def __init__(self, *, max_length: typing.Optional[int] = None):
+        self.max_length = max_length
+        self._input = bytearray()
+        self._output_events: typing.Deque = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        if self._output_events:
+            return self._output_events.popleft()
+        raise StopIteration
+
+    def feed(self, data: bytes = b"") -> typing.List[bytes]:
+        "add data, return the frames completed by it"
+        frames: typing.List[bytes] = []
+        if self._input or isinstance(data, memoryview):
+            self._input.extend(data)
+            consumed = self._split(self._input, frames)
+            del self._input[:consumed]
+        else:
+            # nothing buffered: scan the data in place, keep only the tail
+            consumed = self._split(data, frames)
+            self._input.extend(memoryview(data)[consumed:])
+        return frames
+
+    def send(self, data: bytes = b"") -> None:
+        "like `Parser.send`, each frame becomes a result event"
+        for frame in self.feed(data):
+            self._output_events.append((b"", False, None, frame))
+
+    def has_more_data(self) -> bool:
+        "indicate whether an incomplete frame is buffered"
+        return len(self._input) > 0
+
+    def readall(self) -> bytes:
+        "retrieve the buffered bytes of an incomplete frame"
+        data = bytes(self._input)
+        del self._input[:]
+        return data
+
+    def _split(self, buf, frames: typing.List[bytes]) -> int:
+        "append complete frames of *buf* to *frames*, return bytes consumed"
+        raise NotImplementedError
+
+    def _check_length(self, length: int) -> None:
+        if length < 0 or (self.max_length is not None and length > self.max_length):
+            raise ParseError(f"frame length {length} exceeds {self.max_length}")
+
+
+class LengthPrefixedFramer(Framer):
+    "split frames prefixed by their length, the prefix is not part of the frame"
+
+    def __init__(
+        self,
+        length_unit: typing.Union[StructUnit, IntUnit],
+        *,
+        max_length: typing.Optional[int] = None,
+    ):
+        super().__init__(max_length=max_length)
+        self.length_unit = length_unit
+        if isinstance(length_unit, StructUnit):
+            self._unpack_from = length_unit._struct.unpack_from
+            self._prefix_size = length_unit._struct.size
+        elif isinstance(length_unit, IntUnit):
+            self._unpack_from = None
+            self._prefix_size = length_unit.length
+        else:
+            raise TypeError(f"unsupported length unit: {length_unit}")
+
+    def _split(self, buf, frames: typing.List[bytes]) -> int:
+        unpack_from = self._unpack_from
+        prefix_size = self._prefix_size
+        size = len(buf)
+        pos = 0
+        while size - pos >= prefix_size:
+            if unpack_from is not None:
+                (length,) = unpack_from(buf, pos)
+            else:
+                length = int.from_bytes(
+                    buf[pos : pos + prefix_size],
+                    self.length_unit.byteorder,
+                    signed=self.length_unit.signed,
+                )
+            self._check_length(length)
+            end = pos + prefix_size + length
+            if end > size:
+                break
+            frames.append(bytes(buf[pos + prefix_size : end]))
+            pos = end
+        return pos
+
+
+class DelimitedFramer(Framer):
+    """split frames ending with a delimiter, which is not part of the frame
+    (the same semantics as `schema.EndWith`)"""
+
+    def __init__(
+        self,
+        delimiter: typing.Union[bytes, EndWith],
+        *,
+        max_length: typing.Optional[int] = None,
+    ):
+        super().__init__(max_length=max_length)
+        if isinstance(delimiter, EndWith):
+            delimiter = delimiter.bytes_
+        if not delimiter:
+            raise ValueError("empty delimiter")
+        self.delimiter = delimiter
+        self._pos = 0
+
+    def _split(self, buf, frames: typing.List[bytes]) -> int:
+        delimiter = self.delimiter
+        size = len(buf)
+        pos = 0
+        while True:
+            index = buf.find(delimiter, max(pos, self._pos))
+            if index == -1:
+                self._check_length(max(size - pos - len(delimiter) + 1, 0))
+                # the delimiter may start in the last len(delimiter) - 1 bytes
+                self._pos = max(pos, size - len(delimiter) + 1) - pos
+                return pos
+            self._check_length(index - pos)
+            frames.append(bytes(buf[pos:index]))
+            pos = index + len(delimiter)
+            self._pos = 0
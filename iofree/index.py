@@ -0,0 +1,312 @@
+"""Random access into files of serialized records through a sidecar index.
+
+A file of records written back to back (by `Schema.write_many`, a capture
+tool, ...) is scanned once and the offset of every record is written next
+to it, to ``<path>.idx``. The index is memory-mapped, so opening it costs
+the same for a thousand records or a billion, and a record is parsed
+without parsing anything before it:
+
+    with RecordFile("capture.bin", Message) as records:
+        records[123_456]
+        for message in records.iter_range(1000, 2000):
+            ...
+
+Records of a fixed size need no offsets; records framed by a length prefix
+(`LengthPrefixedBytes` and friends) or a delimiter (`EndWith`) are scanned
+without parsing them, anything else is scanned by parsing it.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from . import Parser, get_parser
+from .exceptions import ParseError
+from .schema import (
+    BinarySchemaMetaclass,
+    Convert,
+    EndWith,
+    LengthPrefixed,
+    LengthPrefixedBytes,
+    StructUnit,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+    from .schema import FieldType
+
+INDEX_SUFFIX = ".idx"
+_MAGIC = b"IOFRIDX1"
+# magic, size of the data file, number of records, record size (0: offsets
+# follow as little-endian unsigned 64-bit integers, one more than records)
+_header = struct.Struct("<8sQQQ")
+_SCAN_CHUNK = 65536
+
+
+class RecordIndex:
+    "the offsets of the records of a data file"
+
+    def __init__(
+        self,
+        count: int,
+        data_size: int,
+        *,
+        record_size: int = 0,
+        offsets: typing.Optional[typing.Sequence[int]] = None,
+    ):
+        if not record_size and (offsets is None or len(offsets) != count + 1):
+            raise ValueError("offsets of variable-size records are needed")
+        self.count = count
+        self.data_size = data_size
+        self.record_size = record_size
+        self.offsets = offsets
+        self._mmap: typing.Optional[mmap.mmap] = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__qualname__}(count={self.count})>"
+
+    def __len__(self):
+        return self.count
+
+    def span(self, i: int) -> typing.Tuple[int, int]:
+        "the start and end offsets of record *i*, negative indexes count back"
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("record index out of range")
+        if self.record_size:
+            start = i * self.record_size
+            return start, start + self.record_size
+        return self.offsets[i], self.offsets[i + 1]
+
+    @classmethod
+    def build(cls, path: str, unit: FieldType) -> "RecordIndex":
+        "scan the records of *unit* in the file at *path*"
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            record_size = unit.static_size
+            if record_size:
+                if size % record_size:
+                    raise ParseError(
+                        f"{size % record_size} bytes after the last record"
+                    )
+                return cls(size // record_size, size, record_size=record_size)
+            offsets = array("Q", [0])
+            if size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    _scan(data, unit, offsets)
+            return cls(len(offsets) - 1, size, offsets=offsets)
+
+    def save(self, index_path: str) -> None:
+        "write the index to *index_path*, replacing it at once"
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_header.pack(_MAGIC, self.data_size, self.count, self.record_size))
+            if not self.record_size:
+                offsets = array("Q", self.offsets)
+                if sys.byteorder == "big":
+                    offsets.byteswap()
+                offsets.tofile(f)
+        os.replace(tmp_path, index_path)
+
+    @classmethod
+    def load(cls, index_path: str) -> "RecordIndex":
+        "map the index at *index_path* into memory"
+        with open(index_path, "rb") as f:
+            header = f.read(_header.size)
+            if len(header) != _header.size or header[:8] != _MAGIC:
+                raise ValueError(f"not a record index: {index_path}")
+            _, data_size, count, record_size = _header.unpack(header)
+            if record_size:
+                return cls(count, data_size, record_size=record_size)
+            if sys.byteorder == "big":
+                offsets = array("Q")
+                offsets.fromfile(f, count + 1)
+                offsets.byteswap()
+                return cls(count, data_size, offsets=offsets)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)[_header.size :]
+        if len(view) != 8 * (count + 1):
+            view.release()
+            mapped.close()
+            raise ValueError(f"truncated record index: {index_path}")
+        index = cls(count, data_size, offsets=view.cast("Q"))
+        index._mmap = mapped
+        return index
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self.offsets.release()
+            self.offsets = None
+            self._mmap.close()
+            self._mmap = None
+
+
+class RecordFile:
+    """the records of *unit* in the file at *path*, indexed by ``<path>.idx``,
+    which is built when it is missing or older than the file"""
+
+    def __init__(
+        self,
+        path: str,
+        unit: FieldType,
+        *,
+        index_path: typing.Optional[str] = None,
+        rebuild: bool = False,
+    ):
+        self.path = path
+        self.unit = unit
+        self.index_path = path + INDEX_SUFFIX if index_path is None else index_path
+        index = None
+        if not rebuild and _is_fresh(self.index_path, path):
+            index = RecordIndex.load(self.index_path)
+            if index.data_size != os.stat(path).st_size:
+                index.close()
+                index = None
+        if index is None:
+            index = RecordIndex.build(path, unit)
+            index.save(self.index_path)
+        self.index = index
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+        # reused for every record, see `Parser.parse_datagrams`
+        self._parser = Parser(unit.get_value())
+
+    def __repr__(self):
+        return f"<{self.__class__.__qualname__}({self.path!r}, {len(self)} records)>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.index.count
+
+    def __iter__(self):
+        return self.iter_range(0, len(self))
+
+    def __getitem__(self, key: typing.Union[int, slice]) -> typing.Any:
+        if isinstance(key, slice):
+            return list(self.iter_range(*key.indices(len(self))))
+        return self._parse([self.read_raw(key)])[0]
+
+    def read_raw(self, i: int) -> bytes:
+        "the bytes of record *i*"
+        start, end = self.index.span(i)
+        return self._data[start:end]
+
+    def iter_range(
+        self, start: int, stop: int, step: int = 1, *, batch: int = 256
+    ) -> typing.Iterator[typing.Any]:
+        "parse records *start* to *stop*, *batch* records at once"
+        indexes = range(start, stop, step)
+        for i in range(0, len(indexes), batch):
+            yield from self._parse([self.read_raw(j) for j in indexes[i : i + batch]])
+
+    def _parse(self, records: typing.List[bytes]) -> typing.List[typing.Any]:
+        return self._parser.parse_datagrams(records, self.unit.get_value)
+
+    def close(self) -> None:
+        self.index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def _is_fresh(index_path: str, path: str) -> bool:
+    try:
+        return os.stat(index_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _framing(unit: FieldType) -> typing.Optional[tuple]:
+    "how the records of *unit* can be split without parsing them, if they can"
+    if isinstance(unit, BinarySchemaMetaclass):
+        fields = list(unit._fields.values())
+        return _framing(fields[0]) if len(fields) == 1 else None
+    if isinstance(unit, Convert):
+        return _framing(unit.unit)
+    if isinstance(unit, EndWith):
+        return "delimiter", unit.bytes_
+    if isinstance(unit, (LengthPrefixedBytes, LengthPrefixed)):
+        length_unit = unit.length_unit
+        if isinstance(length_unit, StructUnit):
+            unpack_from = length_unit._struct.unpack_from
+            return (
+                "prefix",
+                length_unit.min_size,
+                lambda data, pos: unpack_from(data, pos)[0],
+            )
+        n, byteorder, signed = (
+            length_unit.length,
+            length_unit.byteorder,
+            length_unit.signed,
+        )
+        return (
+            "prefix",
+            n,
+            lambda data, pos: int.from_bytes(
+                data[pos : pos + n], byteorder, signed=signed
+            ),
+        )
+    return None
+
+
+def _scan(data: mmap.mmap, unit: FieldType, offsets: array) -> None:
+    "append the end offset of each record in *data* to *offsets*"
+    size = len(data)
+    framing = _framing(unit)
+    if framing is not None and framing[0] == "delimiter":
+        delimiter = framing[1]
+        find = data.find
+        pos = 0
+        while pos < size:
+            index = find(delimiter, pos)
+            if index == -1:
+                raise ParseError(f"incomplete record at offset {pos}")
+            pos = index + len(delimiter)
+            offsets.append(pos)
+    elif framing is not None:
+        _, prefix_size, read_length = framing
+        pos = 0
+        while pos < size:
+            if size - pos < prefix_size:
+                raise ParseError(f"incomplete record at offset {pos}")
+            pos += prefix_size + read_length(data, pos)
+            if pos > size:
+                raise ParseError(f"incomplete record at offset {offsets[-1]}")
+            offsets.append(pos)
+    else:
+        _scan_by_parsing(data, unit, offsets)
+
+
+def _scan_by_parsing(data: mmap.mmap, unit: FieldType, offsets: array) -> None:
+    fed = [0]
+
+    def record_ends():
+        parser = yield from get_parser()
+        while True:
+            yield from unit.get_value()
+            # the generator runs within `send`, after *fed* was updated
+            offsets.append(fed[0] - len(parser._input))
+
+    parser = Parser(record_ends())
+    size = len(data)
+    for start in range(0, size, _SCAN_CHUNK):
+        chunk = data[start : start + _SCAN_CHUNK]
+        fed[0] += len(chunk)
+        parser.send(chunk)
+    if offsets[-1] != size:
+        raise ParseError(f"incomplete record at offset {offsets[-1]}")
@@ -0,0 +1,86 @@
+"""A size-classed, bounded pool of reusable `bytearray` buffers.
+
+Parsers can draw their (empty) input buffer from a pool and hand it back when
+they finish, and schema objects can be serialized into pooled output buffers,
+so steady-state connection handling does not keep allocating new buffers.
+"""
+
+from __future__ import annotations
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+
+class BufferPool:
+    """Buffers are grouped into power-of-two size classes between *min_size*
+    and *max_size*, each class keeping at most *max_count* free buffers.
+    Empty buffers (used as parser input) form a class of their own. A pool
+    can be shared between threads, its stats are approximate then."""
+
+    def __init__(
+        self, *, min_size: int = 64, max_size: int = 65536, max_count: int = 1024
+    ):
+        if min_size <= 0 or max_size < min_size:
+            raise ValueError(f"invalid size range: {min_size}-{max_size}")
+        self.min_size = 1 << (min_size - 1).bit_length()
+        self.max_size = max_size
+        self.max_count = max_count
+        self.hits = 0
+        self.misses = 0
+        self._free: typing.Dict[int, typing.List[bytearray]] = {0: []}
+        size = self.min_size
+        while size <= max_size:
+            self._free[size] = []
+            size <<= 1
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__qualname__}(hits={self.hits}, "
+            f"misses={self.misses}, free={self.free_count})>"
+        )
+
+    @property
+    def free_count(self) -> int:
+        "number of buffers currently kept by the pool"
+        return sum(len(free) for free in self._free.values())
+
+    def size_class(self, size: int) -> int:
+        "return the buffer length that serves a request of *size* bytes"
+        if size <= 0:
+            return 0
+        return max(self.min_size, 1 << (size - 1).bit_length())
+
+    def acquire(self, size: int = 0) -> bytearray:
+        """get a buffer of at least *size* bytes, an empty buffer if *size* is 0;
+        the content of a reused buffer is undefined"""
+        class_size = self.size_class(size)
+        free = self._free.get(class_size)
+        if free:
+            try:
+                buf = free.pop()
+            except IndexError:  # another thread took the last one
+                pass
+            else:
+                self.hits += 1
+                return buf
+        self.misses += 1
+        return bytearray(class_size if free is not None else size)
+
+    def release(self, buf: typing.Union[bytearray, memoryview]) -> None:
+        "give a buffer (or a view returned by `pack`) back to the pool"
+        if isinstance(buf, memoryview):
+            obj = buf.obj
+            buf.release()
+            buf = obj
+        free = self._free.get(len(buf))
+        if free is not None and len(free) < self.max_count:
+            free.append(buf)
+
+    def pack(self, obj) -> memoryview:
+        """serialize a `BinarySchema` object into a pooled buffer, return a view
+        of exactly the serialized bytes; pass the view to `release` when done"""
+        size = obj.nbytes
+        buf = self.acquire(size)
+        obj.pack_into(buf, 0)
+        return memoryview(buf)[:size]
@@ -0,0 +1,150 @@
+"""Blocking socket-to-socket relay for connections whose parser has finished.
+
+Once a handshake is done the rest of the traffic is opaque, so it no longer
+goes through a parser's input buffer: `Parser.detach` returns the leftover
+bytes, which are written first, then data is moved with `os.splice` through a
+pipe where available (Linux), or with `recv_into` on one reusable buffer:
+
+    request = parser.run(client_sock)
+    relay_both(client_sock, upstream_sock, client_data=parser.detach())
+"""
+
+from __future__ import annotations
+
+import errno
+import os
+import socket
+import threading
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+    from .pool import BufferPool
+
+HAS_SPLICE = hasattr(os, "splice")
+
+
+def relay(
+    src: socket.socket,
+    dst: socket.socket,
+    *,
+    data: bytes = b"",
+    buffer_size: int = 65536,
+    pool: typing.Optional[BufferPool] = None,
+    use_splice: typing.Optional[bool] = None,
+) -> int:
+    """copy *data*, then everything read from *src*, to *dst* until *src*
+    reaches EOF, then shut down the write side of *dst*; return the number
+    of bytes copied. *use_splice* defaults to splicing when both sockets are
+    in blocking mode, the copying buffer is taken from *pool* if given."""
+    total = len(data)
+    if data:
+        dst.sendall(data)
+    if use_splice is None:
+        use_splice = (
+            HAS_SPLICE and src.gettimeout() is None and dst.gettimeout() is None
+        )
+    spliced = _splice(src, dst, buffer_size) if use_splice else None
+    if spliced is None:
+        total += _copy(src, dst, buffer_size, pool)
+    else:
+        total += spliced
+    try:
+        dst.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+    return total
+
+
+def relay_both(
+    client: socket.socket,
+    upstream: socket.socket,
+    *,
+    client_data: bytes = b"",
+    upstream_data: bytes = b"",
+    **kwargs: typing.Any,
+) -> typing.Tuple[int, int]:
+    """relay both directions until both reach EOF, *client_data* is what the
+    client sent beyond the handshake (see `Parser.detach`); return the bytes
+    copied upstream and downstream; an error in either direction shuts both
+    sockets down and is raised"""
+    result = [0]
+    errors: typing.List[BaseException] = []
+
+    def downstream() -> None:
+        try:
+            result[0] = relay(upstream, client, data=upstream_data, **kwargs)
+        except BaseException as e:
+            errors.append(e)
+            _shutdown(client, upstream)
+
+    thread = threading.Thread(target=downstream, daemon=True)
+    thread.start()
+    try:
+        sent = relay(client, upstream, data=client_data, **kwargs)
+    except BaseException:
+        # else the other direction waits until a peer closes
+        _shutdown(client, upstream)
+        thread.join()
+        raise
+    thread.join()
+    if errors:
+        raise errors[0]
+    return sent, result[0]
+
+
+def _shutdown(*socks: socket.socket) -> None:
+    "stop both directions of *socks*, waking up threads blocked on them"
+    for sock in socks:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _copy(
+    src: socket.socket,
+    dst: socket.socket,
+    buffer_size: int,
+    pool: typing.Optional[BufferPool],
+) -> int:
+    buf = bytearray(buffer_size) if pool is None else pool.acquire(buffer_size)
+    view = memoryview(buf)
+    total = 0
+    try:
+        while True:
+            n = src.recv_into(view)
+            if not n:
+                return total
+            dst.sendall(view[:n])
+            total += n
+    finally:
+        view.release()
+        if pool is not None:
+            pool.release(buf)
+
+
+def _splice(
+    src: socket.socket, dst: socket.socket, buffer_size: int
+) -> typing.Optional[int]:
+    "move data through a pipe in the kernel, None if splicing is unsupported"
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    read_fd, write_fd = os.pipe()
+    total = 0
+    try:
+        while True:
+            try:
+                n = os.splice(src_fd, write_fd, buffer_size)
+            except OSError as e:
+                if total == 0 and e.errno in (errno.EINVAL, errno.ENOSYS):
+                    return None
+                raise
+            if not n:
+                return total
+            total += n
+            while n:
+                n -= os.splice(read_fd, dst_fd, n)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
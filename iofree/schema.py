@@ -1,8 +1,8 @@
+from __future__ import annotations
+
 import abc
 import enum
 import struct
-import typing
-from collections import deque
 from struct import Struct
 
 from . import (
@@ -17,13 +17,19 @@ from . import (
 )
 from .exceptions import ParseError
 
-_parent_stack: typing.Deque["BinarySchema"] = deque()
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
 
 
 class Unit(abc.ABC):
     """Unit is the base class of all units. \
     If you can build your own unit class, you must inherit from it"""
 
+    # whether parsing and encoding need the values of the enclosing schema
+    # (see `Switch`)
+    _needs_mapping = False
+
     def __iter__(self):
         return self.get_value()
 
@@ -35,10 +41,49 @@ class Unit(abc.ABC):
     def __call__(self, obj: typing.Any) -> bytes:
         "convert user-given object to bytes"
 
+    def buffers(self, obj: typing.Any) -> typing.List[bytes]:
+        "convert user-given object to a list of buffers without joining them"
+        return [self(obj)]
+
+    def buffers_for(
+        self, parent: "BinarySchema", obj: typing.Any
+    ) -> typing.List[bytes]:
+        "like `buffers`, for units that depend on the other fields of *parent*"
+        return self.buffers(obj)
+
+    def pack_into(self, buffer, offset: int, obj: typing.Any) -> int:
+        "write user-given object into *buffer* at *offset*, return the end offset"
+        return _write_buffers(buffer, offset, self.buffers(obj))
+
     def parse(self, data: bytes, *, strict: bool = True):
         "a convenient function to help you parse fixed bytes"
         return Parser(self.get_value()).parse(data, strict=strict)
 
+    @property
+    def min_size(self) -> int:
+        "minimal number of bytes the unit occupies"
+        return 0
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        "maximal number of bytes the unit occupies, None if unbounded or unknown"
+        return None
+
+    @property
+    def static_size(self) -> typing.Optional[int]:
+        "number of bytes the unit occupies if it is fixed, otherwise None"
+        return _static_size(self)
+
+    def _struct_format(self) -> typing.Optional[typing.Tuple[str, _Decoder]]:
+        """return ``(format, decode)`` if the unit can be read as a single
+        struct item, *decode* converts the item and may be None"""
+        return None
+
+    def _pack_format(self) -> typing.Optional[typing.Tuple[str, _Encoder]]:
+        """return ``(format, encode)`` if the unit can be written as a single
+        struct item, *encode* converts the object and may be None"""
+        return None
+
 
 class BinarySchemaMetaclass(type):
     def __new__(mcls, name, bases, namespace, **kwargs):
@@ -48,8 +93,65 @@ class BinarySchemaMetaclass(type):
                 fields[key] = member
                 namespace[key] = MemberDescriptor(key, member)
         namespace["_fields"] = fields
+        namespace["_plan"] = None
+        namespace["_pack_plan"] = None
+        namespace["_needs_mapping"] = False
+        namespace["_min_size"] = 0
         return super().__new__(mcls, name, bases, namespace)
 
+    def _compile(cls) -> typing.Tuple[tuple, ...]:
+        """analyse the fields on first parse, which keeps class creation cheap;
+        runs of fixed-size fields are merged into a single struct read, and
+        each `Switch` records the index of the field it refers to, so it is
+        resolved without going through the parser"""
+        names = list(cls._fields)
+        plan: typing.List[tuple] = []
+        run = _StructRun()
+        needs_mapping = False
+        for i, (name, field) in enumerate(cls._fields.items()):
+            fmt = None
+            if isinstance(field, Unit) and not isinstance(field, Switch):
+                needs_mapping = needs_mapping or field._needs_mapping
+                fmt = field._struct_format()
+            if fmt is not None and run.add(*fmt):
+                continue
+            run.flush(plan)
+            # a native size differing from the standard one joins no run
+            if fmt is not None and run.add(*fmt):
+                continue
+            if isinstance(field, Switch):
+                if field.ref not in names[:i]:
+                    raise ValueError(
+                        f"{cls.__name__}.{name} refers to {field.ref!r}, "
+                        "which is not a preceding field"
+                    )
+                field._compile()
+                plan.append((_SWITCH, field, names.index(field.ref)))
+            else:
+                plan.append((_FIELD, field, None))
+        run.flush(plan)
+        cls._needs_mapping = needs_mapping
+        cls._min_size = cls.min_size
+        # names the field that failed in a `ParseError`
+        cls._names = tuple(names)
+        cls._plan = tuple(plan)
+        return cls._plan
+
+    @property
+    def min_size(cls) -> int:
+        "minimal number of bytes of the serialized schema"
+        return sum(field.min_size for field in cls._fields.values())
+
+    @property
+    def max_size(cls) -> typing.Optional[int]:
+        "maximal number of bytes of the serialized schema, None if unbounded"
+        return _sum_sizes(field.max_size for field in cls._fields.values())
+
+    @property
+    def static_size(cls) -> typing.Optional[int]:
+        "number of bytes of the serialized schema if it is fixed, otherwise None"
+        return _static_size(cls)
+
     # def __init__(cls, name: str, bases: tuple, namespace: dict):
     #     fields: typing.Dict[str, FieldType] = {}
     #     for key, member in namespace.items():
@@ -67,24 +169,277 @@ class BinarySchemaMetaclass(type):
 
     def get_value(cls) -> typing.Generator[tuple, typing.Any, "BinarySchema"]:
         "get `BinarySchema` object from bytes"
+        plan = cls._plan if cls._plan is not None else cls._compile()
+        if cls._needs_mapping:
+            return (yield from cls._get_value_with_mapping())
+        values: typing.List[typing.Any] = []
+        try:
+            for kind, arg, extra in plan:
+                if kind == _STRUCT:
+                    items = yield from read_raw_struct(arg)
+                    for decode, item in zip(extra, items):
+                        values.append(item if decode is None else decode(item))
+                    continue
+                if kind == _FIELD:
+                    values.append((yield from arg.get_value()))
+                    continue
+                struct_obj, decode, unit = arg._select(values[extra])
+                if struct_obj is None:
+                    values.append((yield from unit.get_value()))
+                    continue
+                (value,) = yield from read_raw_struct(struct_obj)
+                values.append(value if decode is None else decode(value))
+        except ParseError as e:
+            _locate(e, cls, cls._names[len(values)], values)
+            raise
+        except Exception as e:
+            field = cls._names[len(values)]
+            raise _locate(ParseError(e), cls, field, values) from e
+        return cls(*values)
+
+    def _get_value_with_mapping(cls):
+        "parse with the partial values exposed to units nested in other units"
         mapping: typing.Dict[str, typing.Any] = {}
         parser = yield from get_parser()
         parser._mapping_stack.append(mapping)
         try:
             for name, field in cls._fields.items():
                 mapping[name] = yield from field.get_value()
-        except Exception:
-            raise ParseError(mapping)
+        except ParseError as e:
+            _locate(e, cls, name, list(mapping.values()))
+            raise
+        except Exception as e:
+            raise _locate(ParseError(e), cls, name, list(mapping.values())) from e
         finally:
             parser._mapping_stack.pop()
         return cls(*mapping.values())
 
-    def get_parser(cls) -> Parser:
-        return Parser(cls.get_value())
+    def get_parser(cls, *, pool=None, fail_fast: bool = False) -> Parser:
+        "the parser waits once until `min_size` bytes are buffered"
+        if cls._plan is None:
+            cls._compile()
+        return Parser(
+            cls.get_value(), pool=pool, min_size=cls._min_size, fail_fast=fail_fast
+        )
 
     def parse(cls, data: bytes, *, strict: bool = True) -> "BinarySchema":
         return cls.get_parser().parse(data, strict=strict)
 
+    def _compile_pack(cls) -> typing.Tuple[tuple, ...]:
+        """like `_compile` for encoding: runs of fields that encode to a
+        single struct item are packed with one struct"""
+        plan: typing.List[tuple] = []
+        run = _StructRun()
+        for field in cls._fields.values():
+            fmt = None
+            if isinstance(field, Unit) and not field._needs_mapping:
+                fmt = field._pack_format()
+            if fmt is not None and run.add(*fmt):
+                continue
+            run.flush(plan)
+            # a native size differing from the standard one joins no run
+            if fmt is None or not run.add(*fmt):
+                plan.append((_FIELD, field, None))
+        run.flush(plan)
+        cls._pack_plan = tuple(plan)
+        return cls._pack_plan
+
+    def pack_many(
+        cls,
+        records: typing.Iterable[typing.Sequence[typing.Any]],
+        buffer: typing.Optional[bytearray] = None,
+    ) -> bytearray:
+        """serialize *records*, tuples of field values (`zip(*columns)` for
+        columns), without creating objects; nested schemas take objects or
+        tuples. Append to *buffer*, a new bytearray by default, and return it"""
+        if buffer is None:
+            buffer = bytearray()
+        cls._pack_records(records, buffer, None, 0)
+        return buffer
+
+    def write_many(
+        cls,
+        records: typing.Iterable[typing.Sequence[typing.Any]],
+        fileobj: typing.BinaryIO,
+        *,
+        flush_size: int = 65536,
+    ) -> int:
+        """like `pack_many`, write to *fileobj* each time *flush_size* bytes
+        are buffered, return the number of bytes written"""
+        buffer = bytearray()
+        total = cls._pack_records(records, buffer, fileobj.write, flush_size)
+        if buffer:
+            fileobj.write(buffer)
+            total += len(buffer)
+        return total
+
+    def _pack_records(
+        cls,
+        records: typing.Iterable[typing.Sequence[typing.Any]],
+        buffer: bytearray,
+        write: typing.Optional[typing.Callable[[bytearray], typing.Any]],
+        flush_size: int,
+    ) -> int:
+        "append *records* to *buffer*, flush it to *write*; return bytes flushed"
+        plan = cls._pack_plan if cls._pack_plan is not None else cls._compile_pack()
+        flushed = 0
+        if len(plan) == 1 and plan[0][0] == _STRUCT and not any(plan[0][2]):
+            # fixed-size plain values: a single pack per record
+            pack = plan[0][1].pack
+            for record in records:
+                buffer += pack(*record)
+                if write is not None and len(buffer) >= flush_size:
+                    write(buffer)
+                    flushed += len(buffer)
+                    del buffer[:]
+            return flushed
+        names = tuple(cls._fields)
+        size = len(names)
+        needs_parent = any(
+            kind == _FIELD and isinstance(arg, Unit) and arg._needs_mapping
+            for kind, arg, _ in plan
+        )
+        parent = None
+        for record in records:
+            if len(record) != size:
+                raise ValueError(f"need {size} values, got {len(record)}")
+            if needs_parent:
+                parent = _FieldValues(_resolved(cls._fields, dict(zip(names, record))))
+            i = 0
+            for kind, arg, extra in plan:
+                if kind == _STRUCT:
+                    items = [
+                        item if encode is None else encode(item)
+                        for encode, item in zip(extra, record[i : i + len(extra)])
+                    ]
+                    buffer += arg.pack(*items)
+                    i += len(extra)
+                    continue
+                value = record[i]
+                i += 1
+                if isinstance(arg, BinarySchemaMetaclass) and isinstance(value, tuple):
+                    arg._pack_records((value,), buffer, None, 0)
+                    continue
+                for buf in _field_buffers(arg, parent, value):
+                    buffer += buf
+            if write is not None and len(buffer) >= flush_size:
+                write(buffer)
+                flushed += len(buffer)
+                del buffer[:]
+        return flushed
+
+    def read_at(cls, path: str, i: int) -> "BinarySchema":
+        """parse record *i* of the file at *path*, written back to back, through
+        its sidecar index, see `iofree.index.RecordFile`"""
+        from .index import RecordFile
+
+        with RecordFile(path, cls) as records:
+            return records[i]
+
+    def template(cls, **constant_fields: typing.Any) -> "Template":
+        """a `Template` that serializes objects whose *constant_fields* never
+        change, `MustEqual` fields are constant unless given"""
+        return Template(cls, constant_fields)
+
+    def parse_datagrams(
+        cls,
+        datagrams: typing.Iterable[bytes],
+        *,
+        strict: bool = True,
+        skip_errors: bool = False,
+    ) -> typing.List["BinarySchema"]:
+        "parse each datagram as one object, see `Parser.parse_datagrams`"
+        return cls.get_parser().parse_datagrams(
+            datagrams, cls.get_value, strict=strict, skip_errors=skip_errors
+        )
+
+
+_FIELD, _STRUCT, _SWITCH = range(3)
+
+
+class _StructRun:
+    "collect consecutive single-item struct formats into one struct"
+
+    def __init__(self):
+        self.order: typing.Optional[str] = None
+        self.formats: typing.List[str] = []
+        self.decoders: typing.List[_Decoder] = []
+
+    def add(self, fmt: str, decode: _Decoder) -> bool:
+        "return False if *fmt* cannot join the current run"
+        order, body = ("@", fmt) if fmt[0] not in "@=<>!" else (fmt[0], fmt[1:])
+        if order == "@":
+            try:
+                if Struct(fmt).size != Struct("=" + body).size:
+                    return False
+            except struct.error:
+                return False
+            order = "="
+        order = ">" if order == "!" else order
+        if body[-1] not in "sp?cbBx":
+            if self.order is not None and self.order != order:
+                return False
+            self.order = order
+        self.formats.append(body)
+        self.decoders.append(decode)
+        return True
+
+    def flush(self, plan: typing.List[tuple]) -> None:
+        "append the run to *plan* and start a new one"
+        if self.formats:
+            struct_obj = Struct((self.order or "=") + "".join(self.formats))
+            plan.append((_STRUCT, struct_obj, tuple(self.decoders)))
+        self.order = None
+        self.formats = []
+        self.decoders = []
+
+
+def _locate(
+    error: ParseError, schema: "BinarySchemaMetaclass", field: str, values: list
+) -> ParseError:
+    "record the field that failed, unless a schema nested in it already did"
+    if error.schema is None:
+        error.schema, error.field, error.values = schema, field, values
+    return error
+
+
+def _sum_sizes(sizes: typing.Iterable[typing.Optional[int]]) -> typing.Optional[int]:
+    total = 0
+    for size in sizes:
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def _static_size(unit) -> typing.Optional[int]:
+    min_size = unit.min_size
+    return min_size if min_size == unit.max_size else None
+
+
+def _max_length(length_unit, max_length: typing.Optional[int]) -> typing.Optional[int]:
+    "the largest length a length unit can announce, None if unbounded"
+    limit = _max_int(length_unit)
+    if limit is None or (max_length is not None and max_length < limit):
+        return max_length
+    return limit
+
+
+def _check_length(length: int, low: int, high: typing.Optional[int]) -> None:
+    if length < low or (high is not None and length > high):
+        raise ValueError(f"length {length} out of range [{low}, {high}]")
+
+
+def _max_int(unit) -> typing.Optional[int]:
+    "the largest value an integer length unit can hold"
+    if isinstance(unit, IntUnit):
+        return (1 << (8 * unit.length - unit.signed)) - 1
+    if isinstance(unit, StructUnit):
+        code = unit._struct.format[-1]
+        if code in "bhilqnBHILQN":
+            return (1 << (8 * unit._struct.size - code.islower())) - 1
+    return None
+
 
 class BinarySchema(metaclass=BinarySchemaMetaclass):
     """The main class for users to define their own binary structures"""
@@ -97,35 +452,46 @@ class BinarySchema(metaclass=BinarySchemaMetaclass):
             )
         self.values = {}
         self.bins = {}
-        _parent_stack.append(self)
-        try:
-            for arg, (name, field) in zip(args, self.__class__._fields.items()):
-                # if isinstance(field, BinarySchemaMetaclass):
-                #     binary = arg.binary
-                # elif isinstance(field, Unit):
-                #     binary = field(arg)
-                # if arg is ...:
-                #     arg = field.get_default()
-                setattr(self, name, arg)
-                # self.bins[name] = binary
-        finally:
-            _parent_stack.pop()
+        for arg, name in zip(args, self.__class__._fields):
+            setattr(self, name, arg)
 
         if hasattr(self, "__post_init__"):
             self.__post_init__()
 
+    def _set_encoded(self, values: dict, bins: dict) -> None:
+        "fill in fields that are already validated and encoded, skip the descriptors"
+        self._modified = True
+        self.values = values
+        self.bins = bins
+
     def member_get(self, name):
         return self.values[name]
 
-    def member_set(self, name, value, binary):
-        self.bins[name] = binary
+    def member_set(self, name, value, buffers):
+        self.bins[name] = buffers
         self.values[name] = value
         self._modified = True
 
+    def buffers(self) -> typing.List[bytes]:
+        "return a flat list of buffers, suitable for `socket.sendmsg`"
+        bufs: typing.List[bytes] = []
+        for field_bufs in self.bins.values():
+            bufs.extend(field_bufs)
+        return bufs
+
+    @property
+    def nbytes(self) -> int:
+        "size of the serialized object"
+        return sum(len(buf) for field_bufs in self.bins.values() for buf in field_bufs)
+
+    def pack_into(self, buffer, offset: int = 0) -> int:
+        "write the serialized object into *buffer* at *offset*, return the end offset"
+        return _write_buffers(buffer, offset, self.buffers())
+
     @property
     def binary(self):
         if self._modified:
-            self._binary = b"".join(self.bins.values())
+            self._binary = b"".join(self.buffers())
             self._modified = False
         return self._binary
 
@@ -149,8 +515,11 @@ class BinarySchema(metaclass=BinarySchemaMetaclass):
         return True
 
 
-# FieldType = typing.Union[BinarySchemaMetaclass, Unit]
-FieldType = typing.Union[typing.Type[BinarySchema], Unit]
+if TYPE_CHECKING:  # pragma: no cover
+    FieldType = typing.Union[typing.Type[BinarySchema], Unit]
+    _Decoder = typing.Optional[typing.Callable[[typing.Any], typing.Any]]
+    _Encoder = _Decoder
+    _Reader = typing.Tuple[typing.Optional[Struct], _Decoder, FieldType]
 
 
 class MemberDescriptor:
@@ -167,12 +536,169 @@ class MemberDescriptor:
 
     def __set__(self, obj: BinarySchema, value):
         if isinstance(self.member, BinarySchemaMetaclass):
-            binary = value.binary
-        elif isinstance(self.member, Unit):
-            binary = self.member(value)
+            buffers = value.buffers()
+        elif self.member._needs_mapping:
+            buffers = self.member.buffers_for(obj, value)
+        else:
+            buffers = self.member.buffers(value)
         if value is ...:
-            value = self.member.parse(binary)
-        obj.member_set(self.key, value, binary)
+            value = self.member.parse(b"".join(buffers))
+        obj.member_set(self.key, value, buffers)
+
+
+class Template:
+    """the byte layout of a schema with constant fields, encoded once; only
+    the remaining fields are encoded on each `render`, and when they all have
+    a fixed size they are packed into a copy of the layout"""
+
+    def __init__(self, schema: typing.Type[BinarySchema], constants: dict):
+        fields = schema._fields
+        unknown = set(constants) - set(fields)
+        if unknown:
+            raise ValueError(f"{schema.__name__} has no fields {sorted(unknown)}")
+        self.schema = schema
+        self.constants = dict(constants)
+        for name, field in fields.items():
+            if name not in constants and isinstance(field, MustEqual):
+                self.constants[name] = ...
+        self.variables = frozenset(fields) - frozenset(self.constants)
+        # (bytes, None, None) for constant runs, (None, name, field) for the
+        # fields encoded on each render
+        segments: typing.List[tuple] = []
+        self._parent_constants = _resolved(fields, self.constants)
+        parent = _FieldValues(self._parent_constants)
+        for name, field in fields.items():
+            buffers = None
+            if name in self.constants:
+                try:
+                    buffers = _field_buffers(field, parent, self.constants[name])
+                except AttributeError:
+                    if not field._needs_mapping:
+                        raise
+                    # it depends on a field that is not constant
+            if buffers is None:
+                segments.append((None, name, field))
+            elif segments and segments[-1][0] is not None:
+                segments[-1] = (segments[-1][0] + b"".join(buffers), None, None)
+            else:
+                segments.append((b"".join(buffers), None, None))
+        self._segments = segments
+        # whether fields are encoded with the values of other fields
+        self._needs_parent = any(
+            field is not None
+            and not isinstance(field, BinarySchemaMetaclass)
+            and field._needs_mapping
+            for _, _, field in segments
+        )
+        self._binary: typing.Optional[bytes] = None
+        self._layout: typing.Optional[bytearray] = None
+        self._patches: typing.List[typing.Tuple[str, int, FieldType]] = []
+        if len(segments) == 1 and segments[0][0] is not None:
+            self._binary = segments[0][0]
+        elif not any(name in self.constants for _, name, _ in segments) and all(
+            field is None
+            or (not field._needs_mapping and field.static_size is not None)
+            for _, _, field in segments
+        ):
+            layout = bytearray()
+            for data, name, field in segments:
+                if data is None:
+                    self._patches.append((name, len(layout), field))
+                    data = bytes(field.static_size)
+                layout += data
+            self._layout = layout
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.schema.__name__}, {self.constants})>"
+
+    def render(self, **values: typing.Any) -> bytes:
+        "serialize an object with the constant fields and *values*"
+        if values.keys() != self.variables:
+            raise ValueError(
+                f"expect values of {sorted(self.variables)}, got {sorted(values)}"
+            )
+        if self._binary is not None:
+            return self._binary
+        if self._layout is not None:
+            buffer = bytearray(self._layout)
+            for name, offset, field in self._patches:
+                value = values[name]
+                if isinstance(field, BinarySchemaMetaclass):
+                    value.pack_into(buffer, offset)
+                else:
+                    field.pack_into(buffer, offset, value)
+            return bytes(buffer)
+        return b"".join(self.buffers(**values))
+
+    def render_into(self, buffer, offset: int = 0, **values: typing.Any) -> int:
+        "write a serialized object into *buffer* at *offset*, return the end offset"
+        return _write_buffers(buffer, offset, self.buffers(**values))
+
+    def buffers(self, **values: typing.Any) -> typing.List[bytes]:
+        "like `render`, return a list of buffers without joining them"
+        if values.keys() != self.variables:
+            raise ValueError(
+                f"expect values of {sorted(self.variables)}, got {sorted(values)}"
+            )
+        if self._needs_parent:
+            values = {**self._parent_constants, **values}
+        parent = _FieldValues(values)
+        bufs: typing.List[bytes] = []
+        for data, name, field in self._segments:
+            if data is not None:
+                bufs.append(data)
+            else:
+                bufs.extend(_field_buffers(field, parent, values[name]))
+        return bufs
+
+
+class _FieldValues:
+    "the values of a schema by attribute, the parent of units encoded alone"
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: dict):
+        self._values = values
+
+    def __getattr__(self, name: str) -> typing.Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def _resolved(fields: dict, values: dict) -> dict:
+    "*values* with the ``...`` of `MustEqual` fields replaced, as objects hold them"
+    return {
+        name: fields[name].value
+        if value is ... and isinstance(fields[name], MustEqual)
+        else value
+        for name, value in values.items()
+    }
+
+
+def _field_buffers(field: FieldType, parent, value) -> typing.List[bytes]:
+    "encode *value* of *field* like `MemberDescriptor.__set__`"
+    if isinstance(field, BinarySchemaMetaclass):
+        return value.buffers()
+    if field._needs_mapping:
+        return field.buffers_for(parent, value)
+    return field.buffers(value)
+
+
+def _write_buffers(buffer, offset: int, bufs: typing.List[bytes]) -> int:
+    with memoryview(buffer) as view:
+        end = offset + sum(len(buf) for buf in bufs)
+        if offset < 0 or end > view.nbytes:
+            raise ValueError(
+                f"pack_into requires a buffer of at least {end} bytes, "
+                f"got {view.nbytes}"
+            )
+        for buf in bufs:
+            size = len(buf)
+            view[offset : offset + size] = buf
+            offset += size
+    return offset
 
 
 class StructUnit(Unit):
@@ -188,6 +714,24 @@ class StructUnit(Unit):
     def __call__(self, obj) -> bytes:
         return self._struct.pack(obj)
 
+    def pack_into(self, buffer, offset: int, obj) -> int:
+        self._struct.pack_into(buffer, offset, obj)
+        return offset + self._struct.size
+
+    @property
+    def min_size(self) -> int:
+        return self._struct.size
+
+    max_size = min_size
+
+    def _struct_format(self):
+        # a run has one item per field, e.g. "2H" unpacks to two
+        if len(self._struct.unpack(bytes(self._struct.size))) != 1:
+            return None
+        return self._struct.format, None
+
+    _pack_format = _struct_format
+
 
 class IntUnit(Unit):
     def __init__(self, length: int, byteorder: str, signed: bool = False):
@@ -205,6 +749,22 @@ class IntUnit(Unit):
     def __call__(self, obj: int) -> bytes:
         return obj.to_bytes(self.length, self.byteorder, signed=self.signed)
 
+    @property
+    def min_size(self) -> int:
+        return self.length
+
+    max_size = min_size
+
+    def _struct_format(self):
+        byteorder, signed = self.byteorder, self.signed
+        return f"{self.length}s", lambda data: int.from_bytes(
+            data, byteorder, signed=signed
+        )
+
+    def _pack_format(self):
+        length, byteorder, signed = self.length, self.byteorder, self.signed
+        return f"{length}s", lambda obj: obj.to_bytes(length, byteorder, signed=signed)
+
 
 int8 = StructUnit("b")
 uint8 = StructUnit("B")
@@ -253,11 +813,25 @@ class Bytes(Unit):
         else:
             return obj
 
+    @property
+    def min_size(self) -> int:
+        return max(self.length, 0)
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return self.length if self.length >= 0 else None
+
+    def _struct_format(self):
+        return (self._struct.format, None) if self.length >= 0 else None
+
+    _pack_format = _struct_format
+
 
 class MustEqual(Unit):
     def __init__(self, unit: Unit, value: typing.Any):
         self.unit = unit
         self.value = value
+        self._needs_mapping = unit._needs_mapping
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.unit}, {self.value})"
@@ -274,6 +848,55 @@ class MustEqual(Unit):
                 raise ValueError(f"expect {self.value}, got {obj}")
         return self.unit(self.value)
 
+    def buffers(self, obj) -> typing.List[bytes]:
+        if obj is not ...:
+            if self.value != obj:
+                raise ValueError(f"expect {self.value}, got {obj}")
+        return self.unit.buffers(self.value)
+
+    def buffers_for(self, parent, obj) -> typing.List[bytes]:
+        if obj is not ...:
+            if self.value != obj:
+                raise ValueError(f"expect {self.value}, got {obj}")
+        return self.unit.buffers_for(parent, self.value)
+
+    @property
+    def min_size(self) -> int:
+        return self.unit.min_size
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return self.unit.max_size
+
+    def _struct_format(self):
+        fmt = self.unit._struct_format()
+        if fmt is None:
+            return None
+        inner = fmt[1]
+        expected = self.value
+
+        def decode(v):
+            result = v if inner is None else inner(v)
+            if expected != result:
+                raise ValueError(f"expect {expected}, got {result}")
+            return result
+
+        return fmt[0], decode
+
+    def _pack_format(self):
+        fmt = self.unit._pack_format()
+        if fmt is None:
+            return None
+        expected = self.value
+        item = expected if fmt[1] is None else fmt[1](expected)
+
+        def encode(obj):
+            if obj is not ... and expected != obj:
+                raise ValueError(f"expect {expected}, got {obj}")
+            return item
+
+        return fmt[0], encode
+
 
 class EndWith(Unit):
     def __init__(self, bytes_: bytes):
@@ -288,38 +911,104 @@ class EndWith(Unit):
     def __call__(self, obj: bytes) -> bytes:
         return obj + self.bytes_
 
+    def buffers(self, obj: bytes) -> typing.List[bytes]:
+        # a copy, so changing a caller's bytearray leaves `binary` intact
+        return [obj if type(obj) is bytes else bytes(obj), self.bytes_]
+
+    @property
+    def min_size(self) -> int:
+        return len(self.bytes_)
+
 
 class LengthPrefixedBytes(Unit):
-    def __init__(self, length_unit: typing.Union[StructUnit, IntUnit]):
+    def __init__(
+        self,
+        length_unit: typing.Union[StructUnit, IntUnit],
+        *,
+        max_length: typing.Optional[int] = None,
+    ):
         self.length_unit = length_unit
+        self.max_length = max_length
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.length_unit})"
 
     def get_value(self):
         length = yield from self.length_unit.get_value()
+        _check_length(length, 0, self.max_length)
         return (yield from read_struct(f"{length}s"))[0]
 
     def __call__(self, obj: bytes) -> bytes:
         length = len(obj)
+        _check_length(length, 0, self.max_length)
         return self.length_unit(length) + struct.pack(f"{length}s", obj)
 
+    def buffers(self, obj: bytes) -> typing.List[bytes]:
+        if not isinstance(obj, (bytes, bytearray)):
+            raise TypeError(f"expect bytes, got {type(obj).__name__}")
+        _check_length(len(obj), 0, self.max_length)
+        if type(obj) is not bytes:
+            obj = bytes(obj)  # a copy, as for `EndWith`
+        return [self.length_unit(len(obj)), obj]
+
+    @property
+    def min_size(self) -> int:
+        return self.length_unit.min_size
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return _sum_sizes(
+            [self.length_unit.max_size, _max_length(self.length_unit, self.max_length)]
+        )
+
 
 class LengthPrefixed(Unit):
     def __init__(
-        self, length_unit: typing.Union[StructUnit, IntUnit], object_unit: FieldType
+        self,
+        length_unit: typing.Union[StructUnit, IntUnit],
+        object_unit: FieldType,
+        *,
+        max_length: typing.Optional[int] = None,
     ):
         self.length_unit = length_unit
         self.object_unit = object_unit
+        self.max_length = max_length
+        self._range: typing.Optional[typing.Tuple[int, typing.Optional[int]]] = None
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.length_unit}, {self.object_unit})"
 
     def get_value(self):
         length = yield from self.length_unit.get_value()
+        # reject impossible lengths before waiting for the payload
+        if self._range is None:
+            self._range = self._length_range()
+        _check_length(length, *self._range)
         (data,) = yield from read_struct(f"{length}s")
         parser = Parser(self._gen())
-        return parser.parse(data)
+        try:
+            return parser.parse(data)
+        except ParseError as e:
+            # the offset into the payload, the outer parser sets its own
+            e.offset = None
+            raise
+
+    def _length_range(self) -> typing.Tuple[int, typing.Optional[int]]:
+        "the range of acceptable payload lengths"
+        return 0, self.max_length
+
+    @property
+    def min_size(self) -> int:
+        return self.length_unit.min_size + self._length_range()[0]
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return _sum_sizes(
+            [
+                self.length_unit.max_size,
+                _max_length(self.length_unit, self._length_range()[1]),
+            ]
+        )
 
     @abc.abstractmethod
     def _gen(self) -> typing.Generator:
@@ -336,11 +1025,19 @@ class LengthPrefixedObjectList(LengthPrefixed):
         return lst
 
     def __call__(self, obj_list: typing.List[FieldType]) -> bytes:
+        return b"".join(self.buffers(obj_list))
+
+    def buffers(self, obj_list: typing.List[FieldType]) -> typing.List[bytes]:
+        pieces: typing.List[bytes] = []
         if isinstance(self.object_unit, BinarySchemaMetaclass):
-            bytes_ = b"".join(bs.binary for bs in obj_list)
+            for bs in obj_list:
+                pieces.extend(bs.buffers())
         elif isinstance(self.object_unit, Unit):
-            bytes_ = b"".join(self.object_unit(bs) for bs in obj_list)
-        return self.length_unit(len(bytes_)) + bytes_
+            for obj in obj_list:
+                pieces.extend(self.object_unit.buffers(obj))
+        length = sum(len(piece) for piece in pieces)
+        _check_length(length, 0, self.max_length)
+        return [self.length_unit(length), *pieces]
 
 
 class LengthPrefixedObject(LengthPrefixed):
@@ -352,32 +1049,111 @@ class LengthPrefixedObject(LengthPrefixed):
         return v
 
     def __call__(self, obj: FieldType) -> bytes:
-        bytes_ = (
-            obj.binary
+        return b"".join(self.buffers(obj))
+
+    def buffers(self, obj: FieldType) -> typing.List[bytes]:
+        pieces = (
+            obj.buffers()
             if isinstance(self.object_unit, BinarySchemaMetaclass)
-            else self.object_unit(obj)
+            else self.object_unit.buffers(obj)
         )
-        return self.length_unit(len(bytes_)) + bytes_
+        length = sum(len(piece) for piece in pieces)
+        _check_length(length, *self._length_range())
+        return [self.length_unit(length), *pieces]
+
+    def _length_range(self) -> typing.Tuple[int, typing.Optional[int]]:
+        max_length = self.object_unit.max_size
+        if max_length is None or (
+            self.max_length is not None and self.max_length < max_length
+        ):
+            max_length = self.max_length
+        return self.object_unit.min_size, max_length
 
 
 class Switch(Unit):
+    _needs_mapping = True
+
     def __init__(self, ref: str, cases: typing.Mapping[typing.Any, FieldType]):
         self.ref = ref
         self.cases = cases
+        self._readers: typing.Optional[typing.Dict[typing.Any, _Reader]] = None
+        self._table: typing.Optional[typing.Tuple[typing.Optional[_Reader], ...]]
+        self._table = None
+        self._base = 0
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.ref}, {self.cases})"
 
+    def _compile(self) -> None:
+        """precompute a reader per case, fixed-size cases are read with a single
+        struct; dense integer cases are looked up in a tuple"""
+        if self._readers is not None:
+            return
+        readers = {}
+        for key, unit in self.cases.items():
+            fmt = (
+                None
+                if isinstance(unit, BinarySchemaMetaclass)
+                else unit._struct_format()
+            )
+            if fmt is None:
+                readers[key] = (None, None, unit)
+            else:
+                readers[key] = (Struct(fmt[0]), fmt[1], unit)
+        if readers and all(isinstance(key, int) for key in readers):
+            base = min(readers)
+            span = max(readers) - base + 1
+            if span <= max(16, 2 * len(readers)):
+                table: typing.List[typing.Optional[_Reader]] = [None] * span
+                for key, reader in readers.items():
+                    table[key - base] = reader
+                self._table = tuple(table)
+                self._base = base
+        self._readers = readers
+
+    @property
+    def min_size(self) -> int:
+        return min((unit.min_size for unit in self.cases.values()), default=0)
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        sizes = [unit.max_size for unit in self.cases.values()]
+        return None if None in sizes else max(sizes, default=0)
+
+    def _select(self, value) -> _Reader:
+        "return ``(struct, decode, unit)`` of the case matching *value*"
+        table = self._table
+        if table is not None and isinstance(value, int):
+            index = value - self._base
+            if 0 <= index < len(table):
+                reader = table[index]
+                if reader is not None:
+                    return reader
+            raise KeyError(value)
+        return self._readers[value]
+
     def get_value(self):
+        self._compile()
         parser = yield from get_parser()
         mapping = parser._mapping_stack[-1]
-        unit = self.cases[mapping[self.ref]]
-        return (yield from unit.get_value())
+        struct_obj, decode, unit = self._select(mapping[self.ref])
+        if struct_obj is None:
+            return (yield from unit.get_value())
+        (value,) = yield from read_raw_struct(struct_obj)
+        return value if decode is None else decode(value)
 
     def __call__(self, obj) -> bytes:
-        parent = _parent_stack[-1]
+        raise TypeError(f"{self} encodes a field of a schema, see `buffers_for`")
+
+    def buffers(self, obj) -> typing.List[bytes]:
+        raise TypeError(f"{self} encodes a field of a schema, see `buffers_for`")
+
+    def buffers_for(self, parent, obj) -> typing.List[bytes]:
+        "encode *obj* with the case selected by the *ref* field of *parent*"
         real_field = self.cases[getattr(parent, self.ref)]
-        return real_field(obj) if isinstance(real_field, Unit) else obj.binary
+        if isinstance(real_field, Unit):
+            return real_field.buffers_for(parent, obj)
+        return obj.buffers()
 
 
 class SizedIntEnum(Unit):
@@ -388,6 +1164,7 @@ class SizedIntEnum(Unit):
     ):
         self.size_unit = size_unit
         self.enum_class = enum_class
+        self._needs_mapping = size_unit._needs_mapping
 
     def __str__(self):
         return f"{self.__class__.__name__}({self.size_unit}, {self.enum_class})"
@@ -399,12 +1176,42 @@ class SizedIntEnum(Unit):
     def __call__(self, obj: enum.IntEnum) -> bytes:
         return self.size_unit(obj.value)
 
+    def pack_into(self, buffer, offset: int, obj: enum.IntEnum) -> int:
+        return self.size_unit.pack_into(buffer, offset, obj.value)
+
+    @property
+    def min_size(self) -> int:
+        return self.size_unit.min_size
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return self.size_unit.max_size
+
+    def _struct_format(self):
+        fmt = self.size_unit._struct_format()
+        if fmt is None:
+            return None
+        inner, enum_class = fmt[1], self.enum_class
+        if inner is None:
+            return fmt[0], enum_class
+        return fmt[0], lambda v: enum_class(inner(v))
+
+    def _pack_format(self):
+        fmt = self.size_unit._pack_format()
+        if fmt is None:
+            return None
+        inner = fmt[1]
+        if inner is None:
+            return fmt[0], None  # an IntEnum packs as its value
+        return fmt[0], lambda obj: inner(obj.value)
+
 
 class Convert(Unit):
     def __init__(self, unit: Unit, *, encode: typing.Callable, decode: typing.Callable):
         self.unit = unit
         self.encode = encode
         self.decode = decode
+        self._needs_mapping = unit._needs_mapping
 
     def __str__(self):
         return (
@@ -419,6 +1226,38 @@ class Convert(Unit):
     def __call__(self, obj: typing.Any) -> bytes:
         return self.unit(self.encode(obj))
 
+    def buffers(self, obj: typing.Any) -> typing.List[bytes]:
+        return self.unit.buffers(self.encode(obj))
+
+    def buffers_for(self, parent, obj: typing.Any) -> typing.List[bytes]:
+        return self.unit.buffers_for(parent, self.encode(obj))
+
+    @property
+    def min_size(self) -> int:
+        return self.unit.min_size
+
+    @property
+    def max_size(self) -> typing.Optional[int]:
+        return self.unit.max_size
+
+    def _struct_format(self):
+        fmt = self.unit._struct_format()
+        if fmt is None:
+            return None
+        inner, decode = fmt[1], self.decode
+        if inner is None:
+            return fmt[0], decode
+        return fmt[0], lambda v: decode(inner(v))
+
+    def _pack_format(self):
+        fmt = self.unit._pack_format()
+        if fmt is None:
+            return None
+        inner, encode = fmt[1], self.encode
+        if inner is None:
+            return fmt[0], encode
+        return fmt[0], lambda obj: inner(encode(obj))
+
 
 class String(Convert):
     def __init__(self, length: int, encoding="utf-8"):
@@ -431,10 +1270,14 @@ class String(Convert):
 
 class LengthPrefixedString(Convert):
     def __init__(
-        self, length_unit: typing.Union[StructUnit, IntUnit], encoding="utf-8"
+        self,
+        length_unit: typing.Union[StructUnit, IntUnit],
+        encoding="utf-8",
+        *,
+        max_length: typing.Optional[int] = None,
     ):
         super().__init__(
-            LengthPrefixedBytes(length_unit),
+            LengthPrefixedBytes(length_unit, max_length=max_length),
             encode=lambda x: x.encode(encoding),
             decode=lambda x: x.decode(encoding),
         )
@@ -0,0 +1,93 @@
+"""A hashed timer wheel for the deadlines of many parsers.
+
+A server with many idle connections watches every parser with one wheel and
+advances it periodically; deadlines are hashed into slots by their tick, so
+setting, moving or dropping one is O(1), and `advance` only visits the slots
+of the ticks that passed:
+
+    wheel = TimerWheel(tick=0.5)
+    wheel.watch(parser)  # the parser calls `set_deadline` in its generator
+    ...
+    for parser in wheel.advance():
+        try:
+            parser.expire()
+        except Timeout:
+            close(parser)
+"""
+
+from __future__ import annotations
+
+from time import monotonic
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:  # pragma: no cover
+    import typing
+
+    from . import Parser
+
+
+class TimerWheel:
+    """*size* slots of *tick* seconds each; deadlines further away than one
+    turn of the wheel stay in their slot until their turn comes"""
+
+    def __init__(
+        self,
+        *,
+        tick: float = 0.1,
+        size: int = 512,
+        clock: typing.Callable[[], float] = monotonic,
+    ):
+        if tick <= 0 or size <= 0:
+            raise ValueError("tick and size must be positive")
+        self.tick = tick
+        self.size = size
+        self.clock = clock
+        # each slot maps a parser to the deadline it was added with, entries
+        # of moved deadlines are dropped lazily when their slot is visited
+        self._slots: typing.List[typing.Dict[Parser, float]] = [{} for _ in range(size)]
+        self._current = int(clock() / tick)
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots)
+
+    def watch(self, parser: Parser) -> None:
+        "track the deadlines *parser* sets from now on, and its current one"
+        parser.timer = self
+        if parser.deadline is not None:
+            self.add(parser)
+
+    def unwatch(self, parser: Parser) -> None:
+        "stop tracking *parser*, its pending entry is dropped lazily"
+        if parser.timer is self:
+            parser.timer = None
+
+    def add(self, parser: Parser) -> None:
+        "schedule the current deadline of *parser*, called by the parser"
+        deadline = parser.deadline
+        tick = max(int(deadline / self.tick), self._current)
+        self._slots[tick % self.size][parser] = deadline
+
+    def advance(self, now: typing.Optional[float] = None) -> typing.List[Parser]:
+        """return the watched parsers whose deadline has passed at *now*,
+        call `Parser.expire` on each of them"""
+        if now is None:
+            now = self.clock()
+        target = int(now / self.tick)
+        expired = []
+        if target - self._current >= self.size:
+            ticks = range(self.size)
+        else:
+            ticks = range(self._current, target + 1)
+        for tick in ticks:
+            slot = self._slots[tick % self.size]
+            if not slot:
+                continue
+            for parser, deadline in list(slot.items()):
+                if parser.deadline != deadline or parser.timer is not self:
+                    del slot[parser]
+                elif deadline <= now:
+                    del slot[parser]
+                    if not parser.finished():
+                        expired.append(parser)
+        self._current = max(target, self._current)
+        return expired
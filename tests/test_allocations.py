@@ -0,0 +1,162 @@
+"""Allocation budgets of hot paths, measured with tracemalloc.
+
+A budget is the peak of memory allocated while one message is parsed or
+serialized (or one trap runs), so an accidental copy of a payload on the hot
+path fails here long before it shows up in a benchmark. Payloads are large
+enough for a copy to dominate the fixed overhead of parser objects.
+"""
+
+import tracemalloc
+
+import pytest
+
+import iofree
+from iofree import schema
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(tracemalloc, "reset_peak"), reason="needs tracemalloc.reset_peak"
+)
+PAYLOAD = 32768
+# parser, generator frames and event deques of one parse
+OVERHEAD = 8192
+
+
+class HTTPResponse(schema.BinarySchema):
+    head = schema.EndWith(b"\r\n\r\n")
+
+    def __post_init__(self):
+        first_line, *header_lines = self.head.split(b"\r\n")
+        self.ver, self.code, *status = first_line.split(None, 2)
+        self.status = status[0] if status else b""
+        self.header_lines = header_lines
+
+
+def peak_allocation(func):
+    "bytes allocated at the peak of the second call of *func*"
+    func()  # fill caches and lazily compiled plans first
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before
+
+
+def retained_allocation(func, n=1000):
+    "bytes still allocated after *n* calls of *func*"
+    func()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(n):
+            func()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before
+
+
+ADDR = Addr.from_tuple(("example.com", 443))
+CLIENT_REQUEST = socks5.ClientRequest(..., socks5.Cmd.connect, 0, ADDR).binary
+UDP_RELAY = socks5.UDPRelay(..., 0, ADDR, b"x" * PAYLOAD).binary
+HTTP_RESPONSE = b"HTTP/1.1 200 OK\r\n" + b"X-Header: value\r\n" * 1000 + b"\r\n"
+
+
+@pytest.mark.parametrize(
+    "func, budget",
+    [
+        (lambda: socks5.ClientRequest.parse(CLIENT_REQUEST), OVERHEAD),
+        (
+            lambda: socks5.ClientRequest(..., socks5.Cmd.connect, 0, ADDR).binary,
+            OVERHEAD,
+        ),
+        # the payload is copied into the parser and read out of it once
+        (lambda: socks5.UDPRelay.parse(UDP_RELAY), 2 * PAYLOAD + OVERHEAD),
+        (lambda: socks5.UDPRelayCodec().decode(UDP_RELAY), OVERHEAD),
+        (
+            lambda: socks5.UDPRelay(..., 0, ADDR, UDP_RELAY).buffers(),
+            OVERHEAD,
+        ),
+        # the head is kept, split into lines by __post_init__
+        (
+            lambda: HTTPResponse.parse(HTTP_RESPONSE),
+            2 * len(HTTP_RESPONSE) + 1000 * 64 + OVERHEAD,
+        ),
+    ],
+    ids=[
+        "ClientRequest.parse",
+        "ClientRequest.binary",
+        "UDPRelay.parse",
+        "UDPRelayCodec.decode",
+        "UDPRelay.buffers",
+        "HTTPResponse.parse",
+    ],
+)
+def test_message_budget(func, budget):
+    assert peak_allocation(func) <= budget
+
+
+def test_no_retained_allocations():
+    assert (
+        retained_allocation(lambda: socks5.ClientRequest.parse(CLIENT_REQUEST)) < 4096
+    )
+    assert retained_allocation(lambda: socks5.UDPRelay.parse(UDP_RELAY)) < 4096
+
+
+def run_trap(trap):
+    "run *trap* on a parser with 64 KiB of input already buffered"
+    data = bytes(range(256)) * 256
+
+    def gen():
+        yield from iofree.wait_event()
+        return (yield from trap())
+
+    parser = iofree.Parser(gen())
+    parser.send(data)
+
+    def measured():
+        parser.send_event(None)
+        return parser.get_result()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = measured()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - before
+
+
+@pytest.mark.parametrize(
+    "trap, budget",
+    [
+        (lambda: iofree.read(4096), 4096),
+        (lambda: iofree.read_upto(4096), 4096),
+        (lambda: iofree.read_until(b"\xff\x00", return_tail=True), 256),
+        (lambda: iofree.read_struct("!HI"), 0),
+        (lambda: iofree.read_int(3), 0),
+        (lambda: iofree.peek(16), 0),
+        (lambda: iofree.ensure(4096), 0),
+    ],
+    ids=[
+        "read",
+        "read_upto",
+        "read_until",
+        "read_struct",
+        "read_int",
+        "peek",
+        "ensure",
+    ],
+)
+def test_trap_budget(trap, budget):
+    # the result plus fixed overhead, never a copy of the buffered input
+    assert run_trap(trap) <= budget + 1024
@@ -0,0 +1,84 @@
+import pytest
+
+from iofree import parser, read, read_until
+from iofree.contrib import http, socks5
+from iofree.dispatch import Dispatcher
+from iofree.exceptions import NoResult, ParseError
+
+
+@parser
+def line():
+    return (yield from read_until(b"\n", return_tail=False))
+
+
+@parser
+def tagged(tag):
+    return tag, (yield from read(4))
+
+
+DISPATCHER = Dispatcher(
+    {
+        b"\x05": socks5.server.parser,
+        (b"GET ", b"POST "): http.server.parser,
+        b"AB": lambda: tagged.parser("AB"),
+        b"ABCD": lambda: tagged.parser("ABCD"),
+    },
+    default=line.parser,
+)
+HTTP_REQUEST = b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n"
+
+
+@pytest.mark.parametrize(
+    "data, kind, result",
+    [
+        (HTTP_REQUEST, http.Request, http.END_OF_MESSAGE),
+        (
+            b"POST / HTTP/1.1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n",
+            http.Request,
+            http.END_OF_MESSAGE,
+        ),
+        (b"ABCD", None, ("ABCD", b"ABCD")),
+        (b"ABCx", None, ("AB", b"ABCx")),
+        (b"hello\n", None, b"hello"),
+    ],
+)
+def test_dispatch(data, kind, result):
+    for chunk_size in (1, len(data)):
+        dispatch_parser = DISPATCHER.parser()
+        for i in range(0, len(data), chunk_size):
+            dispatch_parser.send(data[i : i + chunk_size])
+        assert dispatch_parser.get_result() == result
+        if kind is not None:
+            assert isinstance(next(dispatch_parser.results()), kind)
+        assert not dispatch_parser.has_more_data()
+
+
+def test_dispatch_waits():
+    dispatch_parser = DISPATCHER.parser()
+    with pytest.raises(NoResult):
+        dispatch_parser.get_result()
+    dispatch_parser.send(b"ABC")
+    # "ABCD" is still possible
+    assert dispatch_parser.chosen is None
+    assert list(dispatch_parser) == []
+    assert dispatch_parser.readall() == b"ABC"
+
+
+def test_dispatch_adopts_input():
+    dispatch_parser = DISPATCHER.parser()
+    buffer = dispatch_parser._input
+    dispatch_parser.send(HTTP_REQUEST + b"extra")
+    assert dispatch_parser.chosen._input is buffer
+    assert dispatch_parser.readall() == b"extra"
+
+
+def test_dispatch_errors():
+    dispatcher = Dispatcher({b"\x05": socks5.server.parser})
+    with pytest.raises(ParseError):
+        dispatcher.parser().send(b"\x04")
+    with pytest.raises(ValueError):
+        Dispatcher({b"": line.parser})
+    parser_ = line.parser()
+    parser_.send(b"x")
+    with pytest.raises(RuntimeError):
+        parser_.adopt_input(bytearray(b"\n"))
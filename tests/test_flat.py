@@ -0,0 +1,97 @@
+import socket
+
+import pytest
+
+from iofree import flat, schema
+from iofree.contrib import socks5
+from iofree.contrib.common import Addr
+from iofree.exceptions import ParseError
+from iofree.flat import Program
+
+
+class Address(schema.BinarySchema):
+    atyp = schema.uint8
+    host = schema.Switch(
+        "atyp",
+        {
+            1: schema.Convert(
+                schema.Bytes(4), encode=socket.inet_aton, decode=socket.inet_ntoa
+            ),
+            3: schema.LengthPrefixedString(schema.uint8),
+        },
+    )
+    port = schema.uint16be
+
+
+class Request(schema.BinarySchema):
+    ver = schema.MustEqual(schema.uint8, 5)
+    cmd = schema.SizedIntEnum(schema.uint8, socks5.Cmd)
+    rsv = schema.MustEqual(schema.uint8, 0)
+    addr = Address
+    line = schema.EndWith(b"\r\n")
+    blob = schema.LengthPrefixedBytes(schema.uint24be, max_length=16)
+
+
+Empty = schema.Group()
+# a native size differing from the standard one is read on its own
+Native = schema.Group(a=schema.uint8, b=schema.StructUnit("l"), c=schema.uint8)
+REQUESTS = [
+    Request(..., socks5.Cmd.connect, 0, Address(3, "example.com", 80), b"hi", b""),
+    Request(..., socks5.Cmd.associate, 0, Address(1, "10.0.0.1", 53), b"", b"xyz"),
+]
+
+
+@pytest.mark.parametrize(
+    "unit, obj",
+    [
+        *((Request, obj) for obj in REQUESTS),
+        (
+            socks5.ClientRequest,
+            socks5.ClientRequest(
+                ..., socks5.Cmd.connect, 0, Addr.from_tuple(("example.com", 80))
+            ),
+        ),
+        (socks5.Handshake, socks5.Handshake(..., [socks5.AuthMethod.no_auth])),
+        (Empty, Empty()),
+        (Native, Native(1, -2, 3)),
+    ],
+)
+def test_program(unit, obj):
+    program = Program(unit)
+    data = obj.binary
+    assert program.parse(data) == obj
+    # resumed after every byte
+    parser = program.get_parser()
+    for i in range(len(data)):
+        assert not parser.has_result
+        parser.send(data[i : i + 1])
+    assert parser.get_result() == obj
+
+
+def test_flat_instructions():
+    # nested schemas are inlined, no instruction runs a generator
+    assert all(op != flat._FIELD for op, _, _ in Program(Request)._code)
+    # schemas with their own get_value and unknown units still do
+    ops = [op for op, _, _ in Program(socks5.ClientRequest)._code]
+    assert ops == [flat._STRUCT, flat._FIELD, flat._BUILD]
+    assert [op for op, _, _ in Program(Addr)._code] == [flat._FIELD]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"\x04\x01\x00\x01" + bytes(6) + b"\r\n\x00\x00\x00",
+        b"\x05\x09\x00\x01" + bytes(6) + b"\r\n\x00\x00\x00",
+        b"\x05\x01\x00\x07" + bytes(6) + b"\r\n\x00\x00\x00",
+        b"\x05\x01\x00\x03\x02\xff\xfe\x00\x00\r\n\x00\x00\x00",
+        b"\x05\x01\x00\x01" + bytes(6) + b"\r\n\x00\x00\x20" + bytes(32),
+    ],
+)
+def test_errors(data):
+    errors = []
+    for parse in (Program(Request).parse, Request.parse):
+        with pytest.raises(ParseError) as info:
+            parse(data)
+        error = info.value
+        errors.append((error.schema, error.field, error.values, type(error.__cause__)))
+    assert errors[0] == errors[1]
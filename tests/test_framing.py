@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import iofree
+from iofree import schema
+from iofree.framing import DelimitedFramer, LengthPrefixedFramer
+
+
+def length_prefixed(frames, length_unit=schema.uint16be):
+    return b"".join(length_unit(len(frame)) + frame for frame in frames)
+
+
+def feed_randomly(framer, data):
+    frames = []
+    data = bytearray(data)
+    while data:
+        n = random.randrange(1, 20)
+        frames.extend(framer.feed(bytes(data[:n])))
+        del data[:n]
+    return frames
+
+
+@pytest.mark.parametrize("length_unit", [schema.uint16be, schema.uint24, schema.uint8])
+def test_length_prefixed(length_unit):
+    frames = [bytes([i]) * i for i in range(50)]
+    data = length_prefixed(frames, length_unit)
+    framer = LengthPrefixedFramer(length_unit)
+    assert framer.feed(data) == frames
+    assert not framer.has_more_data()
+    assert feed_randomly(framer, data) == frames
+    assert framer.feed(data[:-1]) == frames[:-1]
+    assert framer.has_more_data()
+    assert framer.readall() == data[-(49 + length_unit.static_size) : -1]
+
+
+def test_length_prefixed_errors():
+    with pytest.raises(TypeError):
+        LengthPrefixedFramer(schema.Bytes(2))
+    framer = LengthPrefixedFramer(schema.uint32be, max_length=10)
+    assert framer.feed(memoryview(length_prefixed([b"ok"], schema.uint32be))) == [b"ok"]
+    with pytest.raises(iofree.ParseError):
+        framer.feed(b"\x00\x01\x00\x00")
+
+
+def test_delimited():
+    frames = [b"line %d" % i for i in range(50)] + [b""]
+    data = b"".join(frame + b"\r\n" for frame in frames)
+    framer = DelimitedFramer(schema.EndWith(b"\r\n"))
+    assert framer.feed(data) == frames
+    assert feed_randomly(framer, data) == frames
+    assert framer.feed(b"abc\r") == []
+    assert framer.feed(b"\ndef") == [b"abc"]
+    assert framer.readall() == b"def"
+
+    framer = DelimitedFramer(b"\n", max_length=4)
+    assert framer.feed(b"1234\n123") == [b"1234"]
+    with pytest.raises(iofree.ParseError):
+        framer.feed(b"45")
+    with pytest.raises(ValueError):
+        DelimitedFramer(b"")
+
+
+def test_chain():
+    Message = schema.Group(kind=schema.uint8, body=schema.Bytes(-1))
+
+    @iofree.parser
+    def messages():
+        parser = yield from iofree.get_parser()
+        while True:
+            yield from iofree.wait()
+            parser.respond(result=(yield from Message))
+
+    chain = iofree.ParserChain(LengthPrefixedFramer(schema.uint16be), messages.parser())
+    bodies = [b"hello", b"world", b""]
+    data = length_prefixed([Message(i, body).binary for i, body in enumerate(bodies)])
+    chain.send(data[:9])
+    chain.send(data[9:])
+    results = [result for _, _, _, result in chain if isinstance(result, Message)]
+    assert results == [Message(i, body) for i, body in enumerate(bodies)]
@@ -0,0 +1,115 @@
+from collections import deque
+
+import pytest
+
+from iofree import ParseError
+from iofree.contrib import http
+
+REQUESTS = (
+    b"GET / HTTP/1.1\r\nHost: example.com\r\nX-Multi: a\r\nx-multi: b\r\n\r\n"
+    b"POST /upload HTTP/1.1\r\nHost: example.com\r\nContent-Length: 11\r\n\r\n"
+    b"hello world"
+    b"PUT /chunks HTTP/1.1\r\nTransfer-Encoding: gzip, chunked\r\n\r\n"
+    b"5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nTrailer: x\r\n\r\n"
+    b"GET /last HTTP/1.0\r\n\r\n"
+    b"leftover"
+)
+
+
+def parse_all(parser, data, step):
+    results = []
+    for i in range(0, len(data), step):
+        parser.send(data[i : i + step])
+        results.extend(parser.results())
+    return results
+
+
+def messages(results):
+    "group results into (head, body) pairs"
+    grouped = []
+    for result in results:
+        if isinstance(result, (http.Request, http.Response)):
+            grouped.append((result, []))
+        elif result is not http.END_OF_MESSAGE:
+            grouped[-1][1].append(result)
+    return [(head, b"".join(body)) for head, body in grouped]
+
+
+@pytest.mark.parametrize("step", [1, 7, len(REQUESTS)])
+def test_pipelined_requests(step):
+    parser = http.server.parser(chunk_size=4)
+    results = parse_all(parser, REQUESTS, step)
+    assert results.count(http.END_OF_MESSAGE) == 4
+    (get, _), (post, body), (put, chunked), (last, _) = messages(results)
+    assert get.method == b"GET" and get.keep_alive
+    assert get.headers["X-Multi"] == "a, b"
+    assert get.headers.get_all("x-multi") == ["a", "b"]
+    assert ("host", "example.com") in get.headers.items()
+    assert post.target == b"/upload" and body == b"hello world"
+    assert all(len(chunk) <= 4 for chunk in results if isinstance(chunk, bytes))
+    assert chunked == b"hello world"
+    assert put.head.startswith(b"PUT /chunks HTTP/1.1\r\n")
+    assert not last.keep_alive
+    assert parser.get_result() is http.END_OF_MESSAGE
+    assert parser.readall() == b"leftover"
+
+
+def test_lazy_headers():
+    headers = http.Headers(b"Content-Length: 5\r\nCONNECTION: Close")
+    assert headers.raw_values(b"connection") == [b"Close"]
+    assert headers._dict is None
+    assert len(headers) == 2 and "content-length" in headers
+    assert headers.raw_values(b"content-length") == [b"5"]
+    with pytest.raises(ParseError):
+        http.Headers(b"A: b\r\nno colon").get("a")
+
+
+def test_responses():
+    data = (
+        b"HTTP/1.1 100 Continue\r\n\r\n"
+        b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\nbody"
+        b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\n"
+        b"HTTP/1.1 304 Not Modified\r\n\r\n"
+        b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nuntil close"
+    )
+    methods = deque([b"GET", b"HEAD", b"GET", b"GET"])
+    parser = http.client.parser(request_methods=methods)
+    results = parse_all(parser, data, 5)
+    grouped = messages(results)
+    assert [head.status for head, _ in grouped] == [100, 200, 200, 304, 200]
+    assert [body for _, body in grouped] == [b"", b"body", b"", b"", b"until close"]
+    assert not methods
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"GET / HTTP/1.1\r\n" + b"A: b\r\n" * 101 + b"\r\n",
+        b"GET / HTTP/1.1\r\nHost: " + b"x" * 70000,
+        b"GET / HTTP/1.1\r\nContent-Length : 5\r\n\r\n",
+        b"GET / HTTP/1.1\r\nA: b\r\n folded\r\n\r\n",
+        b"GET / HTTP/1.1\r\nContent-Length: 1\r\nContent-Length: 2\r\n\r\n",
+        b"GET / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+        b"GET / HTTP/1.1\r\nTransfer-Encoding: chunked\r\nContent-Length: 2\r\n\r\n",
+        b"GET / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n",
+        b"GET / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n",
+        *(
+            b"GET / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n%s\r\nhello\r\n"
+            % size
+            for size in (
+                b"0x5",
+                b"+5",
+                b"0_5",
+                b" 5 ",
+                b"5 ;a=b",
+                b"",
+                b"0" * 16 + b"5",
+            )
+        ),
+        b"GET /\r\n\r\n",
+    ],
+)
+def test_invalid_requests(data):
+    parser = http.server.parser()
+    with pytest.raises(ParseError):
+        parser.send(data)
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from iofree import schema
+from iofree.contrib.common import Addr
+from iofree.exceptions import ParseError
+from iofree.index import INDEX_SUFFIX, RecordFile, RecordIndex
+
+Fixed = schema.Group(a=schema.uint8, b=schema.uint32be)
+Prefixed = schema.Group(body=schema.LengthPrefixedBytes(schema.uint24be))
+Line = schema.EndWith(b"\n")
+
+
+@pytest.mark.parametrize(
+    "unit, values",
+    [
+        (Fixed, [(i % 256, i) for i in range(1000)]),
+        (Prefixed, [(b"x" * (i % 50),) for i in range(1000)]),
+        (schema.LengthPrefixedString(schema.uint16be), [f"s{i}" for i in range(500)]),
+        (Line, [b"line %d" % i for i in range(500)]),
+        (
+            Addr,
+            [
+                (i % 2 * 2 + 1, "example.com" if i % 2 else "1.2.3.4", i)
+                for i in range(10000)
+            ],
+        ),
+    ],
+)
+def test_record_file(tmp_path, unit, values):
+    if isinstance(unit, schema.BinarySchemaMetaclass):
+        expected = [unit(*value) for value in values]
+        data = b"".join(obj.binary for obj in expected)
+    else:
+        expected = values
+        data = b"".join(unit(value) for value in values)
+    path = str(tmp_path / "records.bin")
+    with open(path, "wb") as f:
+        f.write(data)
+    for _ in range(2):  # build, then load the index
+        with RecordFile(path, unit) as records:
+            assert len(records) == len(expected)
+            assert records[0] == expected[0]
+            assert records[-1] == expected[-1]
+            assert records[len(expected) // 2] == expected[len(expected) // 2]
+            assert records[10:400:3] == expected[10:400:3]
+            assert list(records) == expected
+            with pytest.raises(IndexError):
+                records[len(expected)]
+        assert os.path.exists(path + INDEX_SUFFIX)
+    if isinstance(unit, schema.BinarySchemaMetaclass):
+        assert unit.read_at(path, 7) == expected[7]
+
+
+def test_stale_index(tmp_path):
+    path = str(tmp_path / "records.bin")
+    with open(path, "wb") as f:
+        f.write(Fixed.pack_many([(1, 1), (2, 2)]))
+    assert Fixed.read_at(path, 1) == Fixed(2, 2)
+    with open(path, "ab") as f:
+        f.write(Fixed(3, 3).binary)
+    with RecordFile(path, Fixed) as records:
+        assert records[-1] == Fixed(3, 3)
+
+    with open(path, "wb") as f:
+        f.write(Prefixed.pack_many([(b"abc",), (b"",)]))
+    index = RecordIndex.build(path, Prefixed)
+    assert [index.span(i) for i in range(len(index))] == [(0, 6), (6, 9)]
+    index.save(path + ".other")
+    loaded = RecordIndex.load(path + ".other")
+    assert list(loaded.offsets) == [0, 6, 9]
+    loaded.close()
+    with open(path + ".other", "wb") as f:
+        f.write(b"garbage")
+    with pytest.raises(ValueError):
+        RecordIndex.load(path + ".other")
+
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x05ab")
+    with pytest.raises(ParseError):
+        RecordIndex.build(path, Prefixed)
+    with pytest.raises(ParseError):
+        RecordIndex.build(path, Fixed)
+    with pytest.raises(ParseError):
+        RecordIndex.build(path, Addr)
+
+
+def test_empty_file(tmp_path):
+    path = str(tmp_path / "records.bin")
+    open(path, "wb").close()
+    with RecordFile(path, Line) as records:
+        assert len(records) == 0
+        assert records[:] == []
@@ -1,10 +1,13 @@
 import random
+import subprocess
+import sys
 from datetime import datetime
 
 import pytest
 
 import iofree
 from iofree import schema
+from iofree.pool import BufferPool
 
 
 class HTTPResponse(schema.BinarySchema):
@@ -194,3 +197,172 @@ def test_read_exactly_n():
     with pytest.raises(iofree.ParseError):
         parser.parse(b"toolongdata", strict=True)
 
+
+@iofree.parser
+def line_parser(prefix=b""):
+    line = yield from iofree.read_until(b"\n", return_tail=False)
+    return prefix + line
+
+
+def test_reset():
+    parser = line_parser.parser()
+    parser.send(b"first\nsec")
+    assert parser.get_result() == b"first"
+    parser.reset(line_parser(b">"))
+    assert not parser.has_result
+    parser.send(b"ond\nthird\n")
+    assert parser.get_result() == b">second"
+    parser.reset(line_parser())
+    assert parser.get_result() == b"third"
+    assert list(parser) == [(b"", False, None, b"third")]
+
+    parser.reset(line_parser())
+    parser.send(b"unfinished")
+    parser.reset(line_parser())
+    parser.send(b"\n")
+    assert parser.get_result() == b"unfinished"
+
+
+def test_parser_pool():
+    pool = line_parser.parser_pool(max_size=1)
+    parser = pool.get()
+    parser.send(b"abc\nleft")
+    assert parser.get_result() == b"abc"
+    pool.put(parser)
+    parser2 = pool.get(b"+")
+    assert parser2 is parser
+    assert not parser2.has_more_data()
+    parser2.send(b"x\n")
+    assert parser2.get_result() == b"+x"
+    parser3 = pool.get()
+    assert parser3 is not parser
+    pool.put(parser2)
+    pool.put(parser3)
+    assert pool.get() is parser2
+
+    # a detached parser is usable again once reused
+    for buffers in (None, BufferPool()):
+        pool = line_parser.parser_pool(max_size=1, pool=buffers)
+        parser = pool.get()
+        parser.send(b"abc\nleft")
+        assert parser.detach() == b"left"
+        pool.put(parser)
+        assert pool.get(b"+") is parser
+        parser.send(b"x\n")
+        assert parser.get_result() == b"+x"
+
+
+@iofree.parser
+def numbers():
+    while True:
+        n = yield from iofree.read_int(2)
+        if n == 0:
+            return "end"
+        yield from iofree.yield_result(n)
+
+
+def test_yield_result():
+    parser = numbers.parser()
+    parser.send(b"\x00\x01\x00")
+    assert list(parser.results()) == [1]
+    parser.send(b"\x02\x00\x03\x00\x00")
+    assert list(parser.results()) == [2, 3, "end"]
+    assert parser.get_result() == "end"
+
+
+def test_iter_messages():
+    Message = schema.Group(kind=schema.uint8, body=schema.EndWith(b"\n"))
+    parser = iofree.Parser.iter_messages(Message)
+    data = b"".join(Message(i, b"msg%d" % i).binary for i in range(100))
+    for i in range(0, len(data), 7):
+        parser.send(data[i : i + 7])
+    messages = list(parser.results())
+    assert messages == [Message(i, b"msg%d" % i) for i in range(100)]
+    assert not parser.has_result
+    assert not parser.finished()
+
+
+def test_import_dependencies():
+    code = (
+        "import sys, iofree.schema\n"
+        "print(sorted({'typing', 'socket'} & set(sys.modules)))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+@iofree.parser
+def ensured():
+    yield from iofree.ensure(4)
+    parser = yield from iofree.get_parser()
+    assert parser.has_more_data()
+    return (yield from iofree.read(2))
+
+
+def test_ensure():
+    parser = ensured.parser()
+    parser.send(b"abc")
+    assert not parser.has_result
+    parser.send(b"d")
+    assert parser.get_result() == b"ab"
+
+    parser = iofree.Parser(schema.uint8.get_value(), min_size=3)
+    parser.send(b"\x01\x02")
+    assert not parser.has_result
+    parser.send(b"\x03")
+    assert parser.get_result() == 1
+
+
+def test_send_many():
+    parser = iofree.Parser.iter_messages(schema.uint16be)
+    parser.send_many([b"\x00", b"\x01\x00", b"", bytearray(b"\x02\x00")])
+    assert list(parser.results()) == [1, 2]
+    assert parser.has_more_data()
+
+    parser = ensured.parser()
+    parser.send_many(iter([b"a", b"b", b"c", b"d"]))
+    assert parser.get_result() == b"ab"
+
+    parser = http_response.parser()
+    parser.send_event_many([1, 2])
+    assert len(parser._input_events) == 2
+
+
+def test_parse_datagrams():
+    Datagram = schema.Group(kind=schema.uint8, body=schema.Bytes(-1))
+    datagrams = [Datagram(i, b"x" * i).binary for i in range(5)]
+    assert Datagram.parse_datagrams(datagrams) == [
+        Datagram(i, b"x" * i) for i in range(5)
+    ]
+    parser = iofree.Parser(schema.uint16be.get_value())
+    with pytest.raises(iofree.NoResult):
+        parser.parse_datagrams(
+            [b"\x00\x01", b"\x00"], schema.uint16be.get_value, strict=False
+        )
+    with pytest.raises(iofree.ParseError):
+        parser.parse_datagrams([b"\x00\x01\x02"], schema.uint16be.get_value)
+    results = parser.parse_datagrams(
+        [b"\x00\x01", b"\x00", b"\x00\x02\x03", b"\x00\x03"],
+        schema.uint16be.get_value,
+        skip_errors=True,
+    )
+    assert results == [1, 3]
+
+
+def test_detach():
+    parser = iofree.Parser(schema.uint8.get_value())
+    with pytest.raises(RuntimeError):
+        parser.detach()
+    parser.send(b"\x01rest")
+    assert parser.get_result() == 1
+    assert parser.detach() == b"rest"
+    with pytest.raises(RuntimeError):
+        parser.detach()
+    with pytest.raises(RuntimeError):
+        parser.send(b"more")
+
+    pool = BufferPool()
+    parser = iofree.Parser(schema.uint8.get_value(), pool=pool)
+    parser.send(b"\x01")
+    assert parser.detach() == b""
+    assert pool.free_count == 1
@@ -0,0 +1,67 @@
+import pytest
+
+import iofree
+from iofree import schema
+from iofree.contrib import socks5
+from iofree.pool import BufferPool
+
+
+def test_size_classes():
+    pool = BufferPool(min_size=50, max_size=1024, max_count=2)
+    assert pool.size_class(0) == 0
+    assert pool.size_class(1) == 64
+    assert pool.size_class(65) == 128
+    buf = pool.acquire(100)
+    assert len(buf) == 128
+    assert (pool.hits, pool.misses) == (0, 1)
+    pool.release(buf)
+    assert pool.acquire(90) is buf
+    assert (pool.hits, pool.misses) == (1, 1)
+
+    big = pool.acquire(2048)
+    assert len(big) == 2048
+    pool.release(big)
+    assert pool.free_count == 0
+
+    for buf in [pool.acquire(64) for i in range(3)]:
+        pool.release(buf)
+    assert pool.free_count == 2
+    repr(pool)
+
+    with pytest.raises(ValueError):
+        BufferPool(min_size=0)
+
+
+def test_pack():
+    pool = BufferPool()
+    request = socks5.ClientRequest(
+        ..., socks5.Cmd.connect, 0, socks5.Addr(3, "example.com", 443)
+    )
+    view = pool.pack(request)
+    assert bytes(view) == request.binary
+    pool.release(view)
+    view = pool.pack(request)
+    assert bytes(view) == request.binary
+    assert pool.hits == 1
+    pool.release(view)
+
+
+def test_parser_input():
+    pool = BufferPool()
+    for i in range(3):
+        parser = iofree.Parser(schema.uint16be.get_value(), pool=pool)
+        parser.send(b"\x00")
+        parser.send(b"\x01")
+        assert parser.get_result() == 1
+        assert parser.finished()
+    assert pool.misses == 1
+    assert pool.hits == 2
+
+    parser = socks5.Handshake.get_parser(pool=pool)
+    parser.send(socks5.Handshake(..., [socks5.AuthMethod.no_auth]).binary + b"left")
+    assert parser.has_result
+    assert parser.readall() == b"left"
+    assert not parser.has_more_data()
+    parser.send(b"more")
+    assert parser.readall() == b"more"
+    assert pool.free_count == 1
@@ -0,0 +1,105 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from iofree import relay
+from iofree.pool import BufferPool
+
+
+def receive_all(sock, result):
+    chunks = []
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        chunks.append(data)
+    result.append(b"".join(chunks))
+
+
+@pytest.mark.parametrize(
+    "use_splice",
+    [
+        False,
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(
+                not relay.HAS_SPLICE, reason="os.splice is not available"
+            ),
+        ),
+    ],
+)
+def test_relay(use_splice):
+    payload = os.urandom(300000)
+    src_peer, src = socket.socketpair()
+    dst, dst_peer = socket.socketpair()
+    received = []
+    reader = threading.Thread(target=receive_all, args=(dst_peer, received))
+    reader.start()
+
+    def write():
+        src_peer.sendall(payload)
+        src_peer.shutdown(socket.SHUT_WR)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    pool = BufferPool()
+    total = relay.relay(
+        src, dst, data=b"early", pool=pool, buffer_size=4096, use_splice=use_splice
+    )
+    writer.join()
+    reader.join()
+    assert total == len(payload) + 5
+    assert received == [b"early" + payload]
+    if not use_splice:
+        assert pool.free_count == 1
+    for sock in (src_peer, src, dst, dst_peer):
+        sock.close()
+
+
+def test_relay_both():
+    client_peer, client = socket.socketpair()
+    upstream, upstream_peer = socket.socketpair()
+    received = []
+    readers = [
+        threading.Thread(target=receive_all, args=(sock, received))
+        for sock in (client_peer, upstream_peer)
+    ]
+    for reader in readers:
+        reader.start()
+    client_peer.sendall(b"hello")
+    client_peer.shutdown(socket.SHUT_WR)
+    upstream_peer.sendall(b"world")
+    upstream_peer.shutdown(socket.SHUT_WR)
+    assert relay.relay_both(client, upstream, client_data=b">") == (6, 5)
+    for reader in readers:
+        reader.join()
+    assert sorted(received) == [b">hello", b"world"]
+
+
+class ResetSocket(socket.socket):
+    def sendall(self, data):
+        raise ConnectionResetError("reset by peer")
+
+
+@pytest.mark.parametrize("failing", ["client", "upstream"])
+def test_relay_both_error(failing):
+    client_peer, client = socket.socketpair()
+    upstream, upstream_peer = socket.socketpair()
+    if failing == "client":
+        client = ResetSocket(fileno=client.detach())
+    else:
+        upstream = ResetSocket(fileno=upstream.detach())
+    socks = (client_peer, client, upstream, upstream_peer)
+    for sock in socks:
+        # a relay that hangs fails the test instead
+        sock.settimeout(5)
+    # the peers never close, the error ends both directions
+    start = time.monotonic()
+    with pytest.raises(ConnectionResetError):
+        relay.relay_both(client, upstream, client_data=b">", upstream_data=b"<")
+    assert time.monotonic() - start < 4
+    for sock in socks:
+        sock.close()
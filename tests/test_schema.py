@@ -1,3 +1,9 @@
+import enum
+import socket
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from iofree import schema
@@ -70,3 +76,390 @@ def test_schema():
     )
     dynamic = Dynamic(b"abc", b"def", ["123", "456"], [G(3, 5), G(6, 10)])
     check_schema(dynamic)
+
+
+def test_pack_into():
+    G = schema.Group(a=schema.uint8, b=schema.EndWith(b"\n"))
+    Nested = schema.Group(
+        x=schema.uint16be,
+        g=G,
+        items=schema.LengthPrefixedObjectList(schema.uint8, G),
+        obj=schema.LengthPrefixedObject(schema.uint16, G),
+        raw=schema.LengthPrefixedBytes(schema.uint8),
+    )
+    nested = Nested(7, G(1, b"a"), [G(2, b"bc"), G(3, b"")], G(4, b"d"), b"xyz")
+    binary = nested.binary
+    assert nested.nbytes == len(binary)
+    assert b"".join(nested.buffers()) == binary
+
+    buf = bytearray(len(binary) + 3)
+    assert nested.pack_into(buf, 3) == len(buf)
+    assert bytes(buf[3:]) == binary
+    view = memoryview(bytearray(len(binary)))
+    nested.pack_into(view)
+    assert bytes(view) == binary
+    with pytest.raises(ValueError):
+        nested.pack_into(bytearray(len(binary) - 1))
+
+    buf = bytearray(4)
+    assert schema.uint16be.pack_into(buf, 1, 258) == 3
+    assert schema.uint24be.pack_into(buf, 1, 1) == 4
+    assert bytes(buf) == b"\x00\x00\x00\x01"
+
+    # encoding copies a caller's bytearray
+    data = bytearray(b"ab")
+    Copied = schema.Group(
+        end=schema.EndWith(b"\n"), raw=schema.LengthPrefixedBytes(schema.uint8)
+    )
+    obj = Copied(data, data)
+    data[:] = b"zz"
+    assert obj.binary == b"ab\n\x02ab"
+
+
+def test_buffers_sendmsg():
+    G = schema.Group(a=schema.uint8, b=schema.LengthPrefixedBytes(schema.uint8))
+    g = G(1, b"payload")
+    rsock, wsock = socket.socketpair()
+    with rsock, wsock:
+        wsock.sendmsg(g.buffers())
+        assert rsock.recv(1024) == g.binary
+
+
+def test_switch():
+    Tagged = schema.Group(
+        tag=schema.uint8,
+        value=schema.Switch(
+            "tag",
+            {
+                1: schema.uint16be,
+                2: schema.String(3),
+                3: schema.MustEqual(schema.uint24be, 7),
+                5: schema.LengthPrefixedBytes(schema.uint8),
+                6: schema.Group(a=schema.uint8),
+            },
+        ),
+    )
+    assert Tagged._needs_mapping is False
+    for obj in [
+        Tagged(1, 258),
+        Tagged(2, "abc"),
+        Tagged(3, 7),
+        Tagged(5, b"xyz"),
+        Tagged(6, Tagged.value.cases[6](9)),
+    ]:
+        check_schema(obj)
+    assert Tagged.value._table is not None
+    for data in [b"\x04", b"\x20", b"\x03\x00\x00\x08"]:
+        with pytest.raises(schema.ParseError):
+            Tagged.parse(data)
+
+    Named = schema.Group(
+        kind=schema.String(1),
+        value=schema.Switch("kind", {"a": schema.uint8, "b": schema.int8}),
+    )
+    check_schema(Named("b", -1))
+    assert Named.value._table is None
+    with pytest.raises(schema.ParseError):
+        Named.parse(b"c\x00")
+
+    Wrapped = schema.Group(
+        tag=schema.uint8,
+        value=schema.Convert(
+            schema.Switch("tag", {1: schema.uint8, 2: schema.uint16be}),
+            encode=int,
+            decode=str,
+        ),
+    )
+    assert Wrapped.parse(b"\x02\x01\x00") == Wrapped(2, "256")
+    assert Wrapped._needs_mapping is True
+
+
+def test_switch_bad_ref():
+    Bad = schema.Group(
+        value=schema.Switch("tag", {1: schema.uint8}),
+        tag=schema.uint8,
+    )
+    with pytest.raises(ValueError):
+        Bad.parse(b"\x01\x01")
+
+
+def test_switch_threads():
+    Tagged = schema.Group(
+        tag=schema.uint8,
+        value=schema.Switch("tag", {1: schema.uint8, 2: schema.uint32be}),
+    )
+    with pytest.raises(TypeError):
+        Tagged.value(1)
+
+    def encode(tag):
+        for _ in range(2000):
+            if len(Tagged(tag, 1).binary) != (2 if tag == 1 else 5):
+                return False
+        return True
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            assert all(executor.map(encode, [1, 2, 1, 2]))
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def test_template():
+    Message = schema.Group(
+        magic=schema.MustEqual(schema.Bytes(2), b"io"),
+        kind=schema.uint8,
+        seq=schema.uint32be,
+        flags=schema.uint24be,
+        inner=schema.Group(a=schema.uint8),
+    )
+    inner = Message.inner(7)
+    template = Message.template(kind=1)
+    for seq in (0, 1, 2**32 - 1):
+        expected = Message(..., 1, seq, 5, inner).binary
+        assert template.render(seq=seq, flags=5, inner=inner) == expected
+        assert b"".join(template.buffers(seq=seq, flags=5, inner=inner)) == expected
+        buf = bytearray(len(expected) + 1)
+        assert template.render_into(buf, 1, seq=seq, flags=5, inner=inner) == len(buf)
+        assert buf[1:] == expected
+    assert template._layout is not None
+    constant = Message.template(kind=1, seq=2, flags=3, inner=inner)
+    assert constant.render() is constant.render() == Message(..., 1, 2, 3, inner).binary
+    with pytest.raises(ValueError):
+        template.render(seq=1)
+    with pytest.raises(ValueError):
+        constant.render(seq=1)
+    with pytest.raises(ValueError):
+        Message.template(size=1)
+
+    # a constant Switch is encoded on each render when its ref is not constant
+    Tagged = schema.Group(
+        tag=schema.uint8,
+        value=schema.Switch("tag", {1: schema.uint8, 2: schema.String(3)}),
+        body=schema.LengthPrefixedBytes(schema.uint8),
+    )
+    assert Tagged.template(tag=2, value="abc").render(body=b"x") == (
+        Tagged(2, "abc", b"x").binary
+    )
+    template = Tagged.template(value=1)
+    assert template._layout is None
+    assert template.render(tag=1, body=b"") == Tagged(1, 1, b"").binary
+
+    # a Switch on a MustEqual field uses its value
+    Keyed = schema.Group(
+        kind=schema.MustEqual(schema.uint8, 2),
+        body=schema.Switch("kind", {1: schema.String(3), 2: schema.uint16be}),
+    )
+    assert Keyed.template().render(body=5) == Keyed(..., 5).binary == b"\x02\x00\x05"
+    assert Keyed.template(kind=...).render(body=5) == Keyed(..., 5).binary
+    assert Keyed.template(body=5).render() == Keyed(..., 5).binary
+
+
+def test_pack_many():
+    Kind = enum.IntEnum("Kind", "x y")
+    Record = schema.Group(
+        magic=schema.MustEqual(schema.uint8, 7),
+        a=schema.uint16be,
+        b=schema.int24be,
+        name=schema.String(3),
+        kind=schema.SizedIntEnum(schema.uint8, Kind),
+    )
+    records = [(..., i, -i, "abc", Kind(i % 2 + 1)) for i in range(300)]
+    expected = b"".join(Record(*record).binary for record in records)
+    assert Record.pack_many(records) == expected
+    buffer = bytearray(b"head")
+    assert Record.pack_many(iter(records), buffer) is buffer
+    assert buffer == b"head" + expected
+    with pytest.raises(ValueError):
+        Record.pack_many([(8, 1, 1, "abc", Kind.x)])
+
+    Plain = schema.Group(a=schema.uint8, b=schema.float64be)
+    records = [(i, i / 3) for i in range(256)]
+    assert Plain.pack_many(records) == b"".join(Plain(*r).binary for r in records)
+
+    Tagged = schema.Group(
+        tag=schema.uint8,
+        value=schema.Switch("tag", {1: schema.uint8, 2: schema.String(3)}),
+        body=schema.LengthPrefixedBytes(schema.uint8),
+        inner=schema.Group(a=schema.uint8),
+    )
+    inner = Tagged.inner(9)
+    records = [(1, 5, b"", (9,)), (2, "abc", b"xyz", inner)]
+    expected = Tagged(1, 5, b"", inner).binary + Tagged(2, "abc", b"xyz", inner).binary
+    assert Tagged.pack_many(records) == expected
+    with pytest.raises(ValueError):
+        Tagged.pack_many([(1, 5, b"")])
+
+    Native = schema.Group(a=schema.uint8, b=schema.StructUnit("l"), c=schema.uint8)
+    native = b"\x01" + struct.pack("l", -2) + b"\x03"
+    assert Native.pack_many([(1, -2, 3)]) == native == Native(1, -2, 3).binary
+    Alone = schema.Group(b=schema.StructUnit("l"))
+    assert Alone.pack_many([(5,)]) == struct.pack("l", 5)
+
+    # a Switch on a MustEqual field uses its value, as the constructor does
+    Keyed = schema.Group(
+        kind=schema.MustEqual(schema.uint8, 2),
+        body=schema.Switch("kind", {1: schema.String(3), 2: schema.uint16be}),
+    )
+    keyed = [(..., 5), (2, 6)]
+    assert Keyed.pack_many(keyed) == b"".join(Keyed(*r).binary for r in keyed)
+
+    chunks = []
+
+    class File:
+        def write(self, data):
+            chunks.append(bytes(data))
+
+    records = records * 100
+    assert Tagged.write_many(records, File(), flush_size=64) == len(expected) * 100
+    assert b"".join(chunks) == expected * 100
+    assert all(len(chunk) < 64 + len(expected) for chunk in chunks)
+    assert len(chunks) > 1
+
+
+def test_sizes():
+    G = schema.Group(a=schema.uint8, b=schema.uint24be, c=schema.Bytes(3))
+    assert (G.min_size, G.max_size, G.static_size) == (7, 7, 7)
+    assert schema.uint16be.static_size == 2
+    assert schema.EndWith(b"\r\n").min_size == 2
+    assert schema.EndWith(b"\r\n").static_size is None
+    assert schema.Bytes(-1).max_size is None
+    assert schema.LengthPrefixedString(schema.uint8).max_size == 256
+    assert schema.LengthPrefixedBytes(schema.int16be).max_size == 2 + 32767
+    assert schema.LengthPrefixedBytes(schema.float32).max_size is None
+    limited = schema.LengthPrefixedBytes(schema.uint32be, max_length=10)
+    assert limited.max_size == 14
+    obj = schema.LengthPrefixedObject(schema.uint16be, G)
+    assert (obj.min_size, obj.max_size) == (9, 9)
+    lst = schema.LengthPrefixedObjectList(schema.uint8, G, max_length=100)
+    assert (lst.min_size, lst.max_size) == (1, 101)
+    switch = schema.Switch("a", {1: schema.uint8, 2: G, 3: schema.Bytes(2)})
+    assert (switch.min_size, switch.max_size, switch.static_size) == (1, 7, None)
+    assert schema.Switch("a", {1: schema.uint16, 2: schema.Bytes(2)}).static_size == 2
+    assert schema.Convert(schema.uint8, encode=int, decode=str).static_size == 1
+
+    Outer = schema.Group(g=G, rest=schema.Bytes(-1))
+    assert (Outer.min_size, Outer.max_size) == (7, None)
+    assert G(1, 2, b"abc").nbytes == G.static_size
+
+
+def test_reject_oversized():
+    Frame = schema.Group(body=schema.LengthPrefixedBytes(schema.uint32be, max_length=4))
+    parser = Frame.get_parser()
+    with pytest.raises(schema.ParseError):
+        parser.send(b"\x00\x10\x00\x00")
+    with pytest.raises(ValueError):
+        Frame(b"too long")
+    Wrapper = schema.Group(
+        obj=schema.LengthPrefixedObject(schema.uint16be, schema.uint32be)
+    )
+    check_schema(Wrapper(3))
+    # rejected once min_size bytes are buffered, not after the whole payload
+    with pytest.raises(schema.ParseError):
+        Wrapper.get_parser().send(b"\x00\x05" + bytes(4))
+    with pytest.raises(schema.ParseError):
+        Wrapper.get_parser().send(b"\x00\x03" + bytes(4))
+
+
+def test_merged_struct_reads():
+    Mixed = schema.Group(
+        a=schema.uint8,
+        b=schema.uint16be,
+        c=schema.SizedIntEnum(schema.uint8, socket.AddressFamily),
+        d=schema.uint24,
+        e=schema.uint16,
+        f=schema.int32,
+        g=schema.MustEqual(schema.Bytes(2), b"ok"),
+        h=schema.float64be,
+    )
+    plan = Mixed._compile()
+    # big-endian, native and big-endian runs
+    assert [op[0] for op in plan] == [schema._STRUCT] * 3
+    obj = Mixed(1, 2, socket.AF_INET, 3, 4, -5, b"ok", 1.5)
+    check_schema(obj)
+    parser = Mixed.get_parser()
+    for byte in obj.binary:
+        assert not parser.has_result
+        parser.send(bytes([byte]))
+    assert parser.get_result() == obj
+    with pytest.raises(schema.ParseError):
+        Mixed.parse(obj.binary.replace(b"ok", b"ko"))
+
+
+def test_unmergeable_struct_formats():
+    # native sizes that differ from the standard ones and "n", which has no
+    # standard size, are read on their own
+    Native = schema.Group(
+        a=schema.uint8,
+        b=schema.StructUnit("l"),
+        c=schema.StructUnit("n"),
+        d=schema.uint8,
+    )
+    data = struct.pack("=B", 1) + struct.pack("l", -2) + struct.pack("n", 3) + b"\x04"
+    obj = Native.parse(data)
+    assert (obj.a, obj.b, obj.c, obj.d) == (1, -2, 3, 4)
+    assert obj.binary == data
+    # a format of more than one item joins no run
+    assert schema.StructUnit("2H")._struct_format() is None
+
+
+def test_parse_error_location():
+    from iofree.contrib import socks5
+    from iofree.contrib.common import Addr
+
+    with pytest.raises(schema.ParseError) as info:
+        socks5.Handshake.parse(b"\x04\x01\x00")
+    error = info.value
+    assert (error.schema, error.field, error.values, error.offset) == (
+        socks5.Handshake,
+        "ver",
+        [],
+        1,
+    )
+    assert isinstance(error.__cause__, ValueError)
+    assert str(error) == "Handshake.ver: ValueError: expect 5, got 4 (at offset 1)"
+
+    # an error in a nested schema is not wrapped again by the outer ones
+    parser = socks5.ClientRequest.get_parser()
+    parser.send(b"\x05\x01\x00")
+    with pytest.raises(schema.ParseError) as info:
+        parser.send(b"\x09" + bytes(6))
+    error = info.value
+    assert (error.schema, error.field, error.values, error.offset) == (
+        Addr,
+        "host",
+        [9],
+        4,
+    )
+    assert isinstance(error.__cause__, KeyError)
+
+    # the offset of an error in a length-prefixed payload is the outer one
+    with pytest.raises(schema.ParseError) as info:
+        socks5.Handshake.parse(b"\x05\x02\x00\x07")
+    assert (info.value.field, info.value.values, info.value.offset) == (
+        "methods",
+        [5],
+        4,
+    )
+
+    # fail-fast errors are cheap to keep: nothing chained, no partial values
+    parser = socks5.ClientRequest.get_parser(fail_fast=True)
+    with pytest.raises(schema.ParseError) as info:
+        parser.send(b"\x05\x01\x00\x09" + bytes(6))
+    error = info.value
+    assert (error.schema, error.field, error.values, error.offset) == (
+        Addr,
+        "host",
+        None,
+        4,
+    )
+    assert error.__cause__ is None and error.__context__ is None
+    assert error.args[0].__traceback__ is None
+    parser = socks5.Handshake.get_parser()
+    assert parser.parse_datagrams(
+        [b"\x04\x01\x00", b"\x05\x01\x00"],
+        socks5.Handshake.get_value,
+        skip_errors=True,
+    ) == [socks5.Handshake(..., [socks5.AuthMethod.no_auth])]
+    assert not parser.fail_fast
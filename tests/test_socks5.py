@@ -2,7 +2,10 @@ import os
 
 import pytest
 
-from iofree.contrib import socks5
+from iofree import schema
+from iofree.contrib import common, socks5
+from iofree.contrib.common import Addr
+from iofree.exceptions import ParseError
 
 
 def check_schema(schema):
@@ -43,3 +46,147 @@ def test_udp_reply():
         ..., 32, socks5.Addr.from_tuple(("google.com", 80)), os.urandom(64)
     )
     check_schema(udp_reply)
+
+
+def test_udp_relay_codec():
+    codec = socks5.UDPRelayCodec(cache_size=2)
+    for addr in [("1.2.3.4", 80), ("::1", 53), ("example.com", 443)]:
+        payload = os.urandom(32)
+        datagram = b"".join(codec.encode(addr, payload))
+        relay = socks5.UDPRelay.parse(datagram)
+        assert (relay.addr.host, relay.addr.port, relay.data) == (*addr, payload)
+        frag, decoded_addr, view = codec.decode(bytearray(datagram))
+        assert (frag, decoded_addr, bytes(view)) == (0, addr, payload)
+    assert codec.header(("::1", 53)) == codec.header(("::1", 53))
+    assert codec.header_cache.hits == 2
+    assert len(codec.header_cache) == 2
+    assert codec.decode(b"".join(codec.encode(("1.2.3.4", 1), b"", frag=3)))[0] == 3
+
+    for bad in [
+        b"\x00\x01\x00\x01\x01\x02\x03\x04\x00\x50",
+        b"\x00\x00\x00\x02\x01\x02\x03\x04\x00\x50",
+        b"\x00\x00\x00\x01\x01\x02",
+        b"\x00\x00\x00\x03\x09abc",
+        b"\x00\x00",
+    ]:
+        with pytest.raises(socks5.ParseError):
+            codec.decode(bad)
+
+
+def test_addr_cache():
+    assert common.address_type("127.0.0.1") == 1
+    assert common.address_type("::1") == 4
+    assert common.address_type("example.com") == 3
+    for host in ("256.0.0.1", "1.2.3", "01.2.3.4", "1.2.3.4.5", "١.2.3.4"):
+        assert common.address_type(host) == 3
+
+    Addr.cache.clear()
+    addr = Addr.from_tuple(("10.0.0.1", 80))
+    assert addr.binary == b"\x01\n\x00\x00\x01\x00P"
+    again = Addr.from_tuple(("10.0.0.1", 80))
+    assert again == addr and again.binary == addr.binary
+    assert Addr.cache.hits == 1
+
+    parsed = Addr.parse(addr.binary)
+    assert parsed == addr and parsed is not addr
+    assert Addr.cache.hits == 2
+    parsed.port = 81
+    assert Addr.parse(parsed.binary).port == 81
+    assert Addr.from_tuple(("10.0.0.1", 80)).port == 80
+
+    for addr in (Addr(4, "::1", 443), Addr(3, "example.com", 443)):
+        assert Addr.parse(addr.binary) == addr
+    with pytest.raises(ParseError):
+        Addr.parse(b"\x05\x00\x00\x00\x00\x00\x00")
+    # the offset of an error in a domain name is the outer one
+    with pytest.raises(ParseError) as info:
+        socks5.ClientRequest.parse(b"\x05\x01\x00\x03\x02\xff\xfe\x00P")
+    assert info.value.offset == 9
+    # hosts spelled differently parse to their canonical form
+    assert Addr(1, "127.1", 80).host == "127.1"
+    assert Addr.parse(b"\x01\x7f\x00\x00\x01\x00P").host == "127.0.0.1"
+    wire = Addr(4, "2001:0DB8::1", 80).binary
+    assert Addr.parse(wire).host == "2001:db8::1"
+
+    Addr.cache.maxsize, maxsize = 4, Addr.cache.maxsize
+    try:
+        for port in range(10):
+            Addr(1, "10.0.0.1", port)
+        assert len(Addr.cache) == 4
+    finally:
+        Addr.cache.maxsize = maxsize
+
+
+def exchange(parser, data=b""):
+    "send data, return the writes of the parser and its results"
+    parser.send(data)
+    writes, results = [], []
+    for to_send, close, exc, result in parser:
+        if exc:
+            raise exc
+        if to_send:
+            writes.append(to_send)
+        if isinstance(result, schema.BinarySchema):
+            results.append(result)
+    return writes, results
+
+
+@pytest.mark.parametrize("pipeline", [True, False])
+@pytest.mark.parametrize("username", [None, "user"])
+def test_handshake_state_machines(pipeline, username):
+    client = socks5.client.parser(
+        ("example.com", 443), username=username, password="pass", pipeline=pipeline
+    )
+    server = socks5.server.parser(
+        None if username is None else (lambda u, p: (u, p) == ("user", "pass"))
+    )
+    writes, _ = exchange(client)
+    round_trips = 0
+    while True:
+        assert len(writes) == 1
+        writes, requests = exchange(server, writes[0])
+        if requests:
+            break
+        round_trips += 1
+        writes, _ = exchange(client, writes[0])
+    assert round_trips == (0 if pipeline else 1 if username is None else 2)
+    assert requests[0].addr == Addr.from_tuple(("example.com", 443))
+
+    server.send_event(
+        socks5.Reply(..., socks5.Rep.succeeded, 0, Addr.from_tuple(("10.0.0.1", 80)))
+    )
+    all_writes = writes
+    writes, _ = exchange(server)
+    all_writes += writes
+    assert len(writes) == 1
+    _, replies = exchange(client, b"".join(all_writes) + b"early data")
+    assert replies[-1].bind_addr.port == 80
+    assert client.readall() == b"early data"
+    assert server.get_result() is requests[0]
+
+
+def test_handshake_failures():
+    server = socks5.server.parser(lambda u, p: False)
+    with pytest.raises(ParseError):
+        exchange(server, socks5.Handshake(..., [socks5.AuthMethod.no_auth]).binary)
+
+    server = socks5.server.parser(lambda u, p: False)
+    client = socks5.client.parser(("10.0.0.1", 80), username="u")
+    writes, _ = exchange(client)
+    server.send(writes[0])
+    (to_send, close, exc, result), *_ = server
+    assert close and isinstance(exc, ParseError)
+    with pytest.raises(ParseError, match="authentication failed"):
+        exchange(client, to_send)
+
+    server = socks5.server.parser()
+    client = socks5.client.parser(("10.0.0.1", 80))
+    writes, _ = exchange(client)
+    exchange(server, writes[0])
+    server.send_event(
+        socks5.Reply(..., socks5.Rep.not_allowed, 0, Addr.from_tuple(("0.0.0.0", 0)))
+    )
+    (to_send, close, exc, result), *_ = server
+    assert close
+    with pytest.raises(ParseError, match="not_allowed"):
+        exchange(client, to_send)
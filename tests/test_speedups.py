@@ -0,0 +1,55 @@
+import os
+import random
+import struct
+import subprocess
+import sys
+
+import pytest
+
+import iofree
+
+FROM = object()  # where the trap takes its from_ argument
+CALLS = [
+    ("_read", (0, FROM)),
+    ("_read", (3, FROM)),
+    ("_read", (-2, FROM)),
+    ("_read_more", (2, FROM)),
+    ("_read_upto", (3, FROM)),
+    ("_peek", (4, FROM)),
+    ("_read_until", (b"\r\n", True, FROM)),
+    ("_read_until", (b"\r\n", False, FROM)),
+    ("_read_until", (b"", True, FROM)),
+    ("_read_until", (b"\r\n", True, FROM, 4)),
+    ("_read_struct", (struct.Struct("!HB"), FROM)),
+    ("_read_int", (3, "big", False, FROM)),
+    ("_read_int", (2, "little", True, FROM)),
+    ("_read_int", (8, "big", True, FROM)),
+    ("_read_int", (9, "little", True, FROM)),
+]
+
+
+@pytest.mark.skipif(not iofree.HAS_SPEEDUPS, reason="C extension is not built")
+@pytest.mark.parametrize("name, args", CALLS)
+def test_same_semantics(name, args):
+    rnd = random.Random(name + repr(args))
+    for _ in range(200):
+        data = bytes(rnd.choice(b"ab\r\n\xff") for _ in range(rnd.randrange(12)))
+        pos = rnd.randrange(4)
+        outcomes = []
+        for handler in (getattr(iofree.Parser, name), getattr(iofree._speedups, name)):
+            parser = iofree.Parser(iofree.wait_event())
+            parser._input.extend(data)
+            parser._pos = pos
+            from_ = bytearray(data)
+            result = handler(parser, *(None if a is FROM else a for a in args))
+            result_from = handler(parser, *(from_ if a is FROM else a for a in args))
+            outcomes.append(
+                (result, result_from, bytes(parser._input), bytes(from_), parser._pos)
+            )
+        assert outcomes[0] == outcomes[1]
+
+
+def test_pure_python_mode():
+    env = dict(os.environ, IOFREE_PURE_PYTHON="1")
+    code = "import iofree; assert not iofree.HAS_SPEEDUPS"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
@@ -0,0 +1,182 @@
+import socket
+
+import pytest
+
+import iofree
+from iofree.exceptions import Timeout
+from iofree.timer import TimerWheel
+
+
+@iofree.parser
+def greeting(seconds):
+    yield from iofree.set_deadline(seconds)
+    try:
+        name = yield from iofree.read_until(b"\n", return_tail=False)
+    except Timeout:
+        parser = yield from iofree.get_parser()
+        parser.respond(data=b"too slow\n", close=True)
+        return None
+    yield from iofree.set_deadline(None)
+    return name
+
+
+@iofree.parser
+def nested():
+    yield from iofree.set_deadline(100)
+    first = yield from iofree.with_timeout(1, iofree.read(1))
+    second = yield from iofree.with_timeout(1000, iofree.read(1))
+    return first + second
+
+
+@iofree.parser
+def recovered():
+    yield from iofree.set_deadline(100)
+    try:
+        yield from iofree.with_timeout(1, iofree.read(1))
+    except Timeout:
+        pass
+    return (yield from iofree.read(1))
+
+
+@iofree.parser
+def cleanup():
+    yield from iofree.set_deadline(0.01)
+    try:
+        yield from iofree.with_timeout(100, iofree.read(10))
+    except Timeout:
+        return (yield from iofree.read(1))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_expire():
+    parser = greeting.parser(5)
+    assert parser.deadline is not None
+    parser.send(b"ann")
+    parser.expire()
+    assert parser.finished()
+    assert parser.get_result() is None
+    assert list(parser)[0][:2] == (b"too slow\n", True)
+    parser.expire()  # no effect once finished
+
+    parser = greeting.parser(5)
+    parser.send(b"bob\n")
+    assert parser.get_result() == b"bob"
+    assert parser.deadline is None
+
+    parser = iofree.Parser(iofree.read(4))
+    with pytest.raises(Timeout):
+        parser.expire()
+    assert parser.finished()
+
+
+def test_with_timeout(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(iofree, "_monotonic", clock)
+    parser = nested.parser()
+    assert parser.deadline == clock.now + 1
+    parser.send(b"a")
+    # the outer deadline is earlier
+    assert parser.deadline == clock.now + 100
+    parser.send(b"b")
+    assert parser.get_result() == b"ab"
+    assert parser.deadline == clock.now + 100
+
+    # restored when the timeout is caught as well
+    parser = recovered.parser()
+    parser.expire()
+    assert parser.deadline == clock.now + 100
+    parser.send(b"c")
+    assert parser.get_result() == b"c"
+
+    # the outer deadline fired, it is not armed again for the clean-up
+    parser = cleanup.parser()
+    assert parser.deadline == clock.now + 0.01
+    clock.now += 1
+    parser.expire()
+    assert parser.deadline is None
+    parser.send(b"x")
+    assert parser.get_result() == b"x"
+
+
+def test_timer_wheel(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(iofree, "_monotonic", clock)
+    wheel = TimerWheel(tick=1, size=8, clock=clock)
+    parsers = {seconds: greeting.parser(seconds) for seconds in (0.5, 3, 20)}
+    for parser in parsers.values():
+        wheel.watch(parser)
+    done = greeting.parser(2)
+    wheel.watch(done)
+    done.send(b"done\n")
+    unwatched = greeting.parser(2)
+    wheel.watch(unwatched)
+    wheel.unwatch(unwatched)
+    assert wheel.advance(clock.now) == []
+    clock.now += 2.5
+    assert wheel.advance() == [parsers[0.5]]
+    # a moved deadline is not reported at its old time
+    parsers[3].deadline = clock.now + 30
+    wheel.add(parsers[3])
+    clock.now += 10
+    assert wheel.advance() == []
+    clock.now += 10
+    assert wheel.advance() == [parsers[20]]
+    clock.now += 100
+    assert wheel.advance() == [parsers[3]]
+    assert len(wheel) == 0
+    with pytest.raises(ValueError):
+        TimerWheel(tick=0)
+
+
+def test_run_deadline():
+    csock, ssock = socket.socketpair()
+    with csock, ssock:
+        parser = greeting.parser(0.05)
+        assert parser.run(ssock) is None
+        assert csock.recv(100) == b"too slow\n"
+
+
+class TimeoutSocket:
+    "a socket recording its timeout at each recv"
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.timeout = 30.0
+        self.timeouts = []
+
+    def gettimeout(self):
+        return self.timeout
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def recv(self, size):
+        self.timeouts.append(self.timeout)
+        return self.chunks.pop(0)
+
+    def sendall(self, data):
+        pass
+
+    def fileno(self):
+        return 3
+
+
+@iofree.parser
+def two_lines():
+    first = yield from greeting(5)
+    return first, (yield from iofree.read_until(b"\n", return_tail=False))
+
+
+def test_run_cleared_deadline():
+    sock = TimeoutSocket(b"ann\n", b"bob\n")
+    assert two_lines.parser().run(sock) == (b"ann", b"bob")
+    # the second read has no deadline and the original timeout
+    assert sock.timeouts[0] <= 5
+    assert sock.timeouts[1] == sock.timeout == 30.0
@@ -0,0 +1,92 @@
+import random
+import ssl
+
+import pytest
+
+from iofree.contrib import tls
+from iofree.exceptions import ParseError
+
+
+def client_hello(server_hostname="example.com", alpn=("h2", "http/1.1")):
+    context = ssl.create_default_context()
+    if alpn:
+        context.set_alpn_protocols(list(alpn))
+    incoming, outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+    sslobj = context.wrap_bio(incoming, outgoing, server_hostname=server_hostname)
+    with pytest.raises(ssl.SSLWantReadError):
+        sslobj.do_handshake()
+    return outgoing.read()
+
+
+def fragment(record, size):
+    "split the payload of one handshake *record* into records of *size* bytes"
+    payload = record[5:]
+    return b"".join(
+        record[:3] + len(chunk).to_bytes(2, "big") + chunk
+        for chunk in (payload[i : i + size] for i in range(0, len(payload), size))
+    )
+
+
+@pytest.mark.parametrize(
+    "server_hostname, alpn",
+    [("example.com", ("h2", "http/1.1")), (None, ()), ("a.example.org", ("h2",))],
+)
+@pytest.mark.parametrize("fragment_size", [None, 3, 100])
+def test_client_hello(server_hostname, alpn, fragment_size):
+    data = client_hello(server_hostname, alpn)
+    if fragment_size is not None:
+        data = fragment(data, fragment_size)
+    data += b"\x17\x03\x03"  # the start of the next record
+    parser = tls.client_hello.parser()
+    for i in range(len(data)):
+        parser.send(data[i : i + 1])
+        if parser.has_result:
+            break
+    hello = parser.get_result()
+    assert hello.server_name == server_hostname
+    assert hello.alpn_protocols == [protocol.encode() for protocol in alpn]
+    assert hello.version == 0x0303
+    assert hello.size == i + 1 == len(data) - 3
+    repr(hello)
+    # nothing was consumed
+    parser.send(data[i + 1 :])
+    assert parser.detach() == data
+
+
+def test_client_hello_errors():
+    data = client_hello()
+    with pytest.raises(ParseError):
+        tls.client_hello.parser().send(b"GET / HTTP/1.1\r\n")
+    with pytest.raises(ParseError):
+        # a ServerHello
+        tls.client_hello.parser().send(data[:5] + b"\x02" + data[6:])
+    with pytest.raises(ParseError):
+        tls.client_hello.parser(max_size=256).send(data)
+    pos = 5 + 4 + 34
+    pos += 1 + data[pos]
+    pos += 2 + int.from_bytes(data[pos : pos + 2], "big")
+    pos += 1 + data[pos]
+    length = int.from_bytes(data[pos : pos + 2], "big")
+    with pytest.raises(ParseError):
+        # the extensions are longer than the message
+        tls.client_hello.parser().send(
+            data[:pos] + (length + 1).to_bytes(2, "big") + data[pos + 2 :]
+        )
+
+
+def test_record_framer():
+    records = [
+        bytes([tls.HANDSHAKE, 3, 3]) + len(payload).to_bytes(2, "big") + payload
+        for payload in (b"", b"x" * 300, bytes(range(256)))
+    ]
+    data = b"".join(records)
+    framer = tls.RecordFramer()
+    frames = []
+    while data:
+        n = random.randrange(1, 20)
+        frames.extend(framer.feed(data[:n]))
+        data = data[n:]
+    assert frames == records
+    assert not framer.has_more_data()
+    with pytest.raises(ParseError):
+        framer.feed(b"\x17\x03\x03\xff\xff")